@@ -0,0 +1,343 @@
+import dataclasses
+import io
+import json
+from datetime import date, datetime
+
+from flask import Blueprint, Response, current_app, request, stream_with_context
+
+from sqlalchemy.exc import IntegrityError, NoResultFound
+
+from bulk import ENTITIES, import_rows, export_rows, export_fieldnames, read_rows, write_rows, validate_row
+from models.autocomplete import autocomplete
+from models.bookings import booking_errors, conflicting_bookings, overlapping_shows_query
+from models.database import db
+from models.models import Artist
+from models.models import Show
+from models.models import Venue
+from models.queries import upcoming_shows_page, venue_shows, artist_shows, show_counts
+from models.queries import venues_listing, stream_venues, artists_listing, stream_artists
+from models.search import search
+from models.writes import Create, Update, Delete, write
+from pagination import listing_limit, show_cursor, next_show_cursor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+# ----------------------------------------------------------------------------#
+# Serialisation.
+# ----------------------------------------------------------------------------#
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError('Object of type {} is not JSON serializable'.format(type(value).__name__))
+
+
+def dumps(payload) -> bytes:
+    # orjson is several times faster and emits compact output; fall back to the standard
+    # library encoder with the same compact separators.
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+def requested_fields():
+    fields = request.args.get('fields')
+    return {field.strip() for field in fields.split(',') if field.strip()} if fields else None
+
+
+def select_fields(item: dict, fields):
+    if fields is None:
+        return item
+    return {key: value for key, value in item.items() if key in fields}
+
+
+def json_response(payload, status=200):
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+
+def error_response(message, status):
+    return json_response({"error": message}, status)
+
+
+def ndjson_response(rows):
+    fields = requested_fields()
+
+    def generate():
+        for row in rows:
+            yield dumps(select_fields(row._asdict(), fields)) + b'\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def list_response(rows, next_after=None):
+    fields = requested_fields()
+
+    return json_response({
+        "data": [select_fields(row._asdict(), fields) for row in rows],
+        "next_after": next_after,
+    })
+
+
+def wants_ndjson():
+    return request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson'
+
+
+def entity_payload(entity, shows, now):
+    payload = dataclasses.asdict(entity)
+    payload["genres"] = [genre.name for genre in entity.genres]
+    payload["upcoming_shows"] = []
+    payload["past_shows"] = []
+
+    for show in shows:
+        show_data = show._asdict()
+        del show_data["is_upcoming"]
+        payload["upcoming_shows" if show.is_upcoming else "past_shows"].append(show_data)
+
+    payload["upcoming_shows_count"], payload["past_shows_count"] = show_counts(type(entity), entity.id, now)
+
+    return select_fields(payload, requested_fields())
+
+
+def availability_response(model, entity_id):
+    # Whether a venue or artist is free for the whole of [start, end), with the shows in the
+    # way if it isn't. Answered from the exclusion constraint's GiST index on Postgres.
+    try:
+        start_time = datetime.fromisoformat(request.args['start'])
+        end_time = datetime.fromisoformat(request.args['end'])
+    except (KeyError, ValueError):
+        return error_response('start and end must be ISO 8601 datetimes', 400)
+
+    if end_time <= start_time:
+        return error_response('end must be after start', 400)
+
+    conflicts = overlapping_shows_query(model, entity_id, start_time, end_time).limit(listing_limit()).all()
+
+    # Only look the row up when there is nothing booked, a conflict proves it exists.
+    if not conflicts and db.session.query(model.id).filter(model.id == entity_id).first() is None:
+        return error_response(model.__name__ + ' with ID ' + str(entity_id) + ' does not exist', 404)
+
+    return json_response({
+        "available": not conflicts,
+        "start": start_time,
+        "end": end_time,
+        "conflicts": [select_fields(show._asdict(), requested_fields()) for show in conflicts],
+    })
+
+
+# ----------------------------------------------------------------------------#
+# Endpoints.
+# ----------------------------------------------------------------------------#
+
+@api.route('/venues')
+def venues():
+    genre = request.args.get('genre')
+    after = request.args.get('after', type=int)
+
+    if wants_ndjson():
+        return ndjson_response(stream_venues(genre, after))
+
+    return list_response(*venues_listing(genre, after, listing_limit()))
+
+
+@api.route('/venues/<int:venue_id>')
+def venue(venue_id):
+    venue = db.session.get(Venue, venue_id)
+    if venue is None:
+        return error_response('Venue with ID ' + str(venue_id) + ' does not exist', 404)
+
+    now = datetime.now()
+    return json_response(entity_payload(venue, venue_shows(venue_id, now), now))
+
+
+@api.route('/venues/<int:venue_id>/availability')
+def venue_availability(venue_id):
+    return availability_response(Venue, venue_id)
+
+
+@api.route('/artists')
+def artists():
+    genre = request.args.get('genre')
+    after = request.args.get('after', type=int)
+
+    if wants_ndjson():
+        return ndjson_response(stream_artists(genre, after))
+
+    return list_response(*artists_listing(genre, after, listing_limit()))
+
+
+@api.route('/artists/<int:artist_id>')
+def artist(artist_id):
+    artist = db.session.get(Artist, artist_id)
+    if artist is None:
+        return error_response('Artist with ID ' + str(artist_id) + ' does not exist', 404)
+
+    now = datetime.now()
+    return json_response(entity_payload(artist, artist_shows(artist_id, now), now))
+
+
+@api.route('/artists/<int:artist_id>/availability')
+def artist_availability(artist_id):
+    return availability_response(Artist, artist_id)
+
+
+@api.route('/shows')
+def shows():
+    # Same (start_time, id) keyset cursor as the HTML listing.
+    try:
+        after = show_cursor()
+    except ValueError:
+        return error_response('Invalid cursor', 400)
+
+    page, has_next_page = upcoming_shows_page(now=datetime.now(), after=after, limit=listing_limit())
+
+    next_cursor = None
+    if has_next_page:
+        next_cursor = next_show_cursor(page[-1])
+
+    return list_response(page, next_cursor)
+
+
+@api.route('/search')
+def search_entities():
+    models = {'venue': Venue, 'artist': Artist}
+    model = models.get(request.args.get('type', 'venue'))
+
+    if model is None:
+        return error_response('type must be one of: ' + ', '.join(models), 400)
+
+    matches = search(model, request.args.get('q', ''), limit=current_app.config['SEARCH_RESULTS_LIMIT'])
+
+    return list_response(matches)
+
+
+@api.route('/autocomplete')
+def autocomplete_names():
+    # Venue or artist names starting with q, or with a word starting with it, for the show
+    # form's pickers. Answered from an in-memory prefix index, without a query.
+    models = {'venue': Venue, 'artist': Artist}
+    model = models.get(request.args.get('type', 'venue'))
+
+    if model is None:
+        return error_response('type must be one of: ' + ', '.join(models), 400)
+
+    limit = request.args.get('limit', current_app.config['AUTOCOMPLETE_LIMIT'], type=int)
+    limit = max(1, min(limit, current_app.config['AUTOCOMPLETE_MAX_LIMIT']))
+
+    return list_response(autocomplete(model, request.args.get('q', ''), limit))
+
+
+@api.route('/bulk/<entity>', methods=['POST'])
+def bulk_import(entity):
+    if entity not in ENTITIES:
+        return error_response('entity must be one of: ' + ', '.join(ENTITIES), 404)
+
+    formats = {'text/csv': 'csv', 'application/x-ndjson': 'ndjson'}
+    file_format = formats.get(request.mimetype)
+
+    if file_format is None:
+        return error_response('Content-Type must be one of: ' + ', '.join(formats), 415)
+
+    # Rows are parsed straight off the request stream, the body is never held in memory.
+    rows = read_rows(io.TextIOWrapper(request.stream, encoding='utf-8', newline=''), file_format)
+    summary = import_rows(entity, rows)
+
+    return json_response(summary, 200 if not summary['errors'] else 422 if not summary['inserted'] else 207)
+
+
+@api.route('/bulk/<entity>', methods=['GET'])
+def bulk_export(entity):
+    if entity not in ENTITIES:
+        return error_response('entity must be one of: ' + ', '.join(ENTITIES), 404)
+
+    file_format = 'ndjson' if wants_ndjson() else 'csv'
+    chunks = write_rows(export_rows(entity), export_fieldnames(entity), file_format)
+
+    return Response(
+        stream_with_context(chunks),
+        mimetype='application/x-ndjson' if file_format == 'ndjson' else 'text/csv',
+        headers={'Content-Disposition': 'attachment; filename={}.{}'.format(entity, file_format)}
+    )
+
+
+def batch_operation(item):
+    # Returns the write operation described by one item of a /batch request, or its errors.
+    if not isinstance(item, dict):
+        return None, {'operation': ['Must be an object.']}
+
+    action, entity = item.get('action'), item.get('entity')
+
+    if entity not in ENTITIES:
+        return None, {'entity': ['Must be one of: ' + ', '.join(ENTITIES) + '.']}
+    if action not in ('create', 'update', 'delete'):
+        return None, {'action': ['Must be one of: create, update, delete.']}
+
+    model = ENTITIES[entity][0]
+    id = item.get('id')
+
+    if action != 'create' and (not isinstance(id, int) or isinstance(id, bool)):
+        return None, {'id': ['Must be an integer ID.']}
+    if action == 'delete':
+        return Delete(model, id), None
+
+    values, genres, errors = validate_row(entity, item.get('data') or {})
+    if errors:
+        return None, errors
+
+    if model is Show:
+        errors = booking_errors(values, exclude_id=id if action == 'update' else None)
+        if errors:
+            return None, errors
+
+    return (Create(model, values, genres) if action == 'create' else Update(model, id, values, genres)), None
+
+
+@api.route('/batch', methods=['POST'])
+def batch_write():
+    # Creates, updates and deletes any mix of venues, artists and shows in one transaction:
+    # either every operation is written or none is. Rows are validated like bulk rows.
+    payload = request.get_json(silent=True)
+
+    if not isinstance(payload, dict) or not isinstance(payload.get('operations'), list):
+        return error_response('Body must be a JSON object with an "operations" list', 400)
+
+    operations, errors = [], []
+    for number, item in enumerate(payload['operations']):
+        operation, operation_errors = batch_operation(item)
+        if operation_errors:
+            errors.append({"operation": number, "errors": operation_errors})
+        operations.append(operation)
+
+    if not errors:
+        # Each show was only checked against the booked ones, not against the rest of the batch.
+        shows = {
+            number: operation.values for number, operation in enumerate(operations)
+            if operation.model is Show and not isinstance(operation, Delete)
+        }
+        replaced = {operation.id for operation in operations if operation.model is Show and not isinstance(operation, Create)}
+        conflicts = conflicting_bookings(shows, replaced)
+        errors.extend({"operation": number, "errors": conflicts[number]} for number in sorted(conflicts))
+
+    if errors:
+        return json_response({"errors": errors}, 422)
+
+    try:
+        writes = write(*operations)
+    except NoResultFound as error:
+        return error_response(str(error), 404)
+    except IntegrityError as error:
+        return error_response(str(error.orig), 409)
+
+    entities = {model: entity for entity, (model, *_) in ENTITIES.items()}
+
+    return json_response({
+        "data": [
+            {"action": written.action, "entity": entities[written.model], "id": written.id, "changed": sorted(written.changed)}
+            for written in writes
+        ]
+    })
@@ -3,57 +3,347 @@
 # ----------------------------------------------------------------------------#
 
 import logging
-import re
-import sys
 from datetime import datetime
+from functools import lru_cache
 from logging import Formatter, FileHandler
 
-import babel.dates
-import dateutil.parser
-from flask import Flask, render_template, request, flash, redirect, url_for
-from flask_migrate import Migrate
+from flask import Flask, Response, render_template, request, flash, redirect, url_for, abort, jsonify
+from flask import current_app, stream_with_context
 from flask_moment import Moment
+from sqlalchemy.exc import NoResultFound, SQLAlchemyError
 
+from api import api
+from assets import Assets, assets_cli
+from bulk import bulk_cli, rows_imported
+from cache import ResponseCache, conditional
 from forms import ShowForm, VenueForm, ArtistForm
-from models.database import db
+from instrumentation import QueryInstrumentation, query_budget
+from metrics import Metrics
+from models.bookings import booking_errors, is_booking_conflict
+from models.database import db, configure_database
 from models.models import Artist
 from models.models import Show
 from models.models import Venue
+from models.queries import upcoming_shows_page, venue_shows, artist_shows, show_counts
+from models.queries import venue_territories, invalidate_venue_territories, artists_listing
+from models.queries import stream_venue_territories, stream_artists
+from models.queries import venue_page_version, artist_page_version, listing_page_version
+from models.search import search, configure_search
+from models.summaries import summaries_cli
+from models.writes import Create, Update, Delete, write, column_values, entities_written
+from pagination import listing_limit, show_cursor, next_show_cursor
+from routes import Routes
+from seed import seed_command
+from templating import configure_templates
 
 # ----------------------------------------------------------------------------#
 # App Config.
 # ----------------------------------------------------------------------------#
 
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
+moment = Moment()
+assets = Assets()
+metrics = Metrics()
+response_cache = ResponseCache()
+routes = Routes()
 
-db.init_app(app)
-Migrate(app, db)
+
+def create_app(config='config', cli=True):
+    app = Flask(__name__)
+    app.config.from_object(config)
+
+    # Sessions and flashes are signed with this key, so every worker must share it.
+    if not app.config.get('SECRET_KEY'):
+        raise RuntimeError('SECRET_KEY is not set')
+
+    moment.init_app(app)
+    metrics.init_app(app)
+    configure_database(app)
+    QueryInstrumentation(app)
+    configure_search(app)
+    response_cache.init_app(app)
+    app.jinja_env.filters['datetime'] = format_datetime
+    assets.init_app(app)
+    configure_templates(app)
+    routes.init_app(app)
+    app.register_blueprint(api)
+
+    # Alembic is only needed by `flask db`; web workers (see wsgi.py) skip it.
+    if cli:
+        from flask_migrate import Migrate
+
+        Migrate(app, db)
+        app.cli.add_command(assets_cli)
+        app.cli.add_command(bulk_cli)
+        app.cli.add_command(seed_command)
+        app.cli.add_command(summaries_cli)
+
+    configure_logging(app)
+
+    return app
+
+
+def configure_logging(app):
+    if app.debug or app.testing:
+        return
+
+    file_handler = FileHandler('error.log')
+    file_handler.setFormatter(
+        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+    )
+    app.logger.setLevel(logging.INFO)
+    file_handler.setLevel(logging.INFO)
+    app.logger.addHandler(file_handler)
+    app.logger.info('Logging to error.log')
 
 
 # ----------------------------------------------------------------------------#
 # Filters.
 # ----------------------------------------------------------------------------#
 
+# Named formats of the datetime filter; any other format is used as a babel pattern.
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=None)
+def datetime_pattern(format):
+    # Imported on first use, they are only needed once a page with dates is rendered.
+    import babel
+    import babel.dates
+
+    return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)), babel.Locale.parse('en')
+
+
+@lru_cache(maxsize=10000)
+def _format_datetime(value, format):
+    pattern, locale = datetime_pattern(format)
+    return pattern.apply(value, locale)
+
+
 def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format, locale='en')
+    # Views pass datetimes straight through; strings are still parsed for older callers.
+    if isinstance(value, str):
+        import dateutil.parser
+
+        value = dateutil.parser.parse(value)
+
+    return _format_datetime(value, format)
+
+
+# ----------------------------------------------------------------------------#
+# Listing helpers.
+# ----------------------------------------------------------------------------#
+
+def stream_template(template_name, **context):
+    # Render a template as it is iterated, so listings backed by a generator are sent
+    # to the client in chunks instead of being built in memory first.
+    current_app.update_template_context(context)
+    template = current_app.jinja_env.get_template(template_name)
+    return Response(stream_with_context(template.generate(context)))
+
+
+# ----------------------------------------------------------------------------#
+# Page helpers.
+# ----------------------------------------------------------------------------#
+
+# Shared by the views below and the async read path in async_views.py, which fetch the rows
+# differently but render the same pages.
+
+def venue_page_data(venue, shows, counts):
+    past_show_data = []
+    upcoming_show_data = []
+
+    for show in shows:
+        artist_data = {
+            "artist_id": show.artist_id,
+            "artist_name": show.artist_name,
+            "artist_image_link": show.artist_image_link,
+            "start_time": show.start_time,
+        }
+
+        if show.is_upcoming:
+            upcoming_show_data.append(artist_data)
+        else:
+            past_show_data.append(artist_data)
+
+    upcoming_shows_count, past_shows_count = counts
+
+    return {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": [genre.name for genre in venue.genres],
+        "city": venue.city,
+        "state": venue.state,
+        "phone": venue.phone,
+        "website": venue.website,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": venue.seeking_talent,
+        "seeking_description": venue.seeking_description,
+        "image_link": venue.image_link,
+        "past_shows": past_show_data,
+        "upcoming_shows": upcoming_show_data,
+        "past_shows_count": past_shows_count,
+        "upcoming_shows_count": upcoming_shows_count,
+    }
+
+
+def artist_page_data(artist, shows, counts):
+    past_show_data = []
+    upcoming_show_data = []
+
+    for show in shows:
+        venue_data = {
+            "venue_id": show.venue_id,
+            "venue_name": show.venue_name,
+            "venue_image_link": show.venue_image_link,
+            "start_time": show.start_time,
+        }
+
+        if show.is_upcoming:
+            upcoming_show_data.append(venue_data)
+        else:
+            past_show_data.append(venue_data)
+
+    upcoming_shows_count, past_shows_count = counts
+
+    return {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": [genre.name for genre in artist.genres],
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "website": artist.website,
+        "facebook_link": artist.facebook_link,
+        "seeking_venue": artist.seeking_venue,
+        "seeking_description": artist.seeking_description,
+        "image_link": artist.image_link,
+        "past_shows": past_show_data,
+        "upcoming_shows": upcoming_show_data,
+        "past_shows_count": past_shows_count,
+        "upcoming_shows_count": upcoming_shows_count,
+    }
 
 
-app.jinja_env.filters['datetime'] = format_datetime
+def show_listing_cursor():
+    # Resume from the (start_time, id) keyset cursor of the previous page, if one was given.
+    try:
+        return show_cursor()
+    except ValueError:
+        abort(400)
+
+
+def show_listing_data(page, has_next_page):
+    upcoming_shows = []
+
+    for show in page:
+        upcoming_shows.append(
+            {
+                "id": show.id,
+                "start_time": show.start_time,
+                "venue_id": show.venue_id,
+                "venue_name": show.venue_name,
+                "artist_id": show.artist_id,
+                "artist_name": show.artist_name,
+                "artist_image_link": show.artist_image_link
+            }
+        )
+
+    next_cursor = None
+
+    if has_next_page:
+        next_cursor = next_show_cursor(page[-1])
+
+    return upcoming_shows, next_cursor
+
+
+def genre_error(form):
+    # The venue and artist handlers take the posted form as is, but its genres must still be
+    # choices of forms.Genre; anything else is refused rather than added to the Genre table.
+    try:
+        form.genres.pre_validate(form)
+    except ValueError as error:
+        return str(error)
+
+    return None
+
+
+# ----------------------------------------------------------------------------#
+# Cache invalidation.
+# ----------------------------------------------------------------------------#
+
+def invalidate_venue_pages(venue_id=None, artist_ids=()):
+    # Venue names appear on the home page, the venue listing, the shows listing and on the
+    # pages of every artist who has played there.
+    invalidate_venue_territories()
+    response_cache.invalidate('index')
+    response_cache.invalidate('venues')
+    response_cache.invalidate('shows')
+
+    if venue_id is not None:
+        response_cache.invalidate('show_venue', venue_id)
+
+    for artist_id in artist_ids:
+        response_cache.invalidate('show_artist', artist_id)
+
+
+def invalidate_artist_pages(artist_id=None, venue_ids=()):
+    response_cache.invalidate('index')
+    response_cache.invalidate('artists')
+    response_cache.invalidate('shows')
+
+    if artist_id is not None:
+        response_cache.invalidate('show_artist', artist_id)
+
+    for venue_id in venue_ids:
+        response_cache.invalidate('show_venue', venue_id)
+
+
+def invalidate_show_pages(venue_id, artist_id):
+    response_cache.invalidate('shows')
+    response_cache.invalidate('show_venue', venue_id)
+    response_cache.invalidate('show_artist', artist_id)
+
+
+@rows_imported.connect
+def invalidate_imported_pages(model, rows):
+    if model is Venue:
+        invalidate_venue_pages()
+    elif model is Artist:
+        invalidate_artist_pages()
+    else:
+        for venue_id, artist_id in {(row['venue_id'], row['artist_id']) for row in rows}:
+            invalidate_show_pages(venue_id, artist_id)
+
+
+@entities_written.connect
+def invalidate_written_pages(app, writes):
+    for written in writes:
+        # An update that changed nothing leaves every page as it was.
+        if written.action == 'update' and not written.changed:
+            continue
+
+        related_ids = [id for _, id in written.related]
+
+        if written.model is Venue:
+            invalidate_venue_pages(written.id, related_ids)
+        elif written.model is Artist:
+            invalidate_artist_pages(written.id, related_ids)
+        else:
+            invalidate_show_pages(*related_ids)
 
 
 # ----------------------------------------------------------------------------#
 # Controllers.
 # ----------------------------------------------------------------------------#
 
-@app.route('/')
+@routes.route('/')
+@query_budget(3)
+@response_cache.cached('index')
+@conditional(lambda: listing_page_version(Artist, Venue))
 def index():
     # Retrieve the 10 newest artists and venues to display on the homepage.
     newest_artists: [] = Artist.query.order_by(db.desc(Artist.id)).limit(10).all()
@@ -70,91 +360,33 @@ def index():
 #  Venues
 # ----------------------------------------------------------------------------#
 
-@app.route('/venues')
+@routes.route('/venues')
+@query_budget(2)
+@response_cache.cached('venues')
+@conditional(lambda: listing_page_version(Venue))
 def venues():
-    territories = (
-        Venue
-            .query
-            .with_entities(Venue.city, Venue.state)
-            .group_by(Venue.city, Venue.state)
-            .all()
-    )
+    genre = request.args.get('genre')
+    after = request.args.get('after', type=int)
 
-    territories_and_venues = []
+    # Stream every venue from the cursor onwards without materialising the listing.
+    if request.args.get('stream'):
+        return stream_template('pages/venues.html', areas=stream_venue_territories(genre, after))
 
-    for territory in territories:
-        territory_venues = (
-            Venue
-                .query
-                .filter(Venue.city == territory.city)
-                .filter(Venue.state == territory.state)
-                .all()
-        )
+    territories, next_after = venue_territories(genre, after, listing_limit())
 
-        territories_and_venues.append(
-            {
-                "city": territory.city,
-                "state": territory.state,
-                "venues": territory_venues,
-            }
-        )
+    return render_template('pages/venues.html', areas=territories, next_after=next_after)
 
-    return render_template('pages/venues.html', areas=territories_and_venues)
 
-
-@app.route('/venues/search', methods=['POST'])
+@routes.route('/venues/search', methods=['POST'])
 def search_venues():
     search_input = request.form.get("search_term", None)
 
-    # Remove all non-alphanumeric chars for a clean search
-    search_items = search_input.split(',')
-
-    for item in search_items:
-        # Format each comma-split lemma
-        formatted_input = "%{}%".format(item.strip())
-
-        # Find all fuzzy name matches
-        fuzzy_name_matches = (
-            Venue
-                .query
-                .filter(Venue.name.ilike(formatted_input))
-                .all()
-        )
-
-        # Find all fuzzy city matches
-        fuzzy_city_matches = (
-            Venue
-                .query
-                .filter(Venue.city.ilike(formatted_input))
-                .all()
-        )
-
-        # Find all fuzzy state matches
-        fuzzy_state_matches = (
-            Venue
-                .query
-                .filter(Venue.state.ilike(formatted_input))
-                .all()
-        )
-
-    # Compile all fuzzy matches into one set.
-    all_fuzzy_matches = []
-
-    for match in fuzzy_name_matches:
-        if match not in all_fuzzy_matches:
-            all_fuzzy_matches.append(match)
-
-    for match in fuzzy_state_matches:
-        if match not in all_fuzzy_matches:
-            all_fuzzy_matches.append(match)
-
-    for match in fuzzy_city_matches:
-        if match not in all_fuzzy_matches:
-            all_fuzzy_matches.append(match)
+    # One ranked query that matches any of the comma-separated terms
+    matches = search(Venue, search_input, limit=current_app.config['SEARCH_RESULTS_LIMIT'])
 
     response = {
-        "count": len(all_fuzzy_matches),
-        "data": all_fuzzy_matches
+        "count": len(matches),
+        "data": matches
     }
 
     return render_template(
@@ -164,7 +396,10 @@ def search_venues():
     )
 
 
-@app.route('/venues/<int:venue_id>')
+@routes.route('/venues/<int:venue_id>')
+@query_budget(5)
+@response_cache.cached('show_venue', 'venue_id')
+@conditional(lambda venue_id: venue_page_version(venue_id, datetime.now()))
 def show_venue(venue_id):
     venue = Venue.query.filter(Venue.id == venue_id).one_or_none()
 
@@ -174,49 +409,8 @@ def show_venue(venue_id):
         return render_template('errors/404.html'), 404
 
     # Otherwise continue to render the venue page and information
-    else:
-        shows = Show.query.filter(Show.venue_id == venue_id).all()
-
-        past_show_data = []
-        upcoming_show_data = []
-
-        for show in shows:
-            base_start_datetime = show.start_time.strftime("%d/%m/%Y%H:%M:%S")
-            formatted_start_datetime = datetime.strptime(base_start_datetime, "%d/%m/%Y%H:%M:%S")
-            is_upcoming_show = formatted_start_datetime > datetime.now()
-
-            artists = Artist.query.filter(Artist.id == show.artist_id).all()
-
-            for artist in artists:
-                artist_data = {
-                    "artist_id": artist.id,
-                    "artist_name": artist.name,
-                    "artist_image_link": artist.image_link,
-                    "start_time": show.start_time.strftime("%m/%d/%Y, %H:%M:%S"),
-                }
-
-                if is_upcoming_show:
-                    upcoming_show_data.append(artist_data)
-                else:
-                    past_show_data.append(artist_data)
-
-        venue_data = {
-            "id": venue.id,
-            "name": venue.name,
-            "genres": venue.genres.split(','),
-            "city": venue.city,
-            "state": venue.state,
-            "phone": venue.phone,
-            "website": venue.website,
-            "facebook_link": venue.facebook_link,
-            "seeking_talent": venue.seeking_talent,
-            "seeking_description": venue.seeking_description,
-            "image_link": venue.image_link,
-            "past_shows": past_show_data,
-            "upcoming_shows": upcoming_show_data,
-            "past_shows_count": len(past_show_data),
-            "upcoming_shows_count": len(upcoming_show_data),
-        }
+    now = datetime.now()
+    venue_data = venue_page_data(venue, venue_shows(venue_id, now), show_counts(Venue, venue_id, now))
 
     return render_template('pages/show_venue.html', venue=venue_data)
 
@@ -224,138 +418,77 @@ def show_venue(venue_id):
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@routes.route('/venues/create', methods=['GET'])
 def create_venue_form():
     form = VenueForm()
     return render_template('forms/new_venue.html', form=form)
 
 
-@app.route('/venues/create', methods=['POST'])
+@routes.route('/venues/create', methods=['POST'])
 def create_venue_submission():
     venue_data = VenueForm(request.form)
 
-    error = False
-    try:
-        formattedEnumGenres = re.sub('[^A-Za-z0-9&+\- ]+', '', '+'.join(venue_data.genres.data)).replace('+', ', ')
+    error = genre_error(venue_data)
+    if error is not None:
+        flash('Venue ' + venue_data.name.data + ' could not be listed. ' + error)
+        return render_template('forms/new_venue.html', form=venue_data), 400
 
+    try:
         # Create new db Venue record
-        new_venue = Venue(
-            name=venue_data.name.data,
-            city=venue_data.city.data,
-            state=venue_data.state.data,
-            address=venue_data.address.data,
-            phone=venue_data.phone.data,
-            genres=formattedEnumGenres,
-            website=venue_data.website.data,
-            facebook_link=venue_data.facebook_link.data,
-            image_link=venue_data.image_link.data,
-            seeking_talent=venue_data.seeking_talent.data,
-            seeking_description=venue_data.seeking_description.data,
-        )
-
-        db.session.add(new_venue)
-        db.session.commit()
-    except:
-        error = True
-        db.session.rollback()
-        print(sys.exc_info())
-    finally:
-        db.session.close()
-        if not error:
-            flash('Venue ' + venue_data.name.data + ' was successfully listed!')
-        else:
-            flash('An error occurred. Venue ' + venue_data.name.data + ' could not be listed.')
+        write(Create(Venue, column_values(Venue, venue_data.data), venue_data.genres.data))
+    except SQLAlchemyError:
+        current_app.logger.exception('Venue %r could not be listed', venue_data.name.data)
+        flash('An error occurred. Venue ' + venue_data.name.data + ' could not be listed.')
+    else:
+        flash('Venue ' + venue_data.name.data + ' was successfully listed!')
 
     return redirect(url_for('index'))
 
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@routes.route('/venues/<int:venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
     try:
-        # Delete the venue by it's id & update the db
-        venue = Venue.query.get(venue_id)
-        db.session.delete(venue)
-        db.session.commit()
-    except:
-        db.session.rollback()
-        print(sys.exc_info())
-    finally:
-        db.session.close()
+        # Delete the venue by it's id, its shows go with it
+        write(Delete(Venue, venue_id))
+    except NoResultFound:
+        return jsonify({"success": False, "error": 'Venue with ID ' + str(venue_id) + ' does not exist'}), 404
+    except SQLAlchemyError:
+        current_app.logger.exception('Venue %d could not be deleted', venue_id)
+        return jsonify({"success": False, "error": 'Venue with ID ' + str(venue_id) + ' could not be deleted'}), 500
 
-    return None
+    flash('Venue with ID ' + str(venue_id) + ' was successfully deleted!')
+    return jsonify({"success": True})
 
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@routes.route('/artists')
+@query_budget(2)
+@response_cache.cached('artists')
+@conditional(lambda: listing_page_version(Artist))
 def artists():
-    all_artists = Artist.query.all()
-    basic_artist_details = []
+    genre = request.args.get('genre')
+    after = request.args.get('after', type=int)
 
-    for artist in all_artists:
-        basic_artist_details.append(
-            {
-                "id": artist.id,
-                "name": artist.name,
-            }
-        )
+    # Stream every artist from the cursor onwards without materialising the listing.
+    if request.args.get('stream'):
+        return stream_template('pages/artists.html', artists=stream_artists(genre, after))
+
+    basic_artist_details, next_after = artists_listing(genre, after, listing_limit())
 
-    return render_template('pages/artists.html', artists=basic_artist_details)
+    return render_template('pages/artists.html', artists=basic_artist_details, next_after=next_after)
 
 
-@app.route('/artists/search', methods=['POST'])
+@routes.route('/artists/search', methods=['POST'])
 def search_artists():
     search_input = request.form.get("search_term", None)
 
-    # Remove all non-alphanumeric chars for a clean search
-    search_items = search_input.split(',')
-
-    for item in search_items:
-        # Format each comma-split lemma
-        formatted_input = "%{}%".format(item.strip())
-
-        # Find all fuzzy name matches
-        fuzzy_name_matches = (
-            Artist
-                .query
-                .filter(Artist.name.ilike(formatted_input))
-                .all()
-        )
-
-        # Find all fuzzy city matches
-        fuzzy_city_matches = (
-            Artist
-                .query
-                .filter(Artist.city.ilike(formatted_input))
-                .all()
-        )
-
-        # Find all fuzzy state matches
-        fuzzy_state_matches = (
-            Artist
-                .query
-                .filter(Artist.state.ilike(formatted_input))
-                .all()
-        )
-
-    # Compile all fuzzy matches into one set.
-    all_fuzzy_matches = []
-
-    for match in fuzzy_name_matches:
-        if match not in all_fuzzy_matches:
-            all_fuzzy_matches.append(match)
-
-    for match in fuzzy_state_matches:
-        if match not in all_fuzzy_matches:
-            all_fuzzy_matches.append(match)
-
-    for match in fuzzy_city_matches:
-        if match not in all_fuzzy_matches:
-            all_fuzzy_matches.append(match)
+    # One ranked query that matches any of the comma-separated terms
+    matches = search(Artist, search_input, limit=current_app.config['SEARCH_RESULTS_LIMIT'])
 
     response = {
-        "count": len(all_fuzzy_matches),
-        "data": all_fuzzy_matches
+        "count": len(matches),
+        "data": matches
     }
 
     return render_template(
@@ -365,7 +498,10 @@ def search_artists():
     )
 
 
-@app.route('/artists/<int:artist_id>')
+@routes.route('/artists/<int:artist_id>')
+@query_budget(5)
+@response_cache.cached('show_artist', 'artist_id')
+@conditional(lambda artist_id: artist_page_version(artist_id, datetime.now()))
 def show_artist(artist_id):
     artist = Artist.query.filter(Artist.id == artist_id).one_or_none()
 
@@ -375,56 +511,15 @@ def show_artist(artist_id):
         return render_template('errors/404.html'), 404
 
     # Otherwise continue to render the artist page and information.
-    else:
-        shows = Show.query.filter(Show.artist_id == artist_id).all()
-
-        past_show_data = []
-        upcoming_show_data = []
-
-        for show in shows:
-            base_start_datetime = show.start_time.strftime("%d/%m/%Y%H:%M:%S")
-            formatted_start_datetime = datetime.strptime(base_start_datetime, "%d/%m/%Y%H:%M:%S")
-            is_upcoming_show = formatted_start_datetime > datetime.now()
-
-            venues = Venue.query.filter(Venue.id == show.venue_id).all()
-
-            for venue in venues:
-                venue_data = {
-                    "venue_id": venue.id,
-                    "venue_name": venue.name,
-                    "venue_image_link": venue.image_link,
-                    "start_time": show.start_time.strftime("%m/%d/%Y, %H:%M:%S"),
-                }
-
-                if is_upcoming_show:
-                    upcoming_show_data.append(venue_data)
-                else:
-                    past_show_data.append(venue_data)
-
-        artist_data = {
-            "id": artist.id,
-            "name": artist.name,
-            "genres": artist.genres.split(','),
-            "city": artist.city,
-            "state": artist.state,
-            "phone": artist.phone,
-            "website": artist.website,
-            "facebook_link": artist.facebook_link,
-            "seeking_venue": artist.seeking_venue,
-            "seeking_description": artist.seeking_description,
-            "image_link": artist.image_link,
-            "past_shows": past_show_data,
-            "upcoming_shows": upcoming_show_data,
-            "past_shows_count": len(past_show_data),
-            "upcoming_shows_count": len(upcoming_show_data),
-        }
+    now = datetime.now()
+    artist_data = artist_page_data(artist, artist_shows(artist_id, now), show_counts(Artist, artist_id, now))
 
     return render_template('pages/show_artist.html', artist=artist_data)
 
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@routes.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
     artist = Artist.query.filter(Artist.id == artist_id).one_or_none()
 
@@ -442,7 +537,7 @@ def edit_artist(artist_id):
             "state": artist.state,
             "phone": artist.phone,
             "image_link": artist.image_link,
-            "genres": ','.join(artist.genres),
+            "genres": [genre.name for genre in artist.genres],
             "website": artist.website,
             "facebook_link": artist.facebook_link,
             "seeking_venue": artist.seeking_venue,
@@ -454,42 +549,31 @@ def edit_artist(artist_id):
         return render_template('forms/edit_artist.html', form=form, artist=existing_artist_data)
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@routes.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
-    artist = Artist.query.filter(Artist.id == artist_id).one()
     artist_data = ArtistForm(request.form)
 
-    error = False
+    error = genre_error(artist_data)
+    if error is not None:
+        flash('Artist ' + artist_data.name.data + ' could not be updated. ' + error)
+        return render_template('forms/edit_artist.html', form=artist_data, artist=dict(artist_data.data, id=artist_id)), 400
+
     try:
-        # Update existing data with new form data
-        artist.name = artist_data.name.data,
-        artist.city = artist_data.city.data,
-        artist.state = artist_data.state.data,
-        artist.phone = artist_data.phone.data,
-        artist.genres = ','.join(artist_data.genres.data),
-        artist.website = artist_data.website.data,
-        artist.facebook_link = artist_data.facebook_link.data,
-        artist.image_link = artist_data.image_link.data,
-        artist.seeking_venue = artist_data.seeking_venue.data,
-        artist.seeking_description = artist_data.seeking_description.data,
-
-        # Update db record data for artist with new form data
-        db.session.commit()
-    except:
-        error = True
-        db.session.rollback()
-        print(sys.exc_info())
-    finally:
-        if not error:
-            flash('Artist ' + artist_data.name.data + ' was successfully updated!')
-        else:
-            flash('An error occurred. Artist ' + artist_data.name.data + ' could not be updated.')
-        db.session.close()
+        # Update the columns the form changed, in one short transaction
+        write(Update(Artist, artist_id, column_values(Artist, artist_data.data), artist_data.genres.data))
+    except NoResultFound:
+        flash('ERROR: artist with ID ' + str(artist_id) + ' does not exist!')
+        return render_template('errors/404.html'), 404
+    except SQLAlchemyError:
+        current_app.logger.exception('Artist %d could not be updated', artist_id)
+        flash('An error occurred. Artist ' + artist_data.name.data + ' could not be updated.')
+    else:
+        flash('Artist ' + artist_data.name.data + ' was successfully updated!')
 
     return redirect(url_for('show_artist', artist_id=artist_id))
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@routes.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
     venue = Venue.query.filter(Venue.id == venue_id).one_or_none()
 
@@ -507,7 +591,7 @@ def edit_venue(venue_id):
             "state": venue.state,
             "phone": venue.phone,
             "image_link": venue.image_link,
-            "genres": ','.join(venue.genres),
+            "genres": [genre.name for genre in venue.genres],
             "address": venue.address,
             "website": venue.website,
             "facebook_link": venue.facebook_link,
@@ -520,39 +604,26 @@ def edit_venue(venue_id):
     return render_template('forms/edit_venue.html', form=form, venue=existing_venue_data)
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@routes.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
-    venue = Venue.query.filter(Venue.id == venue_id).one()
     venue_data = VenueForm(request.form)
 
-    error = False
+    error = genre_error(venue_data)
+    if error is not None:
+        flash('Venue ' + venue_data.name.data + ' could not be updated. ' + error)
+        return render_template('forms/edit_venue.html', form=venue_data, venue=dict(venue_data.data, id=venue_id)), 400
+
     try:
-        # Update existing data with new form data
-        venue.name = venue_data.name.data,
-        venue.city = venue_data.city.data,
-        venue.state = venue_data.state.data,
-        venue.phone = venue_data.phone.data,
-        venue.genres = ','.join(venue_data.genres.data),
-        venue.address = venue_data.address.data,
-        venue.website = venue_data.website.data,
-        venue.facebook_link = venue_data.facebook_link.data,
-        venue.image_link = venue_data.image_link.data,
-        venue.seeking_talent = venue_data.seeking_talent.data,
-        venue.seeking_description = venue_data.seeking_description.data,
-
-        # Update db record data for venue with new form data
-        db.session.commit()
-    except:
-        error = True
-        db.session.rollback()
-        print(sys.exc_info())
-    finally:
-        if not error:
-            flash('Venue ' + venue_data.name.data + ' was successfully updated!')
-        else:
-            # ✅ TODO: on unsuccessful db update, flash an error instead.
-            flash('An error occurred. Venue ' + venue_data.name.data + ' could not be updated.')
-        db.session.close()
+        # Update the columns the form changed, in one short transaction
+        write(Update(Venue, venue_id, column_values(Venue, venue_data.data), venue_data.genres.data))
+    except NoResultFound:
+        flash('ERROR: venue with ID ' + str(venue_id) + ' does not exist!')
+        return render_template('errors/404.html'), 404
+    except SQLAlchemyError:
+        current_app.logger.exception('Venue %d could not be updated', venue_id)
+        flash('An error occurred. Venue ' + venue_data.name.data + ' could not be updated.')
+    else:
+        flash('Venue ' + venue_data.name.data + ' was successfully updated!')
 
     return redirect(url_for('show_venue', venue_id=venue_id))
 
@@ -560,46 +631,29 @@ def edit_venue_submission(venue_id):
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@routes.route('/artists/create', methods=['GET'])
 def create_artist_form():
     form = ArtistForm()
     return render_template('forms/new_artist.html', form=form)
 
 
-@app.route('/artists/create', methods=['POST'])
+@routes.route('/artists/create', methods=['POST'])
 def create_artist_submission():
     artist_data = ArtistForm(request.form)
 
-    error = False
-    try:
-        formattedEnumGenres = re.sub('[^A-Za-z0-9&+\- ]+', '', '+'.join(artist_data.genres.data)).replace('+', ', ')
-
-        # Create new db Show record
-        new_artist = Artist(
-            name=artist_data.name.data,
-            city=artist_data.city.data,
-            state=artist_data.state.data,
-            phone=artist_data.phone.data,
-            image_link=artist_data.image_link.data,
-            genres=formattedEnumGenres,
-            website=artist_data.website.data,
-            facebook_link=artist_data.facebook_link.data,
-            seeking_venue=artist_data.seeking_venue.data,
-            seeking_description=artist_data.seeking_description.data
-        )
+    error = genre_error(artist_data)
+    if error is not None:
+        flash('Artist ' + artist_data.name.data + ' could not be listed. ' + error)
+        return render_template('forms/new_artist.html', form=artist_data), 400
 
-        db.session.add(new_artist)
-        db.session.commit()
-    except:
-        error = True
-        db.session.rollback()
-        print(sys.exc_info())
-    finally:
-        if not error:
-            flash('Artist ' + artist_data.name.data + ' was successfully listed!')
-        else:
-            flash('An error occurred. Artist ' + artist_data.name.data + ' could not be listed.')
-        db.session.close()
+    try:
+        # Create new db Artist record
+        write(Create(Artist, column_values(Artist, artist_data.data), artist_data.genres.data))
+    except SQLAlchemyError:
+        current_app.logger.exception('Artist %r could not be listed', artist_data.name.data)
+        flash('An error occurred. Artist ' + artist_data.name.data + ' could not be listed.')
+    else:
+        flash('Artist ' + artist_data.name.data + ' was successfully listed!')
 
     return redirect(url_for('index'))
 
@@ -607,102 +661,89 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@routes.route('/shows')
+@query_budget(2)
+@response_cache.cached('shows')
+@conditional(lambda: listing_page_version(Show, Artist, Venue, now=datetime.now()))
 def shows():
-    all_shows = Show.query.order_by('start_time').all()
-    upcoming_shows = []
-
-    for show in all_shows:
-        artist = Artist.query.filter(Artist.id == show.artist_id).one()
-        venue = Venue.query.filter(Venue.id == show.venue_id).one()
-
-        base_start_datetime = show.start_time.strftime("%d/%m/%Y%H:%M:%S")
-        formatted_start_datetime = datetime.strptime(base_start_datetime, "%d/%m/%Y%H:%M:%S")
-        is_upcoming_show = formatted_start_datetime > datetime.now()
-
-        if is_upcoming_show:
-            upcoming_shows.append(
-                {
-                    "id": show.id,
-                    "start_time": show.start_time.strftime("%m/%d/%Y, %H:%M:%S"),
-                    "venue_id": venue.id,
-                    "venue_name": venue.name,
-                    "artist_id": artist.id,
-                    "artist_name": artist.name,
-                    "artist_image_link": artist.image_link
-                }
-            )
+    page, has_next_page = upcoming_shows_page(
+        now=datetime.now(),
+        after=show_listing_cursor(),
+        limit=current_app.config['SHOWS_PER_PAGE']
+    )
+    upcoming_shows, next_cursor = show_listing_data(page, has_next_page)
 
-    return render_template('pages/shows.html', shows=upcoming_shows)
+    return render_template('pages/shows.html', shows=upcoming_shows, next_cursor=next_cursor)
 
 
-@app.route('/shows/create')
+@routes.route('/shows/create')
 def create_shows():
     # renders form. do not touch.
     form = ShowForm()
     return render_template('forms/new_show.html', form=form)
 
 
-@app.route('/shows/create', methods=['POST'])
+@routes.route('/shows/create', methods=['POST'])
 def create_show_submission():
     show_data = ShowForm(request.form)
 
-    error = False
+    # Check the IDs and the venue's and artist's calendars up front, rather than finding out
+    # from a failed insert, and show what's wrong next to the fields
+    if show_data.validate():
+        for name, errors in booking_errors(column_values(Show, show_data.data)).items():
+            show_data[name].errors.extend(errors)
+
+    if show_data.errors:
+        return render_template('forms/new_show.html', form=show_data), 400
+
     try:
         # Create new db Show record
-        new_show = Show(
-            artist_id=show_data.artist_id.data,
-            venue_id=show_data.venue_id.data,
-            start_time=show_data.start_time.data
-        )
-
-        db.session.add(new_show)
-        db.session.commit()
-    except:
-        error = True
-        db.session.rollback()
-        print(sys.exc_info())
-    finally:
-        if not error:
-            flash("Show was successfully listed!")
-        else:
-            flash("An error occurred. Show could not be listed.")
-        db.session.close()
+        write(Create(Show, column_values(Show, show_data.data)))
+    except SQLAlchemyError as error:
+        if is_booking_conflict(error):
+            # Booked by someone else since the check above
+            flash('The venue or the artist was booked for that time in the meantime. Show could not be listed.')
+            return render_template('forms/new_show.html', form=show_data), 409
+
+        current_app.logger.exception('Show could not be listed')
+        flash("An error occurred. Show could not be listed.")
+    else:
+        flash("Show was successfully listed!")
 
     return redirect(url_for('index'))
 
 
-@app.errorhandler(404)
+@routes.route('/cache/stats')
+def cache_stats():
+    return jsonify(response_cache.stats())
+
+
+@routes.route('/metrics')
+def prometheus_metrics():
+    return metrics.response()
+
+
+@routes.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
 
-@app.errorhandler(500)
+@routes.errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
-
 # ----------------------------------------------------------------------------#
 # Launch.
 # ----------------------------------------------------------------------------#
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
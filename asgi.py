@@ -0,0 +1,18 @@
+"""ASGI entry point, an optional alternative to wsgi.py for high-concurrency read traffic.
+
+    $ pip install uvicorn asyncpg
+    $ uvicorn asgi:app --workers 4 --no-access-log
+
+The read-only pages (home, listings, detail pages and search) are served by coroutines in
+async_views.py that query through SQLAlchemy's asyncio engine (asyncpg on Postgres), so
+each worker keeps serving other requests while one is waiting on the database. Every other
+request runs the regular Flask app in a thread pool. SECRET_KEY has to be set, as with
+wsgi.py, so every worker signs sessions with the same key.
+"""
+from app import create_app
+from async_views import AsyncReadApp
+from models.async_queries import AsyncDatabase
+
+flask_app = create_app(cli=False)
+
+app = AsyncReadApp(flask_app, AsyncDatabase(flask_app))
@@ -0,0 +1,268 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import AppGroup
+
+# Bundles served by layouts/main.html, each built from these files under static/, in order.
+BUNDLES = {
+    'main.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    'head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+    ],
+    'main.js': [
+        'js/script.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+    ],
+}
+
+# Built files go to static/<ASSETS_DIRECTORY>/, next to a manifest that maps each bundle
+# and each static file to its content-hashed copy.
+ASSETS_DIRECTORY = 'dist'
+MANIFEST = 'manifest.json'
+
+CSS_URL_PATTERN = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+# Hashed files never change, so browsers can keep them for a year without revalidating.
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+COMPRESSED_TYPES = ('.css', '.js', '.svg', '.map', '.json', '.txt', '.eot', '.ttf', '.otf')
+
+
+class Assets:
+    # Serves the files built by `flask assets build`. With ASSETS_BUNDLED set and a manifest
+    # built, asset_urls() returns the URL of a bundle and url_for('static', ...) the hashed
+    # copy of a file; otherwise both return the original files, so nothing has to be built
+    # while developing.
+
+    def __init__(self, app=None):
+        self.manifest = {}
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.manifest = {}
+
+        if app.config.get('ASSETS_BUNDLED'):
+            manifest_path = os.path.join(app.static_folder, ASSETS_DIRECTORY, MANIFEST)
+            if os.path.exists(manifest_path):
+                with open(manifest_path) as manifest_file:
+                    self.manifest = json.load(manifest_file)
+            else:
+                app.logger.warning('ASSETS_BUNDLED is set but %s is missing, run `flask assets build`', manifest_path)
+
+        app.url_defaults(self._hashed_filename)
+        app.add_url_rule(
+            app.static_url_path + '/' + ASSETS_DIRECTORY + '/<path:filename>', endpoint='assets', view_func=self.send_asset
+        )
+        app.jinja_env.globals['asset_urls'] = self.urls
+
+    def _hashed_filename(self, endpoint, values):
+        if endpoint == 'static' and values.get('filename') in self.manifest:
+            values['filename'] = ASSETS_DIRECTORY + '/' + self.manifest[values['filename']]
+
+    def urls(self, bundle):
+        if bundle in self.manifest:
+            return [url_for('static', filename=bundle)]
+
+        return [url_for('static', filename=filename) for filename in BUNDLES[bundle]]
+
+    def send_asset(self, filename):
+        # Precompressed variants are picked by Accept-Encoding; they all share one URL.
+        directory = os.path.join(current_app.static_folder, ASSETS_DIRECTORY)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if request.accept_encodings[encoding] and os.path.isfile(os.path.join(directory, filename + suffix)):
+                response = send_from_directory(directory, filename + suffix, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(directory, filename, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+
+        response.vary.add('Accept-Encoding')
+        response.cache_control.immutable = True
+        return response
+
+
+# ----------------------------------------------------------------------------#
+# Build.
+# ----------------------------------------------------------------------------#
+
+def minify_css(source):
+    try:
+        import rcssmin
+    except ImportError:
+        # Comments and surrounding whitespace only; strings are left alone.
+        source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+        source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+        return re.sub(r'\s+', ' ', source).strip()
+
+    return rcssmin.cssmin(source)
+
+
+def minify_js(source):
+    try:
+        import rjsmin
+    except ImportError:
+        # Minifying JavaScript safely needs a real tokenizer; without one it is left as is.
+        return source
+
+    return rjsmin.jsmin(source)
+
+
+def hashed_name(filename, content):
+    root, extension = posixpath.splitext(filename)
+    return '{}.{}{}'.format(root, hashlib.sha256(content).hexdigest()[:16], extension)
+
+
+def rewrite_css_urls(source, filename, manifest):
+    # Bundles live in another directory than their sources, so relative url()s are made
+    # absolute, pointing at the hashed copy when there is one.
+    static_url_path = current_app.static_url_path
+
+    def rewrite(match):
+        url = match.group(2)
+        if url.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return match.group(0)
+
+        path, separator, fragment = _split_url(url)
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(filename), path))
+        if target in manifest:
+            target = ASSETS_DIRECTORY + '/' + manifest[target]
+
+        return 'url("{}/{}{}{}")'.format(static_url_path, target, separator, fragment)
+
+    return CSS_URL_PATTERN.sub(rewrite, source)
+
+
+def _split_url(url):
+    match = re.search(r'[?#]', url)
+    if match is None:
+        return url, '', ''
+
+    return url[:match.start()], url[match.start()], url[match.start() + 1:]
+
+
+def write_asset(directory, name, content):
+    path = os.path.join(directory, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'wb') as asset_file:
+        asset_file.write(content)
+
+    written = [path]
+
+    if name.endswith(COMPRESSED_TYPES):
+        with open(path + '.gz', 'wb') as gzip_file:
+            gzip_file.write(gzip.compress(content, compresslevel=9, mtime=0))
+        written.append(path + '.gz')
+
+        try:
+            import brotli
+        except ImportError:
+            pass
+        else:
+            with open(path + '.br', 'wb') as brotli_file:
+                brotli_file.write(brotli.compress(content, quality=11))
+            written.append(path + '.br')
+
+    return written
+
+
+def build_assets(static_folder):
+    # Copies every static file under a content-hashed name, then builds the bundles, which
+    # refer to those copies, and writes the manifest last so it only ever names files that
+    # exist. Earlier builds are kept, pages cached before a deploy may still link to them.
+    directory = os.path.join(static_folder, ASSETS_DIRECTORY)
+    manifest = {}
+    written = []
+
+    for root, directories, filenames in os.walk(static_folder):
+        if os.path.abspath(root) == os.path.abspath(directory):
+            directories[:] = []
+            continue
+
+        for filename in sorted(filenames):
+            if filename.startswith('.'):
+                continue
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            with open(path, 'rb') as static_file:
+                content = static_file.read()
+            manifest[name] = hashed_name(name, content)
+            written += write_asset(directory, manifest[name], content)
+
+    for bundle, filenames in BUNDLES.items():
+        parts = []
+        for filename in filenames:
+            with open(os.path.join(static_folder, filename), encoding='utf-8') as source_file:
+                source = source_file.read()
+            if bundle.endswith('.css'):
+                parts.append(minify_css(rewrite_css_urls(source, filename, manifest)))
+            else:
+                parts.append(minify_js(source).rstrip().rstrip(';') + ';')
+
+        content = '\n'.join(parts).encode('utf-8')
+        manifest[bundle] = hashed_name(bundle, content)
+        written += write_asset(directory, manifest[bundle], content)
+
+    with open(os.path.join(directory, MANIFEST), 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+
+    return manifest, written
+
+
+assets_cli = AppGroup('assets', help='Build the fingerprinted, compressed static assets.')
+
+
+@assets_cli.command('build')
+def build_command():
+    """Bundle, minify, fingerprint and precompress the static files."""
+    manifest, written = build_assets(current_app.static_folder)
+
+    for bundle in BUNDLES:
+        path = os.path.join(current_app.static_folder, ASSETS_DIRECTORY, manifest[bundle])
+        sizes = [
+            '{} {}'.format(label, os.path.getsize(path + suffix))
+            for label, suffix in (('raw', ''), ('gzip', '.gz'), ('brotli', '.br'))
+            if os.path.exists(path + suffix)
+        ]
+        source_size = sum(os.path.getsize(os.path.join(current_app.static_folder, filename)) for filename in BUNDLES[bundle])
+        click.echo('{:<9} {:<32} sources {}, {} bytes'.format(bundle, manifest[bundle], source_size, ', '.join(sizes)))
+
+    click.echo('Wrote {} files for {} assets'.format(len(written), len(manifest)))
+
+
+@assets_cli.command('clean')
+def clean_command():
+    """Remove built files that the current manifest no longer names."""
+    directory = os.path.join(current_app.static_folder, ASSETS_DIRECTORY)
+    with open(os.path.join(directory, MANIFEST)) as manifest_file:
+        keep = {os.path.join(directory, name) for name in json.load(manifest_file).values()}
+    keep |= {path + suffix for path in keep for suffix in ('.gz', '.br')}
+
+    removed = 0
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            if filename != MANIFEST and path not in keep:
+                os.remove(path)
+                removed += 1
+
+    click.echo('Removed {} files'.format(removed))
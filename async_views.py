@@ -0,0 +1,320 @@
+import asyncio
+import io
+import sys
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from flask import render_template, request, session, flash, current_app, make_response
+from flask.signals import request_started
+from werkzeug.exceptions import HTTPException
+
+from app import response_cache
+from app import venue_page_data, artist_page_data, show_listing_cursor, show_listing_data
+from cache import validators, set_validators
+from models import async_queries as queries
+from models.models import Artist
+from models.models import Show
+from models.models import Venue
+from pagination import listing_limit
+
+# Coroutine versions of the read-only views in app.py, keyed by endpoint. They render the
+# same templates from the same page helpers, only the queries are awaited.
+async_views = {}
+
+
+def async_view(endpoint):
+    def decorator(view):
+        async_views[endpoint] = view
+        return view
+
+    return decorator
+
+
+async def page(route, entity_id, version, render):
+    # The async equivalent of @response_cache.cached(...) over @conditional(...).
+    if session.get('_flashes'):
+        return make_response(await render())
+
+    key = response_cache.key(route, entity_id)
+
+    response = response_cache.lookup(key)
+    if response is not None:
+        return response
+
+    return response_cache.store(key, await conditional(version, render))
+
+
+async def conditional(version, render):
+    page_version = await version()
+    if page_version is None:
+        return make_response(await render())
+
+    etag, last_modified, not_modified = validators(page_version)
+    response = make_response('', 304) if not_modified else make_response(await render())
+
+    return set_validators(response, etag, last_modified)
+
+
+# ----------------------------------------------------------------------------#
+# Views.
+# ----------------------------------------------------------------------------#
+
+@async_view('index')
+async def index(db_session):
+    async def render():
+        return render_template(
+            'pages/home.html',
+            newest_artists=await queries.newest(db_session, Artist),
+            newest_venues=await queries.newest(db_session, Venue)
+        )
+
+    return await page('index', None, lambda: queries.listing_page_version(db_session, Artist, Venue), render)
+
+
+@async_view('venues')
+async def venues(db_session):
+    async def render():
+        territories, next_after = await queries.venue_territories(
+            db_session, request.args.get('genre'), request.args.get('after', type=int), listing_limit()
+        )
+        return render_template('pages/venues.html', areas=territories, next_after=next_after)
+
+    return await page('venues', None, lambda: queries.listing_page_version(db_session, Venue), render)
+
+
+@async_view('artists')
+async def artists(db_session):
+    async def render():
+        basic_artist_details, next_after = await queries.artists_listing(
+            db_session, request.args.get('genre'), request.args.get('after', type=int), listing_limit()
+        )
+        return render_template('pages/artists.html', artists=basic_artist_details, next_after=next_after)
+
+    return await page('artists', None, lambda: queries.listing_page_version(db_session, Artist), render)
+
+
+@async_view('show_venue')
+async def show_venue(db_session, venue_id):
+    now = datetime.now()
+
+    async def render():
+        venue_page = await queries.venue_page(db_session, venue_id, now)
+
+        if venue_page is None:
+            flash('ERROR: venue with ID ' + str(venue_id) + ' does not exist!')
+            return render_template('errors/404.html'), 404
+
+        return render_template('pages/show_venue.html', venue=venue_page_data(*venue_page))
+
+    return await page('show_venue', venue_id, lambda: queries.venue_page_version(db_session, venue_id, now), render)
+
+
+@async_view('show_artist')
+async def show_artist(db_session, artist_id):
+    now = datetime.now()
+
+    async def render():
+        artist_page = await queries.artist_page(db_session, artist_id, now)
+
+        if artist_page is None:
+            flash('ERROR: artist with ID ' + str(artist_id) + ' does not exist!')
+            return render_template('errors/404.html'), 404
+
+        return render_template('pages/show_artist.html', artist=artist_page_data(*artist_page))
+
+    return await page('show_artist', artist_id, lambda: queries.artist_page_version(db_session, artist_id, now), render)
+
+
+@async_view('shows')
+async def shows(db_session):
+    now = datetime.now()
+
+    async def render():
+        show_page, has_next_page = await queries.upcoming_shows_page(
+            db_session, now=now, after=show_listing_cursor(), limit=current_app.config['SHOWS_PER_PAGE']
+        )
+        upcoming_shows, next_cursor = show_listing_data(show_page, has_next_page)
+        return render_template('pages/shows.html', shows=upcoming_shows, next_cursor=next_cursor)
+
+    return await page('shows', None, lambda: queries.listing_page_version(db_session, Show, Artist, Venue, now=now), render)
+
+
+async def search_page(db_session, model, template_name):
+    matches = await queries.search_matches(
+        db_session, model, request.form.get("search_term", None), limit=current_app.config['SEARCH_RESULTS_LIMIT']
+    )
+
+    return render_template(
+        template_name,
+        results={"count": len(matches), "data": matches},
+        search_term=request.form.get('search_term', '')
+    )
+
+
+@async_view('search_venues')
+async def search_venues(db_session):
+    return await search_page(db_session, Venue, 'pages/search_venues.html')
+
+
+@async_view('search_artists')
+async def search_artists(db_session):
+    return await search_page(db_session, Artist, 'pages/search_artists.html')
+
+
+# ----------------------------------------------------------------------------#
+# ASGI application.
+# ----------------------------------------------------------------------------#
+
+def wsgi_environ(scope, body):
+    script_name = scope.get('root_path', '')
+    path_info = scope['path'][len(script_name):] if scope['path'].startswith(script_name) else scope['path']
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path_info.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        value = value.decode('latin-1')
+        environ[name] = environ[name] + ',' + value if name in environ else value
+
+    return environ
+
+
+async def read_body(receive):
+    body = bytearray()
+
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return bytes(body)
+
+
+class AsyncReadApp:
+    # ASGI app that serves the read-only pages (home, listings, detail pages and search) with
+    # the coroutines above and passes every other request, including streamed listings, to
+    # the Flask app in a thread pool. Both go through the app's request hooks, so metrics,
+    # query instrumentation, replica routing and sessions behave the same on either path.
+
+    def __init__(self, app, database):
+        self.app = app
+        self.database = database
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        view, view_args = self.match(scope)
+        body = await read_body(receive)
+        environ = wsgi_environ(scope, body)
+
+        if view is None:
+            return await self.call_wsgi(environ, send)
+
+        response = await self.dispatch(environ, view, view_args)
+
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in response.get_wsgi_headers(environ).items()
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else response.get_data()})
+
+    def match(self, scope):
+        if scope['type'] != 'http' or 'stream' in parse_qs(scope['query_string'].decode('latin-1')):
+            return None, None
+
+        adapter = self.app.url_map.bind('', script_name=scope.get('root_path') or None)
+        try:
+            endpoint, view_args = adapter.match(scope['path'][len(scope.get('root_path', '')):], scope['method'])
+        except HTTPException:
+            return None, None
+
+        return async_views.get(endpoint), view_args
+
+    async def dispatch(self, environ, view, view_args):
+        # Flask.wsgi_app() and full_dispatch_request() with the view awaited.
+        with self.app.request_context(environ):
+            try:
+                request_started.send(self.app, _async_wrapper=self.app.ensure_sync)
+                try:
+                    response = self.app.preprocess_request()
+                    if response is None:
+                        async with self.database.session() as db_session:
+                            response = await view(db_session, **view_args)
+                except Exception as error:
+                    response = self.app.handle_user_exception(error)
+
+                return self.app.finalize_request(response)
+            except Exception as error:
+                return self.app.handle_exception(error)
+
+    async def call_wsgi(self, environ, send):
+        # Runs the Flask app in the loop's default thread pool and relays the status, headers
+        # and each body chunk as they are produced, so streamed responses stay streamed.
+        loop = asyncio.get_running_loop()
+        messages = asyncio.Queue()
+
+        def put(message):
+            loop.call_soon_threadsafe(messages.put_nowait, message)
+
+        def start_response(status, headers, exc_info=None):
+            put({
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+            })
+
+        def run():
+            try:
+                chunks = self.app(environ, start_response)
+                try:
+                    for chunk in chunks:
+                        if chunk:
+                            put({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                finally:
+                    if hasattr(chunks, 'close'):
+                        chunks.close()
+            finally:
+                put(None)
+
+        finished = loop.run_in_executor(None, run)
+
+        while (message := await messages.get()) is not None:
+            if environ['REQUEST_METHOD'] != 'HEAD' or message['type'] == 'http.response.start':
+                await send(message)
+
+        await send({'type': 'http.response.body', 'body': b''})
+        await finished
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.database.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
@@ -0,0 +1,158 @@
+"""WSGI vs ASGI throughput benchmark for the read-only pages.
+
+Starts gunicorn (wsgi.py) and then uvicorn (asgi.py) against the same database and drives
+each with a fixed number of concurrent keep-alive clients cycling through the given pages,
+then reports requests per second and latency percentiles. Seed a local Postgres first and
+disable the response cache, so every request reaches the database:
+
+    $ export DATABASE_URL=postgresql://localhost/fyyur_bench SECRET_KEY=bench CACHE_TYPE=null
+    $ flask db upgrade && flask seed --venues 2000 --artists 5000 --shows 50000
+    $ python benchmarks/asgi_benchmark.py --clients 500 --duration 30 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_PATHS = ['/', '/venues', '/artists', '/shows', '/venues/1', '/artists/1']
+
+SERVERS = {
+    'wsgi': lambda args: [
+        sys.executable, '-m', 'gunicorn', 'wsgi:app', '--bind', '127.0.0.1:{}'.format(args.port),
+        '--workers', str(args.workers), '--threads', str(args.threads), '--backlog', '2048',
+    ],
+    'asgi': lambda args: [
+        sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(args.port),
+        '--workers', str(args.workers), '--backlog', '2048', '--no-access-log',
+    ],
+}
+
+
+async def fetch(connection, port, path):
+    # One GET on a keep-alive connection, reconnecting when the server closed it.
+    if connection is None:
+        connection = await asyncio.open_connection('127.0.0.1', port)
+
+    reader, writer = connection
+    writer.write('GET {} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n'.format(path).encode('latin-1'))
+    await writer.drain()
+
+    status_line, *header_lines = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    headers = dict(line.lower().split(': ', 1) for line in header_lines if ': ' in line)
+
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get('content-length', 0)))
+
+    if headers.get('connection') == 'close':
+        writer.close()
+        connection = None
+
+    return connection, int(status_line.split()[1])
+
+
+async def client(port, paths, offset, deadline, latencies, errors):
+    connection = None
+    position = offset
+
+    while time.perf_counter() < deadline:
+        started_at = time.perf_counter()
+        try:
+            connection, status = await fetch(connection, port, paths[position % len(paths)])
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            connection, status = None, None
+
+        if status == 200:
+            latencies.append(time.perf_counter() - started_at)
+        else:
+            errors.append(status)
+
+        position += 1
+
+    if connection is not None:
+        connection[1].close()
+
+
+async def drive(port, paths, clients, duration):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+
+    await asyncio.gather(*(client(port, paths, number, deadline, latencies, errors) for number in range(clients)))
+
+    return latencies, errors
+
+
+async def wait_for_port(port, timeout=30):
+    deadline = time.perf_counter() + timeout
+
+    while True:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            return
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+def run(name, args):
+    server = subprocess.Popen(SERVERS[name](args), cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    try:
+        asyncio.run(wait_for_port(args.port))
+        # Warm up every worker's pools and caches before measuring.
+        asyncio.run(drive(args.port, args.path, args.workers * 4, 3))
+        latencies, errors = asyncio.run(drive(args.port, args.path, args.clients, args.duration))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+    latencies.sort()
+    percentile = lambda fraction: latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000
+
+    return {
+        "server": name,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": len(latencies) / args.duration,
+        "p50_ms": percentile(0.50) if latencies else 0.0,
+        "p99_ms": percentile(0.99) if latencies else 0.0,
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server', action='append', choices=sorted(SERVERS), help='default: both')
+    parser.add_argument('--path', action='append', help='page to request (repeatable)')
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=30, help='seconds per server')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    args.path = args.path or DEFAULT_PATHS
+
+    results = [run(name, args) for name in args.server or ['wsgi', 'asgi']]
+
+    for result in results:
+        print('{server:<5} {rps:9.1f} req/s   p50 {p50_ms:8.1f} ms   p99 {p99_ms:8.1f} ms   errors {errors}'.format(**result))
+
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Per-row cost of the datetime filter on a large /shows page.
+
+Renders pages/shows.html with synthetic rows, and times the filter calls of those rows on
+their own, three ways: the old path, where views pass strftime() strings that the filter
+parses back with dateutil and formats with babel.dates.format_datetime(); the current
+filter on a cold cache; and the current filter once its cache is warm. Nothing is
+queried, so any database will do:
+
+    $ DATABASE_URL=sqlite:// python benchmarks/datetime_filter_benchmark.py --rows 10000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import babel.dates  # noqa: E402
+import dateutil.parser  # noqa: E402
+from flask import render_template  # noqa: E402
+
+from app import create_app, format_datetime, _format_datetime, DATETIME_FORMATS  # noqa: E402
+
+
+def legacy_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    return babel.dates.format_datetime(date, DATETIME_FORMATS.get(format, format), locale='en')
+
+
+def show_rows(count, distinct_times):
+    # Shows start on the hour, so a page of count shows has distinct_times different times.
+    anchor = datetime(2030, 1, 1, 20)
+    return [
+        {
+            "id": number,
+            "start_time": anchor + timedelta(hours=number % distinct_times),
+            "venue_id": number % 500,
+            "venue_name": "Venue {}".format(number % 500),
+            "artist_id": number % 2000,
+            "artist_name": "Artist {}".format(number % 2000),
+            "artist_image_link": "https://example.com/{}.jpg".format(number % 2000),
+        }
+        for number in range(count)
+    ]
+
+
+def render(rows):
+    started_at = time.perf_counter()
+    render_template('pages/shows.html', shows=rows, next_cursor=None)
+    return time.perf_counter() - started_at
+
+
+def filter_calls(function, values):
+    started_at = time.perf_counter()
+    for value in values:
+        function(value, 'full')
+    return time.perf_counter() - started_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--distinct-times', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app(cli=False)
+    rows = show_rows(args.rows, args.distinct_times)
+    legacy_rows = [dict(row, start_time=row['start_time'].strftime("%m/%d/%Y, %H:%M:%S")) for row in rows]
+    start_times = [row['start_time'] for row in rows]
+
+    pages = {"legacy": [], "cold": [], "warm": []}
+    calls = {"legacy": [], "cold": [], "warm": []}
+
+    with app.test_request_context('/shows'):
+        # Compile the template and load babel's locale data before timing anything.
+        render(rows[:1])
+
+        for _ in range(args.repeat):
+            app.jinja_env.filters['datetime'] = legacy_format_datetime
+            pages["legacy"].append(render(legacy_rows))
+            calls["legacy"].append(filter_calls(
+                lambda value, format: legacy_format_datetime(value.strftime("%m/%d/%Y, %H:%M:%S"), format), start_times
+            ))
+
+            app.jinja_env.filters['datetime'] = format_datetime
+            _format_datetime.cache_clear()
+            pages["cold"].append(render(rows))
+            pages["warm"].append(render(rows))
+            _format_datetime.cache_clear()
+            calls["cold"].append(filter_calls(format_datetime, start_times))
+            calls["warm"].append(filter_calls(format_datetime, start_times))
+
+    print('{} rows, {} distinct start times'.format(args.rows, args.distinct_times))
+    for name in pages:
+        print('{:<7} page {:8.1f} ms   filter {:6.2f} us/row'.format(
+            name, statistics.median(pages[name]) * 1000, statistics.median(calls[name]) / args.rows * 1e6
+        ))
+
+
+if __name__ == '__main__':
+    main()
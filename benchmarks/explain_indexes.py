@@ -0,0 +1,99 @@
+"""Index usage check.
+
+Runs the hot queries behind the listing and detail pages, EXPLAINs each statement they
+issue and fails if the plan does not use the index it was designed around:
+
+    $ python benchmarks/explain_indexes.py
+
+Works against Postgres (with sequential scans disabled, so small development tables still
+show the index the planner would pick at scale) and SQLite.
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from models.bookings import overlapping_shows_query  # noqa: E402
+from models.database import db  # noqa: E402
+from models.models import Artist, Venue  # noqa: E402
+from models.queries import (  # noqa: E402
+    upcoming_shows_page, venue_shows, artist_shows, show_counts, venue_territories, invalidate_venue_territories
+)
+
+app = create_app()
+
+HOT_QUERIES = [
+    # Where a tuple is given, the first is expected on Postgres and the second elsewhere: the
+    # exclusion constraints or the (key, start_time) indexes, and the summary tables' primary
+    # keys, which SQLite looks up as the rowid.
+    ('upcoming shows page', lambda now: upcoming_shows_page(now), 'ix_Show_start_time'),
+    ('venue shows', lambda now: venue_shows(1, now), 'ix_Show_venue_id_start_time'),
+    ('venue show counts', lambda now: show_counts(Venue, 1, now),
+     ('VenueShowSummary_pkey', 'VenueShowSummary USING INTEGER PRIMARY KEY')),
+    ('artist shows', lambda now: artist_shows(1, now), 'ix_Show_artist_id_start_time'),
+    ('artist show counts', lambda now: show_counts(Artist, 1, now),
+     ('ArtistShowSummary_pkey', 'ArtistShowSummary USING INTEGER PRIMARY KEY')),
+    ('venue availability', lambda now: overlapping_shows_query(Venue, 1, now, now + timedelta(hours=2)).all(),
+     ('Show_venue_booking_excl', 'ix_Show_venue_id_start_time')),
+    ('artist availability', lambda now: overlapping_shows_query(Artist, 1, now, now + timedelta(hours=2)).all(),
+     ('Show_artist_booking_excl', 'ix_Show_artist_id_start_time')),
+    ('venue territories', lambda now: (invalidate_venue_territories(), venue_territories()), 'ix_Venue_state_city'),
+    ('venue territories page', lambda now: venue_territories(after=1), 'ix_Venue_state_city'),
+]
+
+
+def capture_statements(run):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    db.event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        run()
+    finally:
+        db.event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    return statements
+
+
+def explain(statement, parameters):
+    explain_prefix = 'EXPLAIN ' if db.engine.dialect.name == 'postgresql' else 'EXPLAIN QUERY PLAN '
+
+    with db.engine.connect() as connection:
+        if db.engine.dialect.name == 'postgresql':
+            connection.exec_driver_sql('SET enable_seqscan = off')
+
+        rows = connection.exec_driver_sql(explain_prefix + statement, parameters).fetchall()
+
+    return '\n'.join(str(row[-1]) for row in rows)
+
+
+def main():
+    failures = 0
+
+    with app.app_context():
+        now = datetime.now()
+
+        for name, run, expected_index in HOT_QUERIES:
+            plans = [explain(*statement) for statement in capture_statements(lambda: run(now))]
+
+            if isinstance(expected_index, tuple):
+                postgres_index, other_index = expected_index
+                expected_index = postgres_index if db.engine.dialect.name == 'postgresql' else other_index
+
+            if any(expected_index in plan for plan in plans):
+                print('ok      {:<22} uses {}'.format(name, expected_index))
+            else:
+                failures += 1
+                print('FAILED  {:<22} does not use {}'.format(name, expected_index))
+                for plan in plans:
+                    print('        ' + plan.replace('\n', '\n        '))
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
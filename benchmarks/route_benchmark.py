@@ -0,0 +1,194 @@
+"""Route load-test benchmark.
+
+Seeds a throwaway database with the deterministic synthetic catalogue from seed.py, requests
+every page of the app through the test client and records the SQL query count and latency
+of each route. Results are written as JSON; given a baseline, the run fails if any route
+issues more queries than before or its p95 latency regresses past the tolerance:
+
+    $ export DATABASE_URL=postgresql://localhost:5432/fyyur_bench
+    $ flask db upgrade
+    $ python benchmarks/route_benchmark.py --output benchmarks/results.json
+    $ cp benchmarks/results.json benchmarks/baseline.json
+    ... change something ...
+    $ python benchmarks/route_benchmark.py --baseline benchmarks/baseline.json
+
+The response cache is disabled unless CACHE_TYPE is set, so every request does the full work.
+The seeding step deletes all venues, artists and shows, never point it at a real database.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('CACHE_TYPE', 'null')
+
+from app import create_app  # noqa: E402
+from models.database import db  # noqa: E402
+from models.models import Artist, Show, Venue  # noqa: E402
+from seed import generate, reset  # noqa: E402
+
+app = create_app()
+
+VENUE_FORM = {
+    'name': 'Benchmark Hall', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+    'phone': '512-555-0100', 'genres': ['Jazz', 'Blues'], 'image_link': 'https://images.example.com/v.jpg',
+    'website': 'https://www.example.com/v', 'facebook_link': 'https://www.facebook.com/v',
+}
+
+ARTIST_FORM = {
+    'name': 'Benchmark Band', 'city': 'Austin', 'state': 'TX', 'phone': '512-555-0101',
+    'genres': ['Rock n Roll'], 'image_link': 'https://images.example.com/a.jpg',
+    'website': 'https://www.example.com/a', 'facebook_link': 'https://www.facebook.com/a',
+}
+
+
+def routes(venue_id, artist_id, first_show):
+    # (name, method, url, form data). Delete is left out, it can only run once per entity.
+    # A venue and artist can't be booked twice at once, so every new show gets its own day.
+    return [
+        ('index', 'GET', '/', None),
+        ('venues', 'GET', '/venues', None),
+        ('venues genre', 'GET', '/venues?genre=Jazz', None),
+        ('venues stream', 'GET', '/venues?stream=1', None),
+        ('venues search', 'POST', '/venues/search', {'search_term': 'blue hall'}),
+        ('show venue', 'GET', '/venues/{}'.format(venue_id), None),
+        ('create venue form', 'GET', '/venues/create', None),
+        ('create venue', 'POST', '/venues/create', VENUE_FORM),
+        ('edit venue form', 'GET', '/venues/{}/edit'.format(venue_id), None),
+        ('edit venue', 'POST', '/venues/{}/edit'.format(venue_id), VENUE_FORM),
+        ('artists', 'GET', '/artists', None),
+        ('artists genre', 'GET', '/artists?genre=Jazz', None),
+        ('artists stream', 'GET', '/artists?stream=1', None),
+        ('artists search', 'POST', '/artists/search', {'search_term': 'golden band'}),
+        ('show artist', 'GET', '/artists/{}'.format(artist_id), None),
+        ('create artist form', 'GET', '/artists/create', None),
+        ('create artist', 'POST', '/artists/create', ARTIST_FORM),
+        ('edit artist form', 'GET', '/artists/{}/edit'.format(artist_id), None),
+        ('edit artist', 'POST', '/artists/{}/edit'.format(artist_id), ARTIST_FORM),
+        ('shows', 'GET', '/shows', None),
+        ('create show form', 'GET', '/shows/create', None),
+        ('create show', 'POST', '/shows/create', lambda iteration: {
+            'artist_id': str(artist_id), 'venue_id': str(venue_id),
+            'start_time': (first_show + timedelta(days=iteration)).strftime('%Y-%m-%d %H:%M:%S'),
+        }),
+    ]
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def benchmark_route(client, counter, method, url, data, repeat):
+    timings = []
+    query_counts = []
+
+    for iteration in range(repeat):
+        counter.count = 0
+        started = time.perf_counter()
+        response = client.open(url, method=method, data=data(iteration) if callable(data) else data)
+        response.get_data()
+        timings.append((time.perf_counter() - started) * 1000)
+        query_counts.append(counter.count)
+
+        if response.status_code >= 400:
+            raise RuntimeError('{} {} returned {}'.format(method, url, response.status_code))
+
+    timings.sort()
+    return {
+        'queries': max(query_counts),
+        'mean_ms': statistics.mean(timings),
+        'p50_ms': statistics.median(timings),
+        'p95_ms': timings[max(int(len(timings) * 0.95) - 1, 0)],
+    }
+
+
+def compare(results, baseline, tolerance):
+    failures = []
+
+    for name, result in results['routes'].items():
+        previous = baseline['routes'].get(name)
+        if previous is None:
+            continue
+
+        if result['queries'] > previous['queries']:
+            failures.append('{}: {} queries, baseline {}'.format(name, result['queries'], previous['queries']))
+
+        if result['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            failures.append('{}: p95 {:.2f} ms, baseline {:.2f} ms'.format(name, result['p95_ms'], previous['p95_ms']))
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=2000)
+    parser.add_argument('--shows', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the synthetic catalogue')
+    parser.add_argument('--no-seed', action='store_true', help='reuse previously seeded rows')
+    parser.add_argument('--repeat', type=int, default=20, help='requests per route')
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(__file__), 'results.json'))
+    parser.add_argument('--baseline', help='results JSON of a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 latency regression')
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    client = app.test_client()
+    counter = QueryCounter()
+
+    with app.app_context():
+        if not args.no_seed:
+            reset()
+            generate(args.venues, args.artists, args.shows, args.seed)
+
+        # The most booked venue and artist have the heaviest detail pages.
+        venue_id = Venue.query.with_entities(db.func.min(Venue.id)).scalar()
+        artist_id = Artist.query.with_entities(db.func.min(Artist.id)).scalar()
+
+        # New shows are booked after every existing one, including those of earlier runs.
+        first_show = datetime(2030, 1, 1, 20)
+        last_show = Show.query.with_entities(db.func.max(db.func.coalesce(Show.end_time, Show.start_time))).scalar()
+        if last_show is not None and last_show >= first_show:
+            first_show = datetime.combine(last_show.date() + timedelta(days=1), first_show.time())
+
+        db.event.listen(db.engine, 'before_cursor_execute', counter)
+
+        results = {
+            'created_at': datetime.utcnow().isoformat(),
+            'database': db.engine.dialect.name,
+            'catalogue': {'venues': args.venues, 'artists': args.artists, 'shows': args.shows, 'seed': args.seed},
+            'repeat': args.repeat,
+            'routes': {},
+        }
+
+        for name, method, url, data in routes(venue_id, artist_id, first_show):
+            result = benchmark_route(client, counter, method, url, data, args.repeat)
+            results['routes'][name] = result
+            print('{:<20} {:>4} queries   p50 {p50_ms:8.2f} ms   p95 {p95_ms:8.2f} ms'.format(name, result['queries'], **result))
+
+        db.event.remove(db.engine, 'before_cursor_execute', counter)
+
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2, sort_keys=True)
+
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            failures = compare(results, json.load(baseline_file), args.tolerance)
+
+        for failure in failures:
+            print('REGRESSION  ' + failure)
+
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Search latency benchmark.
+
+Seeds a throwaway Postgres database with synthetic venues and artists and times the
+/venues/search and /artists/search query path. Run the migrations first so the search
+indexes exist:
+
+    $ export DATABASE_URL=postgresql://localhost:5432/fyyur_bench
+    $ flask db upgrade
+    $ python benchmarks/search_benchmark.py --rows 1000000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from models.database import db  # noqa: E402
+from models.models import Artist, Venue  # noqa: E402
+from models.search import search  # noqa: E402
+
+app = create_app()
+
+SEARCHES = [
+    'music',
+    'venue 4242',
+    'san fran, ca',
+    'new york, brooklyn, ny',
+    'jazz cafe, rock, blues',
+]
+
+SEED_SQL = '''
+INSERT INTO "{table}" (name, city, state, {extra_columns})
+SELECT
+    (ARRAY['The', 'Blue', 'Red', 'Golden', 'Jazz', 'Rock'])[1 + n % 6]
+        || ' ' || (ARRAY['Music', 'Hall', 'Cafe', 'Club', 'Room', 'Band'])[1 + n % 5]
+        || ' ' || '{label} ' || n,
+    (ARRAY['San Francisco', 'New York', 'Brooklyn', 'Austin', 'Nashville', 'Chicago'])[1 + n % 6],
+    (ARRAY['CA', 'NY', 'NY', 'TX', 'TN', 'IL'])[1 + n % 6],
+    {extra_values}
+FROM generate_series(1, :rows) AS n
+'''
+
+
+def seed(rows):
+    db.session.execute(db.text(SEED_SQL.format(
+        table='Venue', label='venue',
+        extra_columns='address, seeking_talent', extra_values="'1 Main St', false"
+    )), {'rows': rows})
+    db.session.execute(db.text(SEED_SQL.format(
+        table='Artist', label='artist',
+        extra_columns='seeking_venue', extra_values='false'
+    )), {'rows': rows})
+    db.session.commit()
+    db.session.execute(db.text('ANALYZE "Venue"'))
+    db.session.execute(db.text('ANALYZE "Artist"'))
+    db.session.commit()
+
+
+def time_searches(model, repeat):
+    timings = []
+
+    for search_input in SEARCHES:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            search(model, search_input, limit=app.config['SEARCH_RESULTS_LIMIT'])
+            timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    return {
+        'p50': statistics.median(timings),
+        'p95': timings[int(len(timings) * 0.95) - 1],
+        'max': timings[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000, help='rows to seed per table')
+    parser.add_argument('--repeat', type=int, default=20, help='runs per search term')
+    parser.add_argument('--no-seed', action='store_true', help='reuse previously seeded rows')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            sys.exit('The search benchmark needs a Postgres DATABASE_URL.')
+
+        if not args.no_seed:
+            seed(args.rows)
+
+        for model in (Venue, Artist):
+            result = time_searches(model, args.repeat)
+            print('{:<8} p50 {p50:8.2f} ms   p95 {p95:8.2f} ms   max {max:8.2f} ms'.format(model.__name__, **result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Startup time and per-worker memory benchmark.
+
+Imports wsgi.py in fresh interpreters and reports how long loading and creating the app
+takes and the resulting RSS. It then forks a worker from one of them, the way a preloading
+gunicorn master does, serves a few requests in it and reports the memory the worker does
+not share with its master (Linux only):
+
+    $ python benchmarks/startup_benchmark.py --runs 10 --path / --path /venues
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = '''
+import json, os, resource, sys, time
+
+started_at = time.perf_counter()
+import wsgi
+startup_ms = (time.perf_counter() - started_at) * 1000
+result = {"startup_ms": startup_ms, "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+paths = json.loads(sys.argv[1])
+if paths and os.path.exists('/proc/self/smaps_rollup'):
+    read_end, write_end = os.pipe()
+    if os.fork() == 0:
+        client = wsgi.app.test_client()
+        for path in paths:
+            client.get(path)
+        with open('/proc/self/smaps_rollup') as smaps:
+            fields = dict(line.split(':', 1) for line in smaps if ':' in line)
+        private = sum(int(fields[name].split()[0]) for name in ('Private_Clean', 'Private_Dirty'))
+        os.write(write_end, str(private).encode())
+        os._exit(0)
+    os.close(write_end)
+    result["worker_private_kb"] = int(os.read(read_end, 64) or 0)
+    os.wait()
+
+print(json.dumps(result))
+'''
+
+
+def measure(paths):
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD, json.dumps(paths)], cwd=ROOT, check=True, capture_output=True, text=True
+    ).stdout
+
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--path', action='append', default=[], help='page to request in the forked worker')
+    args = parser.parse_args()
+
+    results = [measure(args.path) for _ in range(args.runs)]
+
+    for name in ('startup_ms', 'rss_kb', 'worker_private_kb'):
+        values = [result[name] for result in results if name in result]
+        if values:
+            print('{:<18} median {:10.1f}   min {:10.1f}   max {:10.1f}'.format(
+                name, statistics.median(values), min(values), max(values)
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Template cold-start and render time benchmark.
+
+Creates the app in fresh interpreters under each template configuration and reports how
+long create_app() takes (imports excluded), the template time of the first request to each page (compiling
+included) and the median template time of later requests. Configurations: development
+(auto-reload, no bytecode cache), production with an empty bytecode cache (the first
+worker ever started), production with a populated one (any later start), and the same
+with the pre-warm turned off. Point DATABASE_URL at a seeded database:
+
+    $ python benchmarks/template_benchmark.py --runs 5 --path / --path /venues/1 --path /shows
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_PATHS = ['/', '/venues', '/artists', '/shows', '/venues/1', '/artists/1', '/venues/create', '/shows/create']
+
+CHILD = '''
+import json, statistics, sys, time
+
+from flask.signals import before_render_template, template_rendered
+from app import create_app
+
+started_at = time.perf_counter()
+app = create_app(cli=False)
+create_app_ms = (time.perf_counter() - started_at) * 1000
+
+renders = []
+
+def start_render(sender, template, context, **extra):
+    renders.append(time.perf_counter())
+
+def finish_render(sender, template, context, **extra):
+    renders.append(time.perf_counter() - renders.pop())
+
+before_render_template.connect(start_render, app)
+template_rendered.connect(finish_render, app)
+
+paths, repeat = json.loads(sys.argv[1]), int(sys.argv[2])
+client = app.test_client()
+
+for path in paths:
+    client.get(path)
+first_ms = sum(renders) * 1000
+
+renders.clear()
+for _ in range(repeat):
+    for path in paths:
+        client.get(path)
+
+print(json.dumps({"create_app_ms": create_app_ms, "first_render_ms": first_ms, "render_ms": statistics.median(renders) * 1000}))
+'''
+
+
+def measure(environment, paths, repeat):
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD, json.dumps(paths), str(repeat)],
+        cwd=ROOT, env=dict(os.environ, CACHE_TYPE='null', **environment), check=True, capture_output=True, text=True
+    ).stdout
+
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=20, help='requests per page after the first')
+    parser.add_argument('--path', action='append', help='page to request (repeatable)')
+    args = parser.parse_args()
+    paths = args.path or DEFAULT_PATHS
+
+    cache_dir = tempfile.mkdtemp(prefix='fyyur-jinja-')
+    # The testing profile keeps logging quiet; the template settings are set explicitly.
+    development = {'FYYUR_ENV': 'testing', 'TEMPLATES_AUTO_RELOAD': 'true', 'TEMPLATES_BYTECODE_CACHE_DIR': '', 'TEMPLATES_PREWARM': 'false'}
+    production = {'FYYUR_ENV': 'testing', 'TEMPLATES_AUTO_RELOAD': 'false', 'TEMPLATES_BYTECODE_CACHE_DIR': cache_dir, 'TEMPLATES_PREWARM': 'true'}
+
+    configurations = [
+        ('development', development, False),
+        ('production, empty cache', production, True),
+        ('production, warm cache', production, False),
+        ('production, no pre-warm', dict(production, TEMPLATES_PREWARM='false'), False),
+    ]
+
+    try:
+        for name, environment, clear_cache in configurations:
+            results = []
+            for _ in range(args.runs):
+                if clear_cache:
+                    shutil.rmtree(cache_dir, ignore_errors=True)
+                results.append(measure(environment, paths, args.repeat))
+
+            print('{:<24} create_app {:7.1f} ms   first renders {:7.1f} ms   render {:6.2f} ms'.format(
+                name, *(statistics.median(result[key] for result in results) for key in ('create_app_ms', 'first_render_ms', 'render_ms'))
+            ))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Write throughput and latency under concurrent edits.
+
+Runs the edit write path (models.writes.write) from many threads at once, in three
+scenarios: every thread editing the same artist ("hot"), every thread editing its own
+artist ("spread"), and every write updating several random artists in one transaction
+("batch"). Each edit changes one column, a different one per thread, so concurrent edits of
+the hot row don't overwrite each other. Reports writes per second, latency percentiles, the
+transactions retried after a serialization failure or deadlock, and the writes that failed
+for good. Seed a local Postgres first:
+
+    $ export DATABASE_URL=postgresql://localhost/fyyur_bench SECRET_KEY=bench
+    $ flask db upgrade && flask seed --venues 200 --artists 1000 --shows 5000
+    $ python benchmarks/write_contention_benchmark.py --threads 16 --writes 200
+    $ WRITE_ISOLATION_LEVEL=SERIALIZABLE python benchmarks/write_contention_benchmark.py
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prometheus_client import REGISTRY  # noqa: E402
+from sqlalchemy.exc import SQLAlchemyError  # noqa: E402
+
+from app import create_app  # noqa: E402
+from models.database import db  # noqa: E402
+from models.models import Artist  # noqa: E402
+from models.writes import Update, write  # noqa: E402
+
+COLUMNS = ['city', 'phone', 'website', 'facebook_link', 'image_link', 'seeking_description']
+
+SCENARIOS = ('hot', 'spread', 'batch')
+
+
+def edits(scenario, artist_ids, thread_number, write_number, batch_size, rng):
+    column = COLUMNS[thread_number % len(COLUMNS)]
+    value = '{}-{}-{}'.format(scenario, thread_number, write_number)
+
+    if scenario == 'hot':
+        ids = [artist_ids[0]]
+    elif scenario == 'spread':
+        ids = [artist_ids[thread_number % len(artist_ids)]]
+    else:
+        ids = rng.sample(artist_ids, batch_size)
+
+    return [Update(Artist, id, {column: value}) for id in ids]
+
+
+def worker(app, scenario, artist_ids, thread_number, args, barrier, latencies, failures):
+    rng = random.Random(thread_number)
+
+    with app.app_context():
+        barrier.wait()
+
+        for write_number in range(args.writes):
+            operations = edits(scenario, artist_ids, thread_number, write_number, args.batch_size, rng)
+            started_at = time.perf_counter()
+            try:
+                write(*operations)
+            except SQLAlchemyError:
+                failures.append(1)
+            else:
+                latencies.append(time.perf_counter() - started_at)
+
+        db.session.remove()
+
+
+def run(app, scenario, artist_ids, args):
+    latencies, failures = [], []
+    barrier = threading.Barrier(args.threads + 1)
+    retries_before = REGISTRY.get_sample_value('fyyur_db_write_retries_total') or 0
+
+    threads = [
+        threading.Thread(target=worker, args=(app, scenario, artist_ids, number, args, barrier, latencies, failures))
+        for number in range(args.threads)
+    ]
+    for thread in threads:
+        thread.start()
+
+    barrier.wait()
+    started_at = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started_at
+
+    latencies.sort()
+    percentile = lambda fraction: latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000
+
+    return {
+        "scenario": scenario,
+        "writes": len(latencies),
+        "writes_per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(0.50) if latencies else 0.0,
+        "p99_ms": percentile(0.99) if latencies else 0.0,
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+        "retries": (REGISTRY.get_sample_value('fyyur_db_write_retries_total') or 0) - retries_before,
+        "failures": len(failures),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='default: all')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--writes', type=int, default=200, help='writes per thread')
+    parser.add_argument('--batch-size', type=int, default=5, help='artists per write in the batch scenario')
+    args = parser.parse_args()
+
+    # Every thread needs a connection of its own for the whole run.
+    os.environ.setdefault('DB_POOL_SIZE', str(args.threads))
+    app = create_app(cli=False)
+
+    with app.app_context():
+        artist_ids = [id for id, in Artist.query.with_entities(Artist.id).order_by(Artist.id).limit(max(args.threads, args.batch_size))]
+        isolation_level = app.config.get('WRITE_ISOLATION_LEVEL') or 'database default'
+
+    if len(artist_ids) < max(args.threads, args.batch_size):
+        parser.error('seed at least {} artists first'.format(max(args.threads, args.batch_size)))
+
+    print('{} threads x {} writes, isolation level: {}'.format(args.threads, args.writes, isolation_level))
+    results = [run(app, scenario, artist_ids, args) for scenario in args.scenario or SCENARIOS]
+
+    for result in results:
+        print('{scenario:<7} {writes_per_second:8.1f} writes/s   p50 {p50_ms:7.2f} ms   p99 {p99_ms:7.2f} ms   '
+              'retries {retries:.0f}   failures {failures}'.format(**result))
+
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,371 @@
+import csv
+import io
+import json
+from datetime import datetime
+from functools import lru_cache
+
+import click
+from blinker import Namespace
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import MultiDict
+from wtforms import BooleanField
+
+from forms import ShowForm, VenueForm, ArtistForm
+from models.autocomplete import index_rows
+from models.bookings import conflicting_bookings
+from models.database import db
+from models.models import Artist
+from models.models import Show
+from models.models import Venue
+from models.models import artist_genres
+from models.models import venue_genres
+from models.queries import genres_by_name
+from models.search import invalidate_search
+from models.summaries import SUMMARIES, create_summaries, recount_shows
+from models.writes import column_values
+
+ENTITIES = {
+    'venues': (Venue, VenueForm, venue_genres, 'venue_id'),
+    'artists': (Artist, ArtistForm, artist_genres, 'artist_id'),
+    'shows': (Show, ShowForm, None, None),
+}
+
+FORMATS = ('csv', 'ndjson')
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Sent after every committed batch with the model and the inserted rows (including ids), so
+# the app can invalidate the caches that the Core inserts bypass.
+signals = Namespace()
+rows_imported = signals.signal('rows-imported')
+
+
+# ----------------------------------------------------------------------------#
+# Reading & writing.
+# ----------------------------------------------------------------------------#
+
+def read_rows(text_stream, file_format):
+    if file_format == 'csv':
+        yield from csv.DictReader(text_stream)
+    else:
+        for line in text_stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.strftime(DATETIME_FORMAT)
+    return value
+
+
+def _export_columns(model):
+    return [column.name for column in model.__table__.columns if column.name != 'updated_at']
+
+
+def export_rows(entity):
+    model, _, association, _ = ENTITIES[entity]
+    columns = _export_columns(model)
+    query = model.query.order_by(model.id)
+
+    if association is not None:
+        query = query.options(db.selectinload(model.genres))
+
+    for item in query.yield_per(1000):
+        row = {column: _export_value(getattr(item, column)) for column in columns}
+        if association is not None:
+            row['genres'] = ','.join(genre.name for genre in item.genres)
+        yield row
+
+
+def export_fieldnames(entity):
+    model, _, association, _ = ENTITIES[entity]
+    return _export_columns(model) + (['genres'] if association is not None else [])
+
+
+def write_rows(rows, fieldnames, file_format):
+    # Yields text chunks, one per row, for writing to a file or streaming as a response.
+    if file_format == 'ndjson':
+        for row in rows:
+            yield json.dumps(row, separators=(',', ':')) + '\n'
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    writer.writeheader()
+
+    for row in rows:
+        writer.writerow({key: ('true' if value else 'false') if isinstance(value, bool) else value for key, value in row.items()})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+# ----------------------------------------------------------------------------#
+# Validation.
+# ----------------------------------------------------------------------------#
+
+@lru_cache(maxsize=None)
+def _boolean_fields(form_class):
+    # Built once per form class rather than once per imported row.
+    return frozenset(
+        name for name, field in form_class(meta={'csrf': False})._fields.items() if isinstance(field, BooleanField)
+    )
+
+
+def _form_data(row, boolean_fields):
+    data = MultiDict()
+
+    for key, value in row.items():
+        if value is None:
+            continue
+
+        if key == 'genres':
+            genres = value if isinstance(value, list) else str(value).split(',')
+            for genre in genres:
+                if genre.strip():
+                    data.add(key, genre.strip())
+        elif key in boolean_fields:
+            if value is not False and str(value).strip().lower() not in ('', 'false', '0', 'no'):
+                data.add(key, 'y')
+        else:
+            data.add(key, str(value))
+
+    return data
+
+
+def validate_row(entity, row):
+    # Runs a row through the same WTForms form as the matching create page. Returns the
+    # column values and genre names, or the form errors.
+    model, form_class, association, _ = ENTITIES[entity]
+    form = form_class(formdata=_form_data(row, _boolean_fields(form_class)), meta={'csrf': False})
+
+    if not form.validate():
+        return None, None, form.errors
+
+    values = column_values(model, form.data)
+    genres = form.genres.data if association is not None else None
+
+    return values, genres, None
+
+
+def _row_id(row):
+    # The id an exported row was written with, or None for new rows. Raises ValueError if
+    # it isn't an integer.
+    value = row.get('id')
+    if value is None or str(value).strip() == '':
+        return None
+
+    return int(str(value).strip())
+
+
+def _missing_show_references(batch):
+    # Check show foreign keys with one query per side rather than a failed insert per row.
+    artist_ids = {values['artist_id'] for _, values, _ in batch}
+    venue_ids = {values['venue_id'] for _, values, _ in batch}
+
+    known_artist_ids = {id for id, in Artist.query.with_entities(Artist.id).filter(Artist.id.in_(artist_ids))}
+    known_venue_ids = {id for id, in Venue.query.with_entities(Venue.id).filter(Venue.id.in_(venue_ids))}
+
+    errors = {}
+    for row_number, values, _ in batch:
+        if values['artist_id'] not in known_artist_ids:
+            errors[row_number] = {'artist_id': ['Artist with ID ' + str(values['artist_id']) + ' does not exist.']}
+        elif values['venue_id'] not in known_venue_ids:
+            errors[row_number] = {'venue_id': ['Venue with ID ' + str(values['venue_id']) + ' does not exist.']}
+
+    return errors
+
+
+# ----------------------------------------------------------------------------#
+# Importing.
+# ----------------------------------------------------------------------------#
+
+# Rows keep the id they were exported with, so the venue_id / artist_id of exported shows
+# still name the same venues and artists once venues, artists and shows are imported in
+# that order. Rows without an id get a new one. An id already taken is rejected with the
+# row, ids are never remapped.
+
+def _advance_id_sequence(table):
+    # Postgres hands out ids from a sequence that explicit ids don't move; move it past them
+    # so later rows don't collide. SQLite carries on from the highest id by itself.
+    if db.engine.dialect.name != 'postgresql':
+        return
+
+    name = db.engine.dialect.identifier_preparer.quote(table.name)
+    db.session.execute(
+        db.text(
+            "SELECT setval(pg_get_serial_sequence(:name, 'id'), "
+            "GREATEST(MAX(id), nextval(pg_get_serial_sequence(:name, 'id')))) FROM " + name
+        ),
+        {'name': name}
+    )
+
+
+def insert_rows(model, association, key, batch):
+    # batch is a list of (row number, column values, genre names); returns the ids in order.
+    table = model.__table__
+    kept = [values for _, values, _ in batch if 'id' in values]
+    generated = [values for _, values, _ in batch if 'id' not in values]
+
+    if kept:
+        db.session.execute(table.insert(), kept)
+        _advance_id_sequence(table)
+
+    new_ids = iter(
+        db.session.execute(
+            table.insert().returning(table.c.id, sort_by_parameter_order=True), generated
+        ).scalars().all() if generated else []
+    )
+    ids = [values['id'] if 'id' in values else next(new_ids) for _, values, _ in batch]
+
+    # Keep the show summaries in step, in the same transaction as the rows.
+    if model is Show:
+        recount_shows(db.session.connection(), [values for _, values, _ in batch])
+    elif model in SUMMARIES:
+        create_summaries(db.session.connection(), model, ids)
+
+    if association is not None:
+        genres = genres_by_name({name for _, _, names in batch for name in names})
+        db.session.flush()
+        genre_ids = {genre.name: genre.id for genre in genres}
+
+        links = [
+            {key: id, 'genre_id': genre_ids[name]}
+            for id, (_, _, names) in zip(ids, batch)
+            for name in set(names)
+        ]
+        if links:
+            db.session.execute(association.insert(), links)
+
+    return ids
+
+
+def _insert_batch(model, association, key, batch, errors):
+    # Insert the whole batch with executemany inside a savepoint. If the database rejects it,
+    # retry row by row so the failure is reported against the row that caused it.
+    try:
+        with db.session.begin_nested():
+            return list(zip(batch, insert_rows(model, association, key, batch)))
+    except IntegrityError:
+        pass
+
+    inserted = []
+    for item in batch:
+        try:
+            with db.session.begin_nested():
+                inserted.append((item, insert_rows(model, association, key, [item])[0]))
+        except IntegrityError as error:
+            errors.append({"row": item[0], "errors": {"database": [str(error.orig)]}})
+
+    return inserted
+
+
+def _flush_batch(entity, batch, errors):
+    model, _, association, key = ENTITIES[entity]
+
+    if model is Show:
+        missing = _missing_show_references(batch)
+        errors.extend({"row": row_number, "errors": missing[row_number]} for row_number in sorted(missing))
+        batch = [item for item in batch if item[0] not in missing]
+
+        conflicts = conflicting_bookings({row_number: values for row_number, values, _ in batch})
+        errors.extend({"row": row_number, "errors": conflicts[row_number]} for row_number in sorted(conflicts))
+        batch = [item for item in batch if item[0] not in conflicts]
+
+    if not batch:
+        return 0
+
+    inserted = _insert_batch(model, association, key, batch, errors)
+    db.session.commit()
+
+    rows = [dict(values, id=id) for (_, values, _), id in inserted]
+    invalidate_search(model, [row['id'] for row in rows])
+    index_rows(model, rows)
+    rows_imported.send(model, rows=rows)
+
+    return len(rows)
+
+
+def import_rows(entity, rows, batch_size=None):
+    batch_size = batch_size or current_app.config['BULK_BATCH_SIZE']
+    inserted = 0
+    errors = []
+    batch = []
+
+    try:
+        for row_number, row in enumerate(rows, start=1):
+            values, genres, row_errors = validate_row(entity, row)
+
+            if not row_errors:
+                try:
+                    id = _row_id(row)
+                except ValueError:
+                    row_errors = {'id': ['Must be an integer ID.']}
+                else:
+                    if id is not None:
+                        values['id'] = id
+
+            if row_errors:
+                errors.append({"row": row_number, "errors": row_errors})
+                continue
+
+            batch.append((row_number, values, genres))
+
+            if len(batch) >= batch_size:
+                inserted += _flush_batch(entity, batch, errors)
+                batch = []
+
+        inserted += _flush_batch(entity, batch, errors)
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {"inserted": inserted, "errors": sorted(errors, key=lambda error: error['row'])}
+
+
+# ----------------------------------------------------------------------------#
+# CLI.
+# ----------------------------------------------------------------------------#
+
+bulk_cli = AppGroup('bulk', help='Bulk import and export of venues, artists and shows.')
+
+
+def _file_format(file, file_format):
+    if file_format is not None:
+        return file_format
+    return 'ndjson' if getattr(file, 'name', '').endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+@bulk_cli.command('import')
+@click.argument('entity', type=click.Choice(list(ENTITIES)))
+@click.argument('file', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'file_format', type=click.Choice(FORMATS), help='Defaults to the file extension.')
+@click.option('--batch-size', type=int, help='Rows per insert batch.')
+def import_command(entity, file, file_format, batch_size):
+    """Import ENTITY rows from a CSV or NDJSON FILE ("-" for stdin).
+
+    Rows keep the id they were exported with. Import venues and artists before shows.
+    """
+    summary = import_rows(entity, read_rows(file, _file_format(file, file_format)), batch_size)
+
+    for error in summary['errors']:
+        click.echo('row {}: {}'.format(error['row'], json.dumps(error['errors'])), err=True)
+
+    click.echo('Imported {} {}, {} rows rejected.'.format(summary['inserted'], entity, len(summary['errors'])))
+
+
+@bulk_cli.command('export')
+@click.argument('entity', type=click.Choice(list(ENTITIES)))
+@click.argument('file', type=click.File('w', encoding='utf-8'), default='-')
+@click.option('--format', 'file_format', type=click.Choice(FORMATS), help='Defaults to the file extension.')
+def export_command(entity, file, file_format):
+    """Export every ENTITY row to a CSV or NDJSON FILE (stdout by default)."""
+    chunks = write_rows(export_rows(entity), export_fieldnames(entity), _file_format(file, file_format))
+
+    for chunk in chunks:
+        file.write(chunk)
@@ -0,0 +1,244 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+from functools import wraps
+
+from flask import request, session, make_response
+
+
+class NullCacheBackend:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout):
+        pass
+
+    def version(self, namespace):
+        return 0
+
+    def bump_version(self, namespace):
+        pass
+
+
+class LRUCacheBackend:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + timeout)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    # Namespace versions are kept apart from the entries so LRU eviction can never reset
+    # one and resurrect entries that were already invalidated.
+    def version(self, namespace):
+        return self.versions.get(namespace, 0)
+
+    def bump_version(self, namespace):
+        with self.lock:
+            self.versions[namespace] = self.versions.get(namespace, 0) + 1
+
+
+class RedisCacheBackend:
+    def __init__(self, url, key_prefix='fyyur:'):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.key_prefix = key_prefix
+
+    def get(self, key):
+        value = self.client.get(self.key_prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, timeout):
+        self.client.set(self.key_prefix + key, pickle.dumps(value), ex=timeout)
+
+    def version(self, namespace):
+        return int(self.client.get(self.key_prefix + 'version:' + namespace) or 0)
+
+    def bump_version(self, namespace):
+        self.client.incr(self.key_prefix + 'version:' + namespace)
+
+
+class ResponseCache:
+    # Caches whole rendered GET responses per route and entity id. Every (route, entity id)
+    # pair is a namespace with a version number that is part of the cache key, so a write
+    # invalidates every variant of a page (e.g. all ?genre= filters) with a single bump.
+
+    def __init__(self, app=None):
+        self.backend = NullCacheBackend()
+        self.timeout = 60
+        self.hits = 0
+        self.misses = 0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        cache_type = app.config.get('CACHE_TYPE', 'lru')
+        self.timeout = app.config.get('CACHE_DEFAULT_TIMEOUT', 60)
+
+        if cache_type == 'lru':
+            self.backend = LRUCacheBackend(app.config.get('CACHE_MAX_ENTRIES', 1000))
+        elif cache_type == 'redis':
+            self.backend = RedisCacheBackend(app.config['CACHE_REDIS_URL'])
+        elif cache_type == 'null':
+            self.backend = NullCacheBackend()
+        else:
+            raise ValueError('Unknown CACHE_TYPE: ' + cache_type)
+
+    @staticmethod
+    def namespace(route, entity_id=None):
+        return route if entity_id is None else '{}:{}'.format(route, entity_id)
+
+    def invalidate(self, route, entity_id=None):
+        self.backend.bump_version(self.namespace(route, entity_id))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def key(self, route, entity_id=None):
+        namespace = self.namespace(route, entity_id)
+        return '{}:{}:{}'.format(namespace, self.backend.version(namespace), request.query_string.decode('utf-8', 'replace'))
+
+    def lookup(self, key):
+        # A hit is answered without touching the database, conditional requests included:
+        # the ETag and Last-Modified @conditional gave the page are stored along with it.
+        # Pages whose version moves on without a write (a show has started since) are
+        # served as cached until the entry expires.
+        entry = self.backend.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        if entry['etag'] is not None and is_not_modified(entry['etag'], entry['last_modified']):
+            response = make_response('', 304)
+        else:
+            response = make_response(entry['body'])
+            response.mimetype = entry['mimetype']
+
+        response.headers['X-Cache'] = 'HIT'
+        return set_validators(response, entry['etag'], entry['last_modified']) if entry['etag'] is not None else response
+
+    def store(self, key, response):
+        if response.status_code == 200 and not response.is_streamed:
+            self.backend.set(
+                key,
+                {
+                    "body": response.get_data(),
+                    "mimetype": response.mimetype,
+                    "etag": response.get_etag()[0],
+                    "last_modified": response.last_modified,
+                },
+                self.timeout
+            )
+
+        response.headers['X-Cache'] = 'MISS'
+        return response
+
+    def cached(self, route, entity_arg=None):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                # Pending flash messages are rendered into the page, so it can't be shared.
+                if request.method != 'GET' or session.get('_flashes'):
+                    return view(**kwargs)
+
+                key = self.key(route, kwargs.get(entity_arg) if entity_arg else None)
+
+                response = self.lookup(key)
+                if response is not None:
+                    return response
+
+                return self.store(key, make_response(view(**kwargs)))
+
+            return wrapper
+
+        return decorator
+
+
+def validators(version):
+    # The ETag and Last-Modified of a page version, and whether the request already has them.
+    fingerprint, last_modified = version
+    etag = hashlib.sha1(
+        repr((request.endpoint, request.query_string, fingerprint)).encode('utf-8')
+    ).hexdigest()
+
+    # HTTP dates have second resolution and are in UTC.
+    if last_modified is not None:
+        last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+
+    return etag, last_modified, is_not_modified(etag, last_modified)
+
+
+def is_not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+
+    return (
+        request.if_modified_since is not None
+        and last_modified is not None
+        and last_modified <= request.if_modified_since
+    )
+
+
+def set_validators(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True
+
+    return response
+
+
+def conditional(version_function):
+    # Answers If-None-Match / If-Modified-Since with a 304 from a cheap page version
+    # computed before the view runs, and adds ETag / Last-Modified to full responses.
+    # Goes under @response_cache.cached, so only cache misses compute the version.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            if request.method != 'GET' or session.get('_flashes'):
+                return view(**kwargs)
+
+            version = version_function(**kwargs)
+            if version is None:
+                return view(**kwargs)
+
+            etag, last_modified, not_modified = validators(version)
+            response = make_response('', 304) if not_modified else make_response(view(**kwargs))
+
+            return set_validators(response, etag, last_modified)
+
+        return wrapper
+
+    return decorator
@@ -1,13 +1,141 @@
 import os
 
-SECRET_KEY = os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+# Configuration profile: "development", "testing" or "production". A profile only supplies
+# defaults, each setting read through _setting() can still be overridden on its own by the
+# environment variable of the same name.
+FYYUR_ENV = os.environ.get("FYYUR_ENV", "development")
+
+profiles = {
+    "development": dict(
+        DEBUG=True, TESTING=False,
+        DB_POOL_SIZE=5, DB_MAX_OVERFLOW=10, DB_POOL_PRE_PING=False, DB_POOL_RECYCLE=-1, DB_STATEMENT_TIMEOUT_MS=0,
+        TEMPLATES_AUTO_RELOAD=True, TEMPLATES_BYTECODE_CACHE_DIR="", TEMPLATES_PREWARM=False,
+        ASSETS_BUNDLED=False,
+    ),
+    "testing": dict(
+        DEBUG=False, TESTING=True,
+        DB_POOL_SIZE=2, DB_MAX_OVERFLOW=0, DB_POOL_PRE_PING=False, DB_POOL_RECYCLE=-1, DB_STATEMENT_TIMEOUT_MS=5000,
+        TEMPLATES_AUTO_RELOAD=False, TEMPLATES_BYTECODE_CACHE_DIR="", TEMPLATES_PREWARM=False,
+        ASSETS_BUNDLED=False,
+    ),
+    "production": dict(
+        DEBUG=False, TESTING=False,
+        DB_POOL_SIZE=10, DB_MAX_OVERFLOW=20, DB_POOL_PRE_PING=True, DB_POOL_RECYCLE=1800, DB_STATEMENT_TIMEOUT_MS=30000,
+        TEMPLATES_AUTO_RELOAD=False, TEMPLATES_BYTECODE_CACHE_DIR=os.path.join(basedir, ".jinja_cache"),
+        TEMPLATES_PREWARM=True, ASSETS_BUNDLED=True,
+    ),
+}
+
+
+def _flag(value):
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def _setting(name, cast=str):
+    value = os.environ.get(name)
+    return profiles[FYYUR_ENV][name] if value is None else cast(value)
+
+
+def _database_uri(uri):
+    # SQLAlchemy only accepts the "postgresql" scheme, Heroku still hands out "postgres".
+    return "postgresql://" + uri[len("postgres://"):] if uri.startswith("postgres://") else uri
+
+
+DEBUG = _setting("DEBUG", _flag)
+TESTING = _setting("TESTING", _flag)
+
+# Signs sessions and flash messages, so every worker process (and every restart) must use
+# the same key: set SECRET_KEY in production, where there is no fallback. Development and
+# testing fall back to a random key per process.
+SECRET_KEY = os.environ.get("SECRET_KEY") or (None if FYYUR_ENV == "production" else os.urandom(32))
 
 # Connect to the database
 # TODO IMPLEMENT DATABASE URL ✅
-SQLALCHEMY_DATABASE_URI = "postgres://carlbowen@localhost:5432/fyrrur"
+SQLALCHEMY_DATABASE_URI = _database_uri(os.environ.get("DATABASE_URL", "postgres://carlbowen@localhost:5432/fyrrur"))
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool of each engine (server databases only, SQLite keeps its own pooling).
+# Recycle is in seconds (-1 never), the statement timeout in milliseconds (0 disables it)
+# and is applied as a Postgres session setting on every new connection
+DB_POOL_SIZE = _setting("DB_POOL_SIZE", int)
+DB_MAX_OVERFLOW = _setting("DB_MAX_OVERFLOW", int)
+DB_POOL_PRE_PING = _setting("DB_POOL_PRE_PING", _flag)
+DB_POOL_RECYCLE = _setting("DB_POOL_RECYCLE", int)
+DB_STATEMENT_TIMEOUT_MS = _setting("DB_STATEMENT_TIMEOUT_MS", int)
+
+# Optional comma-separated read replicas. When set, each GET/HEAD request reads from one
+# of them while every other request, and anything written, goes to the primary
+SQLALCHEMY_REPLICA_URIS = [
+    _database_uri(uri.strip()) for uri in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if uri.strip()
+]
+
+# Templates: re-check the files for changes on every render (only useful while editing
+# them), keep compiled templates in a directory shared by every worker and restart ("" for
+# none), and compile every template under templates/ while the app is created instead of
+# on the first request of each page
+TEMPLATES_AUTO_RELOAD = _setting("TEMPLATES_AUTO_RELOAD", _flag)
+TEMPLATES_BYTECODE_CACHE_DIR = _setting("TEMPLATES_BYTECODE_CACHE_DIR")
+TEMPLATES_PREWARM = _setting("TEMPLATES_PREWARM", _flag)
+
+# Link the bundled, content-hashed static files built by `flask assets build` (served with
+# a one-year immutable Cache-Control) instead of the original files under static/
+ASSETS_BUNDLED = _setting("ASSETS_BUNDLED", _flag)
+
+# Number of upcoming shows rendered per page of the /shows listing
+SHOWS_PER_PAGE = 30
+
+# Length in minutes of a show booked without an end time
+SHOW_DEFAULT_DURATION = 120
+
+# Maximum number of venues/artists returned by a single search
+SEARCH_RESULTS_LIMIT = 100
+
+# Search backend: "postgres" (full-text + trigram indexes), "like" (portable ILIKE scan),
+# "memory" (in-process inverted index, for SQLite/dev deployments without Postgres
+# extensions) or "auto" to pick "postgres" or "like" from the database in use
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "auto")
+
+# Response cache for the read-only pages: "lru" (in-process), "redis" (shared through a
+# local Redis-compatible server at CACHE_REDIS_URL) or "null" to disable it
+CACHE_TYPE = os.environ.get("CACHE_TYPE", "lru")
+CACHE_DEFAULT_TIMEOUT = 60
+CACHE_MAX_ENTRIES = 1000
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+# Default and maximum number of suggestions returned by /api/v1/autocomplete, and how often
+# (in seconds) each process picks up the names other processes have written
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+AUTOCOMPLETE_REFRESH_SECONDS = 5
+
+# Seconds the first page of /venues is served from each process's territory index before
+# it is rebuilt, so venues written by other processes show up
+VENUE_TERRITORIES_MAX_AGE = 30
+# Most pages kept in that index, one per ?genre= and ?limit= combination asked for
+VENUE_TERRITORIES_MAX_ENTRIES = 64
+
+# Default and maximum ?limit= page sizes of the /venues and /artists listings
+LISTING_PAGE_SIZE = 100
+LISTING_MAX_PAGE_SIZE = 1000
+
+# Rows per executemany batch (and per transaction) of `flask bulk import` and /api/v1/bulk
+BULK_BATCH_SIZE = 1000
+
+# Write transactions of the create/edit/delete pages and /api/v1/batch: how many times one
+# that failed on a serialization failure or deadlock is run again, and the isolation level
+# it runs at ("" for the database default, e.g. "REPEATABLE READ" or "SERIALIZABLE")
+WRITE_RETRIES = int(os.environ.get("WRITE_RETRIES", 3))
+WRITE_ISOLATION_LEVEL = os.environ.get("WRITE_ISOLATION_LEVEL", "")
+
+# Statements slower than this are logged individually, and the per-request log line lists
+# the slowest few
+SQL_SLOW_QUERY_MS = int(os.environ.get("SQL_SLOW_QUERY_MS", 100))
+SQL_SLOWEST_STATEMENTS = 3
+
+# Default per-request query budget (None disables it, routes can set their own with
+# @query_budget); going over it logs a warning, or raises if SQL_QUERY_BUDGET_RAISE is set
+SQL_QUERY_BUDGET = int(os.environ["SQL_QUERY_BUDGET"]) if os.environ.get("SQL_QUERY_BUDGET") else None
+SQL_QUERY_BUDGET_RAISE = TESTING
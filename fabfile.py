@@ -7,7 +7,10 @@ from fabric.contrib.console import confirm
 def test():
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "export DATABASE_URL=$BENCHMARK_DATABASE_URL && flask db upgrade"
+            " && python benchmarks/explain_indexes.py"
+            " && python benchmarks/route_benchmark.py --baseline benchmarks/baseline.json",
+            capture=True
         )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
@@ -39,9 +42,7 @@ def heroku():
 
 
 def heroku_test():
-    local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
-    )
+    local("heroku run python benchmarks/explain_indexes.py")
 
 
 def deploy():
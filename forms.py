@@ -1,48 +1,65 @@
 import re
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum
 
-from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, URL, Regexp, ValidationError, StopValidation
+from flask_wtf import FlaskForm
+from flask import current_app
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField
+from wtforms.validators import DataRequired, URL, Regexp, ValidationError, StopValidation, InputRequired, Optional
 
 
 class Genre(Enum):
-    ALTERNATIVE = 'Alternative',
-    BLUES = 'Blues',
-    CLASSICAL = 'Classical',
-    COUNTRY = 'Country',
-    ELECTRONIC = 'Electronic',
-    FOLK = 'Folk',
-    FUNK = 'Funk',
-    HIP_HOP = 'Hip-Hop',
-    HEAVY_METAL = 'Heavy Metal',
-    INSTRUMENTAL = 'Instrumental',
-    JAZZ = 'Jazz',
-    MUSICAL_THEATRE = 'Musical Theatre',
-    POP = 'Pop',
-    PUNK = 'Punk',
-    R_AND_B = 'R&B',
-    REGGAE = 'Reggae',
-    ROCK_N_ROLL = 'Rock n Roll',
-    SOUL = 'Soul',
+    ALTERNATIVE = 'Alternative'
+    BLUES = 'Blues'
+    CLASSICAL = 'Classical'
+    COUNTRY = 'Country'
+    ELECTRONIC = 'Electronic'
+    FOLK = 'Folk'
+    FUNK = 'Funk'
+    HIP_HOP = 'Hip-Hop'
+    HEAVY_METAL = 'Heavy Metal'
+    INSTRUMENTAL = 'Instrumental'
+    JAZZ = 'Jazz'
+    MUSICAL_THEATRE = 'Musical Theatre'
+    POP = 'Pop'
+    PUNK = 'Punk'
+    R_AND_B = 'R&B'
+    REGGAE = 'Reggae'
+    ROCK_N_ROLL = 'Rock n Roll'
+    SOUL = 'Soul'
     OTHER = 'Other'
 
-class ShowForm(Form):
-    artist_id = StringField(
-        'artist_id'
+class ShowForm(FlaskForm):
+    artist_id = IntegerField(
+        'artist_id', validators=[InputRequired()]
     )
-    venue_id = StringField(
-        'venue_id'
+    venue_id = IntegerField(
+        'venue_id', validators=[InputRequired()]
     )
     start_time = DateTimeField(
         'start_time',
         validators=[DataRequired()],
         default=datetime.today()
     )
+    end_time = DateTimeField(
+        'end_time', validators=[Optional()]
+    )
+
+    def validate(self, extra_validators=None):
+        if not super().validate(extra_validators):
+            return False
+
+        # Shows listed without an end time last SHOW_DEFAULT_DURATION minutes.
+        if self.end_time.data is None:
+            self.end_time.data = self.start_time.data + timedelta(minutes=current_app.config['SHOW_DEFAULT_DURATION'])
+        elif self.end_time.data <= self.start_time.data:
+            self.end_time.errors.append('End time must be after the start time.')
+            return False
+
+        return True
 
 
-class VenueForm(Form):
+class VenueForm(FlaskForm):
     name = StringField(
         'name', validators=[DataRequired()]
     )
@@ -131,7 +148,7 @@ class VenueForm(Form):
     )
 
 
-class ArtistForm(Form):
+class ArtistForm(FlaskForm):
     name = StringField(
         'name', validators=[DataRequired()]
     )
@@ -0,0 +1,44 @@
+import multiprocessing
+import os
+import shutil
+
+bind = '0.0.0.0:' + os.environ.get('PORT', '8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+# Import and create the app once in the master, see wsgi.py.
+preload_app = True
+
+# Directory the workers write their metric samples to, see metrics.py. It must exist before
+# the app is preloaded, and metric files from a previous run would otherwise be aggregated
+# with the new workers, so it is emptied here, while gunicorn reads this file.
+metrics_directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+if metrics_directory:
+    shutil.rmtree(metrics_directory, ignore_errors=True)
+    os.makedirs(metrics_directory)
+
+
+def on_starting(server):
+    # Preloading created the master's files for the metrics without labels. The master
+    # records no samples; drop them so only the workers' files are aggregated. Each worker
+    # opens files of its own on its first sample.
+    if metrics_directory:
+        for name in os.listdir(metrics_directory):
+            os.remove(os.path.join(metrics_directory, name))
+
+
+def post_fork(server, worker):
+    # Pooled connections must not be shared between processes. The master opens none while
+    # preloading, but drop any that were so each worker starts with an empty pool.
+    from models.database import db
+    from wsgi import app
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
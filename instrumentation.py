@@ -0,0 +1,138 @@
+import heapq
+import json
+import time
+
+from flask import g, has_request_context, request
+
+from models.database import db
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(max_queries):
+    # Per-route override of SQL_QUERY_BUDGET. Put it directly under @app.route.
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+
+    return decorator
+
+
+class QueryStats:
+    def __init__(self, keep):
+        self.started_at = time.perf_counter()
+        self.count = 0
+        self.total = 0.0
+        self.keep = keep
+        self.slowest = []
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.total += elapsed
+
+        # Min-heap of the slowest statements seen so far; the counter breaks ties.
+        entry = (elapsed, self.count, statement)
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, entry)
+        elif elapsed > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def slowest_statements(self):
+        return [
+            {"ms": round(elapsed * 1000, 2), "statement": statement}
+            for elapsed, _, statement in sorted(self.slowest, reverse=True)
+        ]
+
+
+class QueryInstrumentation:
+    # Counts and times every statement on the app's engines, per request. Each response gets
+    # a Server-Timing header and a structured log line, statements slower than
+    # SQL_SLOW_QUERY_MS are logged on their own, and requests over their query budget are
+    # logged (or raise, in tests).
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.logger = app.logger.getChild('sql')
+        self.slow_query_seconds = app.config.get('SQL_SLOW_QUERY_MS', 100) / 1000
+        self.keep = app.config.get('SQL_SLOWEST_STATEMENTS', 3)
+
+        # The primary and any read replicas.
+        with app.app_context():
+            for engine in db.engines.values():
+                self.instrument(engine)
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.extensions['query_instrumentation'] = self
+
+    def instrument(self, engine):
+        db.event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        db.event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    @staticmethod
+    def stats():
+        return g.get('query_stats') if has_request_context() else None
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started_at'].pop()
+
+        if elapsed > self.slow_query_seconds:
+            self.logger.warning(json.dumps({
+                "event": "slow_query",
+                "path": request.path if has_request_context() else None,
+                "ms": round(elapsed * 1000, 2),
+                "statement": statement,
+            }))
+
+        stats = self.stats()
+        if stats is not None:
+            stats.record(statement, elapsed)
+
+    def _start_request(self):
+        g.query_stats = QueryStats(self.keep)
+
+    def _budget(self):
+        view = self.app.view_functions.get(request.endpoint)
+        return getattr(view, 'query_budget', self.app.config.get('SQL_QUERY_BUDGET'))
+
+    def _finish_request(self, response):
+        stats = self.stats()
+        if stats is None:
+            return response
+
+        # Streamed bodies keep querying after this point; those statements are not counted.
+        elapsed = time.perf_counter() - stats.started_at
+        response.headers.add(
+            'Server-Timing',
+            'db;dur={:.2f};desc="{} queries", app;dur={:.2f}'.format(stats.total * 1000, stats.count, elapsed * 1000)
+        )
+
+        self.logger.info(json.dumps({
+            "event": "request",
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "ms": round(elapsed * 1000, 2),
+            "queries": stats.count,
+            "db_ms": round(stats.total * 1000, 2),
+            "slowest": stats.slowest_statements(),
+        }))
+
+        budget = self._budget()
+        if budget is not None and stats.count > budget:
+            message = '{} {} issued {} queries, budget is {}'.format(request.method, request.path, stats.count, budget)
+            if self.app.config.get('SQL_QUERY_BUDGET_RAISE'):
+                raise QueryBudgetExceeded(message)
+            self.logger.warning(message)
+
+        return response
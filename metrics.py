@@ -0,0 +1,115 @@
+import os
+import time
+
+from flask import Response, g, request
+from flask.signals import before_render_template, template_rendered
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY
+from prometheus_client import generate_latest, multiprocess
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from models.database import db
+
+# With PROMETHEUS_MULTIPROC_DIR set (before the app is imported), every worker writes its
+# samples to its own mmap'ed files in that directory without taking locks, and /metrics
+# aggregates all of them. Gunicorn should call multiprocess.mark_process_dead(worker.pid)
+# from its child_exit hook so gauges of dead workers are dropped.
+
+REQUEST_LATENCY = Histogram(
+    'fyyur_request_duration_seconds', 'Time spent handling a request.', ['endpoint', 'method']
+)
+REQUESTS = Counter(
+    'fyyur_requests_total', 'Requests handled, by response status.', ['endpoint', 'method', 'status']
+)
+TEMPLATE_RENDER_TIME = Histogram(
+    'fyyur_template_render_seconds', 'Time spent rendering a template.', ['template']
+)
+CACHE_LOOKUPS = Counter(
+    'fyyur_response_cache_lookups_total', 'Response cache lookups, by result.', ['result']
+)
+WRITE_TRANSACTION_RETRIES = Counter(
+    'fyyur_db_write_retries_total', 'Write transactions run again after a serialization failure or deadlock.'
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    'fyyur_db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled database connection.',
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+)
+POOL_CHECKED_OUT = Gauge(
+    'fyyur_db_pool_checked_out', 'Connections checked out of the pool, sampled as each response is sent.', multiprocess_mode='livesum'
+)
+POOL_OVERFLOW = Gauge(
+    'fyyur_db_pool_overflow', 'Connections open beyond the pool size.', multiprocess_mode='livesum'
+)
+
+
+class TimedQueuePool(QueuePool):
+    # QueuePool that records how long each checkout waited for a free connection.
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started_at)
+
+
+class Metrics:
+    # Must be set up before db.init_app() so the engine is created with TimedQueuePool.
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # SQLite picks its own pool classes; only server databases get the timed pool.
+        if make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name() != 'sqlite':
+            app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {}).setdefault('poolclass', TimedQueuePool)
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        before_render_template.connect(self._start_render, app)
+        template_rendered.connect(self._finish_render, app)
+
+    @staticmethod
+    def _start_request():
+        g.request_started_at = time.perf_counter()
+
+    @staticmethod
+    def _finish_request(response):
+        # Unmatched URLs share one label so 404 scans can't blow up the series count.
+        endpoint = request.endpoint or 'unmatched'
+
+        started_at = g.get('request_started_at')
+        if started_at is not None:
+            REQUEST_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - started_at)
+        REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+
+        cache_result = response.headers.get('X-Cache')
+        if cache_result is not None:
+            CACHE_LOOKUPS.labels(cache_result.lower()).inc()
+
+        pool = db.engine.pool
+        if isinstance(pool, QueuePool):
+            POOL_CHECKED_OUT.set(pool.checkedout())
+            POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+        return response
+
+    @staticmethod
+    def _start_render(app, template, context, **extra):
+        g.setdefault('template_render_started_at', []).append(time.perf_counter())
+
+    @staticmethod
+    def _finish_render(app, template, context, **extra):
+        started_at = g.template_render_started_at.pop()
+        TEMPLATE_RENDER_TIME.labels(template.name).observe(time.perf_counter() - started_at)
+
+    @staticmethod
+    def response():
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+
+        return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,74 @@
+"""add show end time and booking exclusion constraints
+
+Revision ID: 2b7c9e4d1a86
+Revises: 8d2e6b1f4a73
+Create Date: 2026-10-17 18:40:07.551920
+
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b7c9e4d1a86'
+down_revision = '8d2e6b1f4a73'
+branch_labels = None
+depends_on = None
+
+# config.SHOW_DEFAULT_DURATION when this was written; existing shows had no end time.
+DEFAULT_DURATION_MINUTES = 120
+
+# The expression and predicate must match models.bookings.overlapping_shows_query()
+# exactly, otherwise the planner will not pick the constraints' indexes up.
+BOOKING_CONSTRAINTS = (('Show_venue_booking_excl', 'venue_id'), ('Show_artist_booking_excl', 'artist_id'))
+BOOKING_PERIOD = 'tsrange(start_time, end_time)'
+BOOKING_PREDICATE = 'start_time IS NOT NULL AND end_time IS NOT NULL'
+
+
+def upgrade():
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+
+    if op.get_bind().dialect.name != 'postgresql':
+        shows = sa.table('Show', sa.column('id'), sa.column('start_time', sa.DateTime()), sa.column('end_time', sa.DateTime()))
+        rows = op.get_bind().execute(sa.select(shows.c.id, shows.c.start_time).where(shows.c.start_time.is_not(None))).all()
+        if rows:
+            op.get_bind().execute(
+                shows.update().where(shows.c.id == sa.bindparam('show_id')),
+                [{'show_id': id, 'end_time': start_time + timedelta(minutes=DEFAULT_DURATION_MINUTES)} for id, start_time in rows]
+            )
+        return
+
+    # Give every show the default length, but cut short where the next show of its venue or
+    # artist starts earlier, so existing bookings never violate the constraints below.
+    op.execute(
+        'UPDATE "Show" SET end_time = booked.end_time '
+        'FROM ('
+        'SELECT id, LEAST('
+        "start_time + interval '{} minutes', "
+        'LEAD(start_time) OVER (PARTITION BY venue_id ORDER BY start_time, id), '
+        'LEAD(start_time) OVER (PARTITION BY artist_id ORDER BY start_time, id)'
+        ') AS end_time '
+        'FROM "Show" WHERE start_time IS NOT NULL'
+        ') AS booked '
+        'WHERE "Show".id = booked.id'.format(DEFAULT_DURATION_MINUTES)
+    )
+
+    # btree_gist lets the integer equality share a GiST index with the range overlap.
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+
+    for name, key in BOOKING_CONSTRAINTS:
+        op.execute(
+            'ALTER TABLE "Show" ADD CONSTRAINT "{}" EXCLUDE USING gist ({} WITH =, {} WITH &&) WHERE ({})'.format(
+                name, key, BOOKING_PERIOD, BOOKING_PREDICATE
+            )
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for name, _ in reversed(BOOKING_CONSTRAINTS):
+            op.execute('ALTER TABLE "Show" DROP CONSTRAINT IF EXISTS "{}"'.format(name))
+
+    op.drop_column('Show', 'end_time')
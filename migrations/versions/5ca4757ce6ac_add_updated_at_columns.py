@@ -0,0 +1,32 @@
+"""add updated_at columns
+
+Revision ID: 5ca4757ce6ac
+Revises: c4939f26a3dc
+Create Date: 2026-10-17 13:55:30.904711
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5ca4757ce6ac'
+down_revision = 'c4939f26a3dc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Artist', 'Venue', 'Show'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(
+                sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now())
+            )
+            batch_op.create_index('ix_{}_updated_at'.format(table), ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in ('Show', 'Venue', 'Artist'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_index('ix_{}_updated_at'.format(table))
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,57 @@
+"""add show summaries
+
+Revision ID: 8d2e6b1f4a73
+Revises: 5ca4757ce6ac
+Create Date: 2026-10-17 16:12:41.218305
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2e6b1f4a73'
+down_revision = '5ca4757ce6ac'
+branch_labels = None
+depends_on = None
+
+SUMMARIES = (('VenueShowSummary', 'Venue', 'venue_id'), ('ArtistShowSummary', 'Artist', 'artist_id'))
+
+
+def upgrade():
+    now = datetime.now()
+
+    for table, entity_table, key in SUMMARIES:
+        op.create_table(
+            table,
+            sa.Column(key, sa.Integer(), nullable=False),
+            sa.Column('upcoming_shows_count', sa.Integer(), nullable=False),
+            sa.Column('past_shows_count', sa.Integer(), nullable=False),
+            sa.Column('next_show_at', sa.DateTime(), nullable=True),
+            sa.Column('rolled_over_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint([key], ['{}.id'.format(entity_table)], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint(key)
+        )
+        op.create_index('ix_{}_next_show_at'.format(table), table, ['next_show_at'], unique=False)
+
+        # Backfill every existing venue and artist, split at the time of the upgrade.
+        op.execute(
+            sa.text(
+                'INSERT INTO "{table}" ({key}, upcoming_shows_count, past_shows_count, next_show_at, rolled_over_at) '
+                'SELECT e.id, '
+                'SUM(CASE WHEN s.start_time > :now THEN 1 ELSE 0 END), '
+                'SUM(CASE WHEN s.start_time <= :now THEN 1 ELSE 0 END), '
+                'MIN(CASE WHEN s.start_time > :now THEN s.start_time END), '
+                ':now '
+                'FROM "{entity_table}" e LEFT JOIN "Show" s ON s.{key} = e.id '
+                'GROUP BY e.id'.format(table=table, entity_table=entity_table, key=key)
+            ).bindparams(sa.bindparam('now', now, type_=sa.DateTime()))
+        )
+
+
+def downgrade():
+    for table, _, _ in reversed(SUMMARIES):
+        op.drop_index('ix_{}_next_show_at'.format(table), table_name=table)
+        op.drop_table(table)
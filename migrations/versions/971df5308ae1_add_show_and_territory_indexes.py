@@ -0,0 +1,32 @@
+"""add show and territory indexes
+
+Revision ID: 971df5308ae1
+Revises: f7032f1b2b95
+Create Date: 2026-10-17 11:26:52.640315
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '971df5308ae1'
+down_revision = 'f7032f1b2b95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_start_time', 'Show', ['start_time'], unique=False)
+    op.create_index('ix_Venue_state_city', 'Venue', ['state', 'city'], unique=False)
+    op.create_index('ix_Artist_state_city', 'Artist', ['state', 'city'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Artist_state_city', table_name='Artist')
+    op.drop_index('ix_Venue_state_city', table_name='Venue')
+    op.drop_index('ix_Show_start_time', table_name='Show')
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
@@ -0,0 +1,120 @@
+"""normalise genres into a Genre table
+
+Revision ID: c4939f26a3dc
+Revises: 971df5308ae1
+Create Date: 2026-10-17 12:41:07.118342
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4939f26a3dc'
+down_revision = '971df5308ae1'
+branch_labels = None
+depends_on = None
+
+# The values of forms.Genre when this migration was written.
+SEEDED_GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk', 'Hip-Hop',
+    'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae',
+    'Rock n Roll', 'Soul', 'Other',
+]
+
+genre_table = sa.table('Genre', sa.column('id', sa.Integer), sa.column('name', sa.String))
+
+
+def split_genres(value):
+    # The create handlers stored "Jazz, Rock n Roll" while the edit handlers stored the
+    # joined tuple values, e.g. "('Jazz',),('Rock n Roll',)". Both reduce to the same names.
+    names = []
+    for part in (value or '').split(','):
+        name = re.sub(r'[^A-Za-z0-9&\- ]+', '', part).strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def upgrade():
+    op.create_table('Genre',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('artist_genres',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('artist_id', 'genre_id')
+    )
+    op.create_index('ix_artist_genres_genre_id', 'artist_genres', ['genre_id'], unique=False)
+    op.create_table('venue_genres',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id', 'genre_id')
+    )
+    op.create_index('ix_venue_genres_genre_id', 'venue_genres', ['genre_id'], unique=False)
+
+    op.bulk_insert(genre_table, [{'name': name} for name in SEEDED_GENRES])
+
+    # Move the comma-joined genre strings into the association tables.
+    connection = op.get_bind()
+    genre_ids = {name.lower(): id for id, name in connection.execute(sa.select(genre_table.c.id, genre_table.c.name))}
+
+    for table, association, key in (('Artist', 'artist_genres', 'artist_id'), ('Venue', 'venue_genres', 'venue_id')):
+        source = sa.table(table, sa.column('id', sa.Integer), sa.column('genres', sa.String))
+        target = sa.table(association, sa.column(key, sa.Integer), sa.column('genre_id', sa.Integer))
+        rows = []
+
+        for id, genres in connection.execute(sa.select(source.c.id, source.c.genres)):
+            for name in split_genres(genres):
+                if name.lower() not in genre_ids:
+                    genre_ids[name.lower()] = connection.execute(
+                        genre_table.insert().values(name=name).returning(genre_table.c.id)
+                    ).scalar()
+                rows.append({key: id, 'genre_id': genre_ids[name.lower()]})
+
+        if rows:
+            op.bulk_insert(target, rows)
+
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('genres')
+
+
+def downgrade():
+    connection = op.get_bind()
+
+    for table, association, key in (('Artist', 'artist_genres', 'artist_id'), ('Venue', 'venue_genres', 'venue_id')):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('genres', sa.String(length=120), nullable=False, server_default=''))
+
+        source = sa.table(table, sa.column('id', sa.Integer), sa.column('genres', sa.String))
+        target = sa.table(association, sa.column(key, sa.Integer), sa.column('genre_id', sa.Integer))
+        names_by_id = {}
+
+        rows = connection.execute(
+            sa.select(target.c[key], genre_table.c.name)
+                .select_from(target.join(genre_table, genre_table.c.id == target.c.genre_id))
+                .order_by(target.c[key], genre_table.c.name)
+        )
+        for id, name in rows:
+            names_by_id.setdefault(id, []).append(name)
+
+        for id, names in names_by_id.items():
+            connection.execute(source.update().where(source.c.id == id).values(genres=', '.join(names)))
+
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('genres', server_default=None)
+
+    op.drop_index('ix_venue_genres_genre_id', table_name='venue_genres')
+    op.drop_table('venue_genres')
+    op.drop_index('ix_artist_genres_genre_id', table_name='artist_genres')
+    op.drop_table('artist_genres')
+    op.drop_table('Genre')
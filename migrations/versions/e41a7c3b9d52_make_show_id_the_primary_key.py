@@ -0,0 +1,34 @@
+"""make Show.id the primary key
+
+Revision ID: e41a7c3b9d52
+Revises: 2b7c9e4d1a86
+Create Date: 2026-10-18 09:21:54.310488
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41a7c3b9d52'
+down_revision = '2b7c9e4d1a86'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The initial schema used to key Show on (id, venue_id, artist_id), which SQLite rejects
+    # with an autoincrementing id; it now creates the id key directly. Databases created
+    # before that (Postgres only) still have the composite key and are moved over here.
+    primary_key = sa.inspect(op.get_bind()).get_pk_constraint('Show')
+
+    if primary_key['constrained_columns'] == ['id']:
+        return
+
+    op.drop_constraint(primary_key['name'], 'Show', type_='primary')
+    op.create_primary_key('Show_pkey', 'Show', ['id'])
+
+
+def downgrade():
+    # The composite key added nothing, id is unique on its own.
+    pass
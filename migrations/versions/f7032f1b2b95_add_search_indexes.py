@@ -0,0 +1,44 @@
+"""add full-text and trigram search indexes
+
+Revision ID: f7032f1b2b95
+Revises: 604d26d9ccfa
+Create Date: 2026-10-17 10:03:18.227904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7032f1b2b95'
+down_revision = '604d26d9ccfa'
+branch_labels = None
+depends_on = None
+
+# The indexed expression must match models.search.search_document() exactly, otherwise
+# the planner will not pick the index up.
+SEARCH_DOCUMENT = "to_tsvector('simple', name || ' ' || city || ' ' || state)"
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    for table in ('Venue', 'Artist'):
+        op.execute(
+            'CREATE INDEX "ix_{0}_search_document" ON "{0}" USING gin ({1})'.format(table, SEARCH_DOCUMENT)
+        )
+        op.execute(
+            'CREATE INDEX "ix_{0}_name_trgm" ON "{0}" USING gin (name gin_trgm_ops)'.format(table)
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table in ('Venue', 'Artist'):
+        op.execute('DROP INDEX IF EXISTS "ix_{0}_name_trgm"'.format(table))
+        op.execute('DROP INDEX IF EXISTS "ix_{0}_search_document"'.format(table))
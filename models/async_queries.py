@@ -0,0 +1,166 @@
+import asyncio
+from datetime import datetime
+
+from flask import g
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import selectinload
+
+from models.database import db, engine_options, REPLICA_BIND_PREFIX
+from models.models import Artist
+from models.models import Venue
+from models.queries import upcoming_shows_query, venue_shows_query, artist_shows_query, show_counts_query
+from models.queries import venue_listing_query, artist_listing_query, territories_page
+from models.queries import cached_venue_territories, publish_venue_territories
+from models.queries import venue_page_version_query, artist_page_version_query, detail_page_version
+from models.queries import listing_page_version_query, listing_version
+from models.search import search, search_query
+
+# Async counterparts of the read helpers in queries.py, used by the ASGI read path. They run
+# the same statements (built by the shared *_query() functions) on an asyncio engine, so the
+# event loop serves other requests while a query waits on the database.
+
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_url(uri):
+    url = make_url(uri)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+
+def async_engine_options(config, uri):
+    options = engine_options(config, uri)
+
+    # asyncpg takes session settings as server_settings rather than libpq's "options".
+    if 'connect_args' in options:
+        options['connect_args'] = {
+            'server_settings': {'statement_timeout': str(config['DB_STATEMENT_TIMEOUT_MS'])}
+        }
+
+    return options
+
+
+class AsyncDatabase:
+    # One async engine for the primary and each read replica, keyed like db.engines. Each
+    # engine has its own pool, sized by the same DB_POOL_* settings as the sync engines.
+
+    def __init__(self, app=None):
+        self.engines = {}
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        uris = {None: app.config['SQLALCHEMY_DATABASE_URI']}
+        for number, uri in enumerate(app.config.get('SQLALCHEMY_REPLICA_URIS', [])):
+            uris[REPLICA_BIND_PREFIX + str(number)] = uri
+
+        instrumentation = app.extensions.get('query_instrumentation')
+
+        for key, uri in uris.items():
+            engine = create_async_engine(async_url(uri), **async_engine_options(app.config, uri))
+            if instrumentation is not None:
+                instrumentation.instrument(engine.sync_engine)
+            self.engines[key] = engine
+
+    def session(self):
+        # Reads from the replica picked for the request by configure_database(), if any.
+        return AsyncSession(self.engines[g.get('db_replica')], expire_on_commit=False)
+
+    async def dispose(self):
+        for engine in self.engines.values():
+            await engine.dispose()
+
+
+async def _all(session, query):
+    return (await session.execute(query.statement)).all()
+
+
+async def _one(session, query):
+    return (await session.execute(query.statement)).one()
+
+
+async def newest(session, model, limit: int = 10):
+    return (await session.scalars(db.select(model).order_by(db.desc(model.id)).limit(limit))).all()
+
+
+async def upcoming_shows_page(session, now: datetime, after: tuple = None, limit: int = 30):
+    rows = await _all(session, upcoming_shows_query(now, after, limit))
+
+    return rows[:limit], len(rows) > limit
+
+
+async def venue_territories(session, genre: str = None, after: int = None, limit: int = 100):
+    if after is None:
+        page, generation = cached_venue_territories(genre, limit)
+        if page is not None:
+            return page
+
+    page = territories_page(await _all(session, venue_listing_query(genre, after).limit(limit + 1)), limit)
+
+    if after is None:
+        publish_venue_territories(genre, limit, page, generation)
+
+    return page
+
+
+async def artists_listing(session, genre: str = None, after: int = None, limit: int = 100):
+    rows = await _all(session, artist_listing_query(genre, after).limit(limit + 1))
+
+    return rows[:limit], rows[limit - 1].id if len(rows) > limit else None
+
+
+async def _detail(session, model, entity_id: int):
+    # Genres are loaded up front, an async session can't lazy load them while rendering.
+    statement = db.select(model).options(selectinload(model.genres)).filter(model.id == entity_id)
+
+    return (await session.scalars(statement)).one_or_none()
+
+
+async def venue_page(session, venue_id: int, now: datetime):
+    # (venue, shows, (upcoming count, past count)), or None if the venue doesn't exist.
+    venue = await _detail(session, Venue, venue_id)
+    if venue is None:
+        return None
+
+    shows = await _all(session, venue_shows_query(venue_id, now))
+    counts = await _one(session, show_counts_query(Venue, venue_id, now))
+
+    return venue, shows, tuple(counts)
+
+
+async def artist_page(session, artist_id: int, now: datetime):
+    artist = await _detail(session, Artist, artist_id)
+    if artist is None:
+        return None
+
+    shows = await _all(session, artist_shows_query(artist_id, now))
+    counts = await _one(session, show_counts_query(Artist, artist_id, now))
+
+    return artist, shows, tuple(counts)
+
+
+async def venue_page_version(session, venue_id: int, now: datetime):
+    return detail_page_version(await _one(session, venue_page_version_query(venue_id, now)))
+
+
+async def artist_page_version(session, artist_id: int, now: datetime):
+    return detail_page_version(await _one(session, artist_page_version_query(artist_id, now)))
+
+
+async def listing_page_version(session, *models, now: datetime = None):
+    return listing_version(await _one(session, listing_page_version_query(*models, now=now)))
+
+
+async def search_matches(session, model, search_input: str, limit: int = 100):
+    query = search_query(model, search_input, limit)
+
+    # The in-memory backend answers from its index, which loads rows through the sync
+    # session on first use, so it runs in a worker thread.
+    if query is None:
+        return await asyncio.to_thread(search, model, search_input, limit)
+
+    return await _all(session, query)
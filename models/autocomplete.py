@@ -0,0 +1,221 @@
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import namedtuple
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy.orm import Session
+
+from models.database import db
+from models.models import Artist
+from models.models import Venue
+
+WORD_PATTERN = re.compile(r'\w+')
+
+# Rows written by other processes are picked up through updated_at. Looking back this much
+# further than the newest row seen also catches transactions that committed late.
+CATCH_UP_OVERLAP = timedelta(minutes=1)
+
+# Writes of at least this many rows are merged into the index with one sort.
+SORT_THRESHOLD = 100
+
+Suggestion = namedtuple('Suggestion', ['id', 'name'])
+
+
+def name_key(name: str):
+    # "The Blue  Room!" -> "the blue room", so spacing, punctuation and case don't matter.
+    return ' '.join(WORD_PATTERN.findall((name or '').casefold()))
+
+
+class PrefixIndex:
+    # Names of one model in two sorted lists of (key, id): one entry per name, for matches at
+    # the start of the name, and one per later word of it, for matches at a word start ("blu"
+    # finds "The Blue Room"). A lookup is a bisect into each list and a scan of the matches
+    # until enough are found, however many names there are.
+
+    def __init__(self, model):
+        self.model = model
+        self.loaded = False
+        self.names = {}
+        self.name_keys = []
+        self.word_keys = []
+        self.watermark = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def word_suffixes(key):
+        position = key.find(' ')
+        while position != -1:
+            yield key[position + 1:]
+            position = key.find(' ', position + 1)
+
+    def add(self, id, name):
+        self.remove(id)
+        key = name_key(name)
+
+        self.names[id] = name
+        insort(self.name_keys, (key, id))
+        for suffix in self.word_suffixes(key):
+            insort(self.word_keys, (suffix, id))
+
+    def remove(self, id):
+        name = self.names.pop(id, None)
+        if name is None:
+            return
+
+        key = name_key(name)
+        del self.name_keys[bisect_left(self.name_keys, (key, id))]
+        for suffix in self.word_suffixes(key):
+            del self.word_keys[bisect_left(self.word_keys, (suffix, id))]
+
+    def apply(self, names):
+        # names maps ids to their new name, or to None for deleted rows.
+        with self.lock:
+            if not self.loaded:
+                return
+
+            if len(names) < SORT_THRESHOLD:
+                for id, name in names.items():
+                    if name is None:
+                        self.remove(id)
+                    else:
+                        self.add(id, name)
+                return
+
+            # Many rows at once (bulk imports): append them all and sort once, rather than
+            # shifting the lists for every row.
+            for id in names:
+                self.remove(id)
+
+            for id, name in names.items():
+                if name is not None:
+                    key = name_key(name)
+                    self.names[id] = name
+                    self.name_keys.append((key, id))
+                    self.word_keys.extend((suffix, id) for suffix in self.word_suffixes(key))
+
+            self.name_keys.sort()
+            self.word_keys.sort()
+
+    def _rows(self, since=None):
+        query = self.model.query.with_entities(self.model.id, self.model.name, self.model.updated_at)
+        if since is not None:
+            query = query.filter(self.model.updated_at >= since - CATCH_UP_OVERLAP)
+        return query.all()
+
+    def _advance(self, rows):
+        for row in rows:
+            if self.watermark is None or row.updated_at > self.watermark:
+                self.watermark = row.updated_at
+
+    def refresh(self):
+        # Load every name on first use, then every AUTOCOMPLETE_REFRESH_SECONDS reload the
+        # rows other processes have written since (this process applies its own writes as
+        # they commit). Rows other processes delete stay until the process restarts.
+        max_age = current_app.config['AUTOCOMPLETE_REFRESH_SECONDS']
+        now = time.monotonic()
+
+        if self.loaded and now - self.checked_at < max_age:
+            return
+
+        with self.lock:
+            if not self.loaded:
+                rows = self._rows()
+                self.names = {row.id: row.name for row in rows}
+                self.name_keys = sorted((name_key(row.name), row.id) for row in rows)
+                self.word_keys = sorted(
+                    (suffix, row.id) for row in rows for suffix in self.word_suffixes(name_key(row.name))
+                )
+                self.loaded = True
+            elif now - self.checked_at >= max_age:
+                rows = self._rows(self.watermark) if self.watermark is not None else self._rows()
+                for row in rows:
+                    if self.names.get(row.id) != row.name:
+                        self.add(row.id, row.name)
+            else:
+                return
+
+            self._advance(rows)
+            self.checked_at = now
+
+    def complete(self, prefix: str, limit: int):
+        # Names starting with the prefix first, then names with a later word starting with it,
+        # each in alphabetical order.
+        key = name_key(prefix)
+        if not key:
+            return []
+
+        self.refresh()
+
+        suggestions = []
+        seen = set()
+
+        with self.lock:
+            for keys in (self.name_keys, self.word_keys):
+                position = bisect_left(keys, (key,))
+
+                while len(suggestions) < limit and position < len(keys) and keys[position][0].startswith(key):
+                    id = keys[position][1]
+                    if id not in seen:
+                        seen.add(id)
+                        suggestions.append(Suggestion(id, self.names[id]))
+                    position += 1
+
+        return suggestions
+
+
+INDEXES = {Venue: PrefixIndex(Venue), Artist: PrefixIndex(Artist)}
+
+PENDING_KEY = 'autocomplete_pending'
+
+
+# ----------------------------------------------------------------------------#
+# Incremental maintenance.
+# ----------------------------------------------------------------------------#
+
+# Names are taken from the rows as they are flushed and only applied to the index once the
+# transaction commits, so a rolled back venue never shows up as a suggestion.
+
+def _pending(target):
+    session = db.object_session(target)
+    return session.info.setdefault(PENDING_KEY, {}).setdefault(type(target), {}) if session is not None else {}
+
+
+def _name_written(mapper, connection, target):
+    if db.inspect(target).attrs.name.history.has_changes():
+        _pending(target)[target.id] = target.name
+
+
+def _row_deleted(mapper, connection, target):
+    _pending(target)[target.id] = None
+
+
+def _apply_writes(session):
+    for model, names in session.info.pop(PENDING_KEY, {}).items():
+        INDEXES[model].apply(names)
+
+
+def _discard_writes(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+for _model in INDEXES:
+    db.event.listen(_model, 'after_insert', _name_written)
+    db.event.listen(_model, 'after_update', _name_written)
+    db.event.listen(_model, 'after_delete', _row_deleted)
+
+db.event.listen(Session, 'after_commit', _apply_writes)
+db.event.listen(Session, 'after_rollback', _discard_writes)
+
+
+def index_rows(model, rows):
+    # Core bulk inserts bypass the mapper events, so their committed rows are added here.
+    if model in INDEXES:
+        INDEXES[model].apply({row['id']: row['name'] for row in rows})
+
+
+def autocomplete(model, prefix: str, limit: int = 10):
+    return INDEXES[model].complete(prefix, limit)
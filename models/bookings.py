@@ -0,0 +1,130 @@
+from collections import defaultdict
+from datetime import datetime
+
+from models.database import db
+from models.models import Artist
+from models.models import Show
+from models.models import Venue
+from models.writes import sqlstate
+
+# Column naming the venue or artist in Show. Neither may be booked for two shows at once.
+BOOKING_KEYS = {Venue: 'venue_id', Artist: 'artist_id'}
+
+# SQLSTATE of a Postgres exclusion constraint violation, raised when a show overlaps another
+# show of its venue or artist that was booked concurrently.
+EXCLUSION_VIOLATION = '23P01'
+
+
+def overlapping_shows_query(model, entity_id: int, start_time: datetime, end_time: datetime, exclude_id: int = None):
+    # The shows of a venue or artist overlapping [start_time, end_time). On Postgres the
+    # condition is written exactly like the exclusion constraints of migration 2b7c9e4d1a86,
+    # expression and predicate both, so it is answered from their GiST index; elsewhere from
+    # the (venue_id/artist_id, start_time) index.
+    key = getattr(Show, BOOKING_KEYS[model])
+
+    if db.engine.dialect.name == 'postgresql':
+        overlaps = db.func.tsrange(Show.start_time, Show.end_time).op('&&')(db.func.tsrange(start_time, end_time))
+    else:
+        overlaps = db.and_(Show.start_time < end_time, Show.end_time > start_time)
+
+    query = (
+        Show
+            .query
+            .with_entities(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.end_time)
+            .filter(key == entity_id, Show.start_time.is_not(None), Show.end_time.is_not(None), overlaps)
+    )
+
+    if exclude_id is not None:
+        query = query.filter(Show.id != exclude_id)
+
+    return query.order_by(Show.start_time)
+
+
+def _booked_message(model, entity_id, start_time, end_time):
+    return '{} with ID {} is already booked from {:%Y-%m-%d %H:%M} to {:%Y-%m-%d %H:%M}.'.format(
+        model.__name__, entity_id, start_time, end_time
+    )
+
+
+def booking_errors(values: dict, exclude_id: int = None):
+    # Checks a show about to be written (validated column values, as from ShowForm) against
+    # the database: its venue and artist must exist and be free for the whole show. Returns
+    # form-style errors, empty if the show can be booked. exclude_id is the show being edited.
+    exists = db.session.execute(
+        db.select(
+            db.select(Venue.id).where(Venue.id == values['venue_id']).exists(),
+            db.select(Artist.id).where(Artist.id == values['artist_id']).exists(),
+        )
+    ).one()
+
+    errors = {}
+    for (model, key), found in zip(BOOKING_KEYS.items(), exists):
+        if not found:
+            errors[key] = ['{} with ID {} does not exist.'.format(model.__name__, values[key])]
+            continue
+
+        conflict = overlapping_shows_query(
+            model, values[key], values['start_time'], values['end_time'], exclude_id
+        ).first()
+        if conflict is not None:
+            errors[key] = [_booked_message(model, values[key], conflict.start_time, conflict.end_time)]
+
+    return errors
+
+
+def conflicting_bookings(shows, replaced=()):
+    # The same check as booking_errors() for many new shows at once (bulk imports), given
+    # as {row number: column values} with existing venues and artists: one query per side
+    # for the shows already booked within the span of the batch, then a sweep that also finds
+    # rows of the batch overlapping each other. Returns {row number: errors}. replaced are the
+    # ids of booked shows the batch updates or deletes, whose current slots are left out.
+    shows = {number: values for number, values in shows.items() if values.get('start_time') and values.get('end_time')}
+    errors = {}
+
+    if not shows:
+        return errors
+
+    first_start = min(values['start_time'] for values in shows.values())
+    last_end = max(values['end_time'] for values in shows.values())
+
+    for model, key in BOOKING_KEYS.items():
+        column = getattr(Show, key)
+        bookings = defaultdict(list)
+
+        existing = (
+            Show
+                .query
+                .with_entities(column, Show.start_time, Show.end_time)
+                .filter(
+                    column.in_({values[key] for values in shows.values()}),
+                    Show.start_time < last_end,
+                    Show.end_time > first_start,
+                )
+        )
+        if replaced:
+            existing = existing.filter(Show.id.not_in(replaced))
+        for entity_id, start_time, end_time in existing:
+            bookings[entity_id].append((start_time, end_time, None))
+        for number, values in shows.items():
+            bookings[values[key]].append((values['start_time'], values['end_time'], number))
+
+        for entity_id, periods in bookings.items():
+            # Sorted by start, a booking overlaps an earlier one exactly when it starts before
+            # the latest end seen so far; the row of the batch among the two is reported.
+            periods.sort(key=lambda period: (period[0], period[1]))
+            latest = None
+
+            for period in periods:
+                if latest is not None and period[0] < latest[1] and period[0] < period[1]:
+                    number, other = (period[2], latest) if period[2] is not None else (latest[2], period)
+                    if number is not None and number not in errors:
+                        errors[number] = {key: [_booked_message(model, entity_id, other[0], other[1])]}
+
+                if latest is None or period[1] > latest[1]:
+                    latest = period
+
+    return errors
+
+
+def is_booking_conflict(error):
+    return sqlstate(error) == EXCLUSION_VIOLATION
@@ -1,3 +1,68 @@
+import random
+
+from flask import g, has_request_context, request
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy.engine import make_url
+
+REPLICA_BIND_PREFIX = 'replica_'
+
+
+class RoutingSession(Session):
+    # Reads go to the replica picked for the current request, if one was. Flushes always go
+    # to the primary, as does everything outside a GET/HEAD request.
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = g.get('db_replica') if bind is None and has_request_context() else None
+
+        if replica is not None and not self._flushing:
+            return self._db.engines[replica]
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def engine_options(config, uri):
+    backend = make_url(uri).get_backend_name()
+
+    # SQLite picks its own pool classes, which don't all take sizing arguments.
+    if backend == 'sqlite':
+        return {}
+
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+    }
+
+    if backend == 'postgresql' and config['DB_STATEMENT_TIMEOUT_MS']:
+        options['connect_args'] = {'options': '-c statement_timeout={}'.format(config['DB_STATEMENT_TIMEOUT_MS'])}
+
+    return options
+
+
+def configure_database(app):
+    # Explicit SQLALCHEMY_ENGINE_OPTIONS win over the pool settings of the profile.
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    for key, value in engine_options(app.config, app.config['SQLALCHEMY_DATABASE_URI']).items():
+        options.setdefault(key, value)
+
+    binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+    replicas = []
+
+    for number, uri in enumerate(app.config.get('SQLALCHEMY_REPLICA_URIS', [])):
+        key = REPLICA_BIND_PREFIX + str(number)
+        binds[key] = dict(engine_options(app.config, uri), url=uri)
+        replicas.append(key)
+
+    db.init_app(app)
 
-db = SQLAlchemy()
+    if replicas:
+        @app.before_request
+        def pick_replica():
+            # Decided once per request, so every read of a page sees the same replica.
+            if request.method in ('GET', 'HEAD'):
+                g.db_replica = random.choice(replicas)
@@ -4,21 +4,57 @@ from datetime import datetime
 from models.database import db
 
 
+@dataclass
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id: int = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    name: str = db.Column(db.String(120), nullable=False, unique=True)
+
+
+# Association tables. The composite primary keys serve lookups by artist/venue, the extra
+# genre_id indexes serve the ?genre= listing filters.
+artist_genres = db.Table(
+    'artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_artist_genres_genre_id', 'genre_id'),
+)
+
+venue_genres = db.Table(
+    'venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_venue_genres_genre_id', 'genre_id'),
+)
+
+
+# *************************************************************************************
+# *************************************************************************************
+# *************************************************************************************
+
 @dataclass
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_Artist_state_city', 'state', 'city'),
+        db.Index('ix_Artist_updated_at', 'updated_at'),
+    )
 
     id: int = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name: str = db.Column(db.String, nullable=False)
     city: str = db.Column(db.String(120), nullable=False)
     state: str = db.Column(db.String(120), nullable=False)
     phone: str = db.Column(db.String(120), nullable=True)
-    genres: str = db.Column(db.String(120), nullable=False)
     image_link: str = db.Column(db.String(500), nullable=True)
     facebook_link: str = db.Column(db.String(120), nullable=True)
     website: str = db.Column(db.String(120), nullable=True)
     seeking_venue: bool = db.Column(db.Boolean, nullable=False)
     seeking_description: str = db.Column(db.String(500), nullable=True)
+    updated_at: datetime = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), onupdate=db.func.now())
+
+    # Relationships
+    genres = db.relationship('Genre', secondary=artist_genres, order_by='Genre.name')
 
 
 # *************************************************************************************
@@ -28,6 +64,10 @@ class Artist(db.Model):
 @dataclass
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index('ix_Venue_state_city', 'state', 'city'),
+        db.Index('ix_Venue_updated_at', 'updated_at'),
+    )
 
     id: int = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name: str = db.Column(db.String, nullable=False)
@@ -35,12 +75,15 @@ class Venue(db.Model):
     state: str = db.Column(db.String(120), nullable=False)
     phone: str = db.Column(db.String(120), nullable=True)
     image_link: str = db.Column(db.String(500), nullable=True)
-    genres: str = db.Column(db.String(120), nullable=False)
     address: str = db.Column(db.String(120), nullable=False)
     website: str = db.Column(db.String(120), nullable=True)
     facebook_link: str = db.Column(db.String(120), nullable=True)
     seeking_talent: bool = db.Column(db.Boolean, nullable=False)
     seeking_description: str = db.Column(db.String(500), nullable=True)
+    updated_at: datetime = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), onupdate=db.func.now())
+
+    # Relationships
+    genres = db.relationship('Genre', secondary=venue_genres, order_by='Genre.name')
 
 
 # *************************************************************************************
@@ -51,14 +94,73 @@ class Venue(db.Model):
 @dataclass
 class Show(db.Model):
     __tablename__ = 'Show'
+    __table_args__ = (
+        # The primary key is id alone, so lookups by venue, artist or start time range need
+        # indexes of their own.
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Show_start_time', 'start_time'),
+        db.Index('ix_Show_updated_at', 'updated_at'),
+        # On Postgres, migration 2b7c9e4d1a86 also adds the Show_venue_booking_excl and
+        # Show_artist_booking_excl exclusion constraints: no two shows of a venue, or of an
+        # artist, may overlap. See models/bookings.py.
+    )
 
     id: int = db.Column(db.Integer, primary_key=True, autoincrement=True)
     start_time: datetime = db.Column(db.DateTime)
+    end_time: datetime = db.Column(db.DateTime)
+    updated_at: datetime = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), onupdate=db.func.now())
 
     # Foreign keys
-    venue_id: int = db.Column(db.Integer, db.ForeignKey('Venue.id'), primary_key=True, nullable=False)
-    artist_id: int = db.Column(db.Integer, db.ForeignKey('Artist.id'), primary_key=True, nullable=False)
+    venue_id: int = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
+    artist_id: int = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
 
     # Relationships
     venue = db.relationship('Venue', backref=db.backref('shows', cascade='all, delete'))
     artist = db.relationship('Artist', backref=db.backref('shows', cascade='all, delete'))
+
+
+# *************************************************************************************
+# *************************************************************************************
+# *************************************************************************************
+
+# Upcoming/past show counts and next show of each venue and artist, kept up to date by
+# models/summaries.py. The counts split shows at rolled_over_at, not at the time of reading:
+# a row whose next show has started since is stale until the next `flask summaries rollover`.
+@dataclass
+class VenueShowSummary(db.Model):
+    __tablename__ = 'VenueShowSummary'
+    __table_args__ = (
+        db.Index('ix_VenueShowSummary_next_show_at', 'next_show_at'),
+    )
+
+    venue_id: int = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True)
+    upcoming_shows_count: int = db.Column(db.Integer, nullable=False, default=0)
+    past_shows_count: int = db.Column(db.Integer, nullable=False, default=0)
+    next_show_at: datetime = db.Column(db.DateTime, nullable=True)
+    rolled_over_at: datetime = db.Column(db.DateTime, nullable=False)
+
+
+@dataclass
+class ArtistShowSummary(db.Model):
+    __tablename__ = 'ArtistShowSummary'
+    __table_args__ = (
+        db.Index('ix_ArtistShowSummary_next_show_at', 'next_show_at'),
+    )
+
+    artist_id: int = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True)
+    upcoming_shows_count: int = db.Column(db.Integer, nullable=False, default=0)
+    past_shows_count: int = db.Column(db.Integer, nullable=False, default=0)
+    next_show_at: datetime = db.Column(db.DateTime, nullable=True)
+    rolled_over_at: datetime = db.Column(db.DateTime, nullable=False)
+
+
+# Genre changes only touch the association tables, so bump updated_at on the owning row
+# for them as well.
+def _touch(target, value, initiator):
+    target.updated_at = db.func.now()
+
+
+for _model in (Artist, Venue):
+    db.event.listen(_model.genres, 'append', _touch)
+    db.event.listen(_model.genres, 'remove', _touch)
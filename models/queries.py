@@ -0,0 +1,370 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from itertools import groupby
+
+from flask import current_app
+
+from forms import Genre as GenreChoice
+from models.database import db
+from models.models import Artist
+from models.models import Genre
+from models.models import Show
+from models.models import Venue
+from models.summaries import SUMMARIES
+
+
+def upcoming_shows_query(now: datetime, after: tuple = None, limit: int = 30):
+    # Join through the Show.artist / Show.venue relationships so the whole page is a single
+    # round trip, and only load the columns the listing actually renders.
+    query = (
+        Show
+            .query
+            .join(Show.artist)
+            .join(Show.venue)
+            .with_entities(
+                Show.id,
+                Show.start_time,
+                Venue.id.label('venue_id'),
+                Venue.name.label('venue_name'),
+                Artist.id.label('artist_id'),
+                Artist.name.label('artist_name'),
+                Artist.image_link.label('artist_image_link'),
+            )
+            .filter(Show.start_time > now)
+    )
+
+    # Keyset pagination on (start_time, id): seek past the last row of the previous page
+    # instead of using OFFSET, so every page costs the same however much history exists.
+    if after is not None:
+        after_start_time, after_id = after
+        query = query.filter(
+            db.or_(
+                Show.start_time > after_start_time,
+                db.and_(Show.start_time == after_start_time, Show.id > after_id),
+            )
+        )
+
+    # Fetch one extra row to find out whether there is a next page.
+    return query.order_by(Show.start_time, Show.id).limit(limit + 1)
+
+
+def upcoming_shows_page(now: datetime, after: tuple = None, limit: int = 30):
+    rows = upcoming_shows_query(now, after, limit).all()
+
+    return rows[:limit], len(rows) > limit
+
+
+def _partitioned_shows(query, now: datetime):
+    # Flag each show as upcoming or past in SQL against the single "now" of the request, so
+    # the caller only has to route rows into the right list.
+    return (
+        query
+            .add_columns(Show.start_time, (Show.start_time > now).label('is_upcoming'))
+            .order_by(Show.start_time)
+    )
+
+
+def venue_shows_query(venue_id: int, now: datetime):
+    query = (
+        Show
+            .query
+            .join(Show.artist)
+            .filter(Show.venue_id == venue_id)
+            .with_entities(
+                Artist.id.label('artist_id'),
+                Artist.name.label('artist_name'),
+                Artist.image_link.label('artist_image_link'),
+            )
+    )
+
+    return _partitioned_shows(query, now)
+
+
+def venue_shows(venue_id: int, now: datetime):
+    return venue_shows_query(venue_id, now).all()
+
+
+def artist_shows_query(artist_id: int, now: datetime):
+    query = (
+        Show
+            .query
+            .join(Show.venue)
+            .filter(Show.artist_id == artist_id)
+            .with_entities(
+                Venue.id.label('venue_id'),
+                Venue.name.label('venue_name'),
+                Venue.image_link.label('venue_image_link'),
+            )
+    )
+
+    return _partitioned_shows(query, now)
+
+
+def artist_shows(artist_id: int, now: datetime):
+    return artist_shows_query(artist_id, now).all()
+
+
+def show_counts_query(model, entity_id: int, now: datetime):
+    # Read the upcoming and past show counts of a venue or artist from its show summary. A
+    # summary whose next show has started since its last roll-over no longer splits the
+    # shows at now, so that entity (and one without a summary) is counted from Show instead.
+    summary, key = SUMMARIES[model]
+    fresh = db.and_(
+        summary.rolled_over_at <= now,
+        db.or_(summary.next_show_at.is_(None), summary.next_show_at > now),
+    )
+
+    def live_count(condition):
+        return Show.query.with_entities(db.func.count(Show.id)).filter(getattr(Show, key) == model.id, condition).scalar_subquery()
+
+    return (
+        model
+            .query
+            .outerjoin(summary, getattr(summary, key) == model.id)
+            .with_entities(
+                db.case((fresh, summary.upcoming_shows_count), else_=live_count(Show.start_time > now)).label('upcoming_shows_count'),
+                db.case((fresh, summary.past_shows_count), else_=live_count(Show.start_time <= now)).label('past_shows_count'),
+            )
+            .filter(model.id == entity_id)
+    )
+
+
+def show_counts(model, entity_id: int, now: datetime):
+    counts = show_counts_query(model, entity_id, now).one()
+
+    return counts.upcoming_shows_count, counts.past_shows_count
+
+
+def venue_anchor(after: int):
+    # Keyset pagination: the cursor is a venue id, but venues are listed by territory, so
+    # the listing seeks past that venue's (state, city, id) position. Looked up by primary
+    # key inside the listing statement itself; an unknown id lists from the start.
+    def position(column, missing):
+        return db.func.coalesce(db.select(column).where(Venue.id == after).scalar_subquery(), missing)
+
+    return position(Venue.state, ''), position(Venue.city, ''), position(Venue.id, 0)
+
+
+def venue_listing_query(genre: str = None, after: int = None):
+    query = Venue.query.with_entities(Venue.id, Venue.name, Venue.city, Venue.state)
+
+    if genre is not None:
+        query = query.join(Venue.genres).filter(Genre.name == genre)
+
+    if after is not None:
+        query = query.filter(db.tuple_(Venue.state, Venue.city, Venue.id) > db.tuple_(*venue_anchor(after)))
+
+    return query.order_by(Venue.state, Venue.city, Venue.id)
+
+
+def _group_territories(rows):
+    for (state, city), territory_venues in groupby(rows, key=lambda row: (row.state, row.city)):
+        yield {
+            "city": city,
+            "state": state,
+            "venues": [{"id": venue.id, "name": venue.name} for venue in territory_venues],
+        }
+
+
+# In-process territory -> venues index behind the first page of the /venues browse page,
+# keyed by the genre filter and page size. It is rebuilt lazily after
+# invalidate_venue_territories() is called by the venue create/edit/delete handlers, and
+# VENUE_TERRITORIES_MAX_AGE seconds after it was built, for the writes of other processes.
+# Both keys come from the query string, so only the VENUE_TERRITORIES_MAX_ENTRIES most
+# recently used pages are kept.
+_venue_territories = OrderedDict()
+_venue_territories_generation = 0
+_venue_territories_lock = threading.Lock()
+
+
+def cached_venue_territories(genre: str, limit: int):
+    # Returns the cached first page (or None) and the generation to publish a rebuilt one with.
+    with _venue_territories_lock:
+        entry = _venue_territories.get((genre, limit))
+        if entry is None:
+            return None, _venue_territories_generation
+
+        page, built_at = entry
+        if time.monotonic() - built_at >= current_app.config['VENUE_TERRITORIES_MAX_AGE']:
+            del _venue_territories[(genre, limit)]
+            return None, _venue_territories_generation
+
+        _venue_territories.move_to_end((genre, limit))
+        return page, _venue_territories_generation
+
+
+def publish_venue_territories(genre: str, limit: int, page: tuple, generation: int):
+    # Don't publish the index if a write invalidated it while it was being built.
+    with _venue_territories_lock:
+        if generation == _venue_territories_generation:
+            _venue_territories[(genre, limit)] = page, time.monotonic()
+            _venue_territories.move_to_end((genre, limit))
+
+            while len(_venue_territories) > current_app.config['VENUE_TERRITORIES_MAX_ENTRIES']:
+                _venue_territories.popitem(last=False)
+
+
+def territories_page(rows, limit: int):
+    # Rows of a listing query fetched with one extra row, to find out whether there is a
+    # next page, grouped into territories in Python.
+    next_after = rows[limit - 1].id if len(rows) > limit else None
+
+    return list(_group_territories(rows[:limit])), next_after
+
+
+def venue_territories(genre: str = None, after: int = None, limit: int = 100):
+    # Only the first page is cached, it is the one almost every visit lands on.
+    if after is None:
+        page, generation = cached_venue_territories(genre, limit)
+        if page is not None:
+            return page
+
+    page = territories_page(venue_listing_query(genre, after).limit(limit + 1).all(), limit)
+
+    if after is None:
+        publish_venue_territories(genre, limit, page, generation)
+
+    return page
+
+
+def venues_listing(genre: str = None, after: int = None, limit: int = 100):
+    rows = venue_listing_query(genre, after).limit(limit + 1).all()
+
+    return rows[:limit], rows[limit - 1].id if len(rows) > limit else None
+
+
+def stream_venues(genre: str = None, after: int = None):
+    return venue_listing_query(genre, after).yield_per(1000)
+
+
+def stream_venue_territories(genre: str = None, after: int = None):
+    # Stream every venue from the cursor onwards in batches, holding one territory at a time.
+    return _group_territories(venue_listing_query(genre, after).yield_per(1000))
+
+
+def invalidate_venue_territories():
+    global _venue_territories_generation
+
+    with _venue_territories_lock:
+        _venue_territories.clear()
+        _venue_territories_generation += 1
+
+
+def artist_listing_query(genre: str = None, after: int = None):
+    query = Artist.query.with_entities(Artist.id, Artist.name)
+
+    if genre is not None:
+        query = query.join(Artist.genres).filter(Genre.name == genre)
+
+    if after is not None:
+        query = query.filter(Artist.id > after)
+
+    return query.order_by(Artist.id)
+
+
+def artists_listing(genre: str = None, after: int = None, limit: int = 100):
+    rows = artist_listing_query(genre, after).limit(limit + 1).all()
+
+    return rows[:limit], rows[limit - 1].id if len(rows) > limit else None
+
+
+def stream_artists(genre: str = None, after: int = None):
+    return artist_listing_query(genre, after).yield_per(1000)
+
+
+def genres_by_name(names):
+    # Resolve submitted genre names to Genre rows. Only values of forms.Genre are genres: one
+    # added to the enum after the table was seeded gets its row here, any other name raises
+    # ValueError.
+    names = set(names)
+    unknown = names - {member.value for member in GenreChoice}
+    if unknown:
+        raise ValueError('Unknown genres: ' + ', '.join(sorted(unknown)))
+
+    genres = Genre.query.filter(Genre.name.in_(names)).all() if names else []
+
+    for name in names - {genre.name for genre in genres}:
+        genre = Genre(name=name)
+        db.session.add(genre)
+        genres.append(genre)
+
+    return sorted(genres, key=lambda genre: genre.name)
+
+
+def venue_artist_ids(venue_id: int):
+    return [row.artist_id for row in Show.query.with_entities(Show.artist_id).filter(Show.venue_id == venue_id).distinct()]
+
+
+def artist_venue_ids(artist_id: int):
+    return [row.venue_id for row in Show.query.with_entities(Show.venue_id).filter(Show.artist_id == artist_id).distinct()]
+
+
+# Page versions used as HTTP validators. Each returns (fingerprint, last_modified) where the
+# fingerprint changes whenever the rendered page would, or None if the entity doesn't exist.
+# Pages also change when a show starts and moves from upcoming to past, so the start time
+# of the latest show that has already started is part of every version.
+
+def _detail_page_version_query(model, show_relationship, other_model, entity_id: int, now: datetime):
+    return (
+        model
+            .query
+            .outerjoin(model.shows)
+            .outerjoin(show_relationship)
+            .with_entities(
+                db.func.max(model.updated_at).label('updated_at'),
+                db.func.max(Show.updated_at).label('shows_updated_at'),
+                db.func.max(other_model.updated_at).label('others_updated_at'),
+                db.func.count(Show.id).label('shows_count'),
+                db.func.max(db.case((Show.start_time <= now, Show.start_time))).label('last_started_at'),
+            )
+            .filter(model.id == entity_id)
+    )
+
+
+def detail_page_version(row):
+    if row.updated_at is None:
+        return None
+
+    return tuple(row), max(filter(None, (row.updated_at, row.shows_updated_at, row.others_updated_at, row.last_started_at)))
+
+
+def venue_page_version_query(venue_id: int, now: datetime):
+    return _detail_page_version_query(Venue, Show.artist, Artist, venue_id, now)
+
+
+def artist_page_version_query(artist_id: int, now: datetime):
+    return _detail_page_version_query(Artist, Show.venue, Venue, artist_id, now)
+
+
+def venue_page_version(venue_id: int, now: datetime):
+    return detail_page_version(venue_page_version_query(venue_id, now).one())
+
+
+def artist_page_version(artist_id: int, now: datetime):
+    return detail_page_version(artist_page_version_query(artist_id, now).one())
+
+
+def _table_version(model):
+    return (
+        model.query.with_entities(db.func.max(model.updated_at)).scalar_subquery(),
+        model.query.with_entities(db.func.count(model.id)).scalar_subquery(),
+    )
+
+
+def listing_page_version_query(*models, now: datetime = None):
+    columns = [column for model in models for column in _table_version(model)]
+
+    if now is not None:
+        columns.append(Show.query.with_entities(db.func.max(Show.start_time)).filter(Show.start_time <= now).scalar_subquery())
+
+    return db.session.query(*columns)
+
+
+def listing_version(row):
+    return tuple(row), max(filter(None, (value for value in row if isinstance(value, datetime))), default=None)
+
+
+def listing_page_version(*models, now: datetime = None):
+    return listing_version(listing_page_version_query(*models, now=now).one())
@@ -0,0 +1,341 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import namedtuple, Counter
+
+from sqlalchemy.orm import Session
+
+from models.database import db
+from models.models import Artist
+from models.models import Venue
+
+TOKEN_PATTERN = re.compile(r'[A-Za-z0-9]+')
+
+SearchResult = namedtuple('SearchResult', ['id', 'name'])
+
+
+def search_terms(search_input: str):
+    # Each comma-separated term becomes a list of lower-cased alphanumeric words, e.g.
+    # "San Fran, CA" -> [['san', 'fran'], ['ca']]. Terms with no words are dropped.
+    terms = []
+
+    for term in (search_input or '').split(','):
+        words = [word.lower() for word in TOKEN_PATTERN.findall(term)]
+        if words:
+            terms.append(words)
+
+    return terms
+
+
+def search_document(model):
+    # Must stay identical to the expression indexed by the search migration.
+    return db.func.to_tsvector(
+        db.literal_column("'simple'"),
+        model.name + db.literal_column("' '") + model.city + db.literal_column("' '") + model.state
+    )
+
+
+# ----------------------------------------------------------------------------#
+# Backends.
+# ----------------------------------------------------------------------------#
+
+class SearchBackend:
+    def search(self, model, terms, limit):
+        raise NotImplementedError
+
+
+class QuerySearchBackend(SearchBackend):
+    # Backends that search with a single SQL query, which the async read path can run itself.
+    def query(self, model, terms, limit):
+        raise NotImplementedError
+
+    def search(self, model, terms, limit):
+        return self.query(model, terms, limit).all()
+
+
+class PostgresSearchBackend(QuerySearchBackend):
+    def query(self, model, terms, limit):
+        # All terms are OR-ed into one prefix tsquery, e.g. "(san:* & fran:*) | (ca:*)", and
+        # substring matches on the name are picked up through the trigram index.
+        ts_query = db.func.to_tsquery(
+            db.literal_column("'simple'"),
+            ' | '.join('(' + ' & '.join(word + ':*' for word in words) + ')' for words in terms)
+        )
+        document = search_document(model)
+
+        return (
+            model
+                .query
+                .with_entities(model.id, model.name)
+                .filter(
+                    db.or_(
+                        document.op('@@')(ts_query),
+                        *[model.name.ilike('%' + ' '.join(words) + '%') for words in terms]
+                    )
+                )
+                .order_by(db.desc(db.func.ts_rank(document, ts_query)), model.name, model.id)
+                .limit(limit)
+        )
+
+
+class LikeSearchBackend(QuerySearchBackend):
+    def query(self, model, terms, limit):
+        # Portable fallback: one query, ranked by the number of terms each row matches.
+        term_matches = []
+
+        for words in terms:
+            pattern = '%' + '%'.join(words) + '%'
+            term_matches.append(
+                db.or_(model.name.ilike(pattern), model.city.ilike(pattern), model.state.ilike(pattern))
+            )
+
+        rank = sum(db.case((term_match, 1), else_=0) for term_match in term_matches)
+
+        return (
+            model
+                .query
+                .with_entities(model.id, model.name)
+                .filter(db.or_(*term_matches))
+                .order_by(db.desc(rank), model.name, model.id)
+                .limit(limit)
+        )
+
+
+class MemorySearchIndex:
+    # Inverted index over the name/city/state of one model: token -> posting set of ids, a
+    # sorted token list for prefix lookups and name trigram postings for substring matches.
+
+    def __init__(self, model):
+        self.model = model
+        self.loaded = False
+        self.names = {}
+        self.tokens_by_id = {}
+        self.trigrams_by_id = {}
+        self.postings = {}
+        self.sorted_tokens = []
+        self.trigram_postings = {}
+        self.stale_ids = set()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def trigrams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def add(self, id, name, city, state):
+        tokens = {token.lower() for token in TOKEN_PATTERN.findall(' '.join((name, city, state)))}
+        trigrams = self.trigrams(name.lower())
+
+        self.names[id] = name
+        self.tokens_by_id[id] = tokens
+        self.trigrams_by_id[id] = trigrams
+
+        for token in tokens:
+            if token not in self.postings:
+                self.postings[token] = set()
+                self.sorted_tokens.insert(bisect_left(self.sorted_tokens, token), token)
+            self.postings[token].add(id)
+
+        for trigram in trigrams:
+            self.trigram_postings.setdefault(trigram, set()).add(id)
+
+    def remove(self, id):
+        if id not in self.names:
+            return
+
+        del self.names[id]
+
+        for token in self.tokens_by_id.pop(id):
+            posting = self.postings[token]
+            posting.discard(id)
+            if not posting:
+                del self.postings[token]
+                del self.sorted_tokens[bisect_left(self.sorted_tokens, token)]
+
+        for trigram in self.trigrams_by_id.pop(id):
+            posting = self.trigram_postings[trigram]
+            posting.discard(id)
+            if not posting:
+                del self.trigram_postings[trigram]
+
+    def invalidate(self, ids):
+        with self.lock:
+            self.stale_ids.update(ids)
+
+    def _load(self, ids=None):
+        query = self.model.query.with_entities(
+            self.model.id, self.model.name, self.model.city, self.model.state
+        )
+        if ids is not None:
+            query = query.filter(self.model.id.in_(ids))
+
+        rows = query.all()
+
+        for id in (ids if ids is not None else []):
+            self.remove(id)
+
+        for row in rows:
+            self.add(row.id, row.name, row.city, row.state)
+
+    def refresh(self):
+        # Build the index on first use, then only reload the rows written since.
+        with self.lock:
+            if not self.loaded:
+                self._load()
+                self.loaded = True
+                self.stale_ids.clear()
+            elif self.stale_ids:
+                stale_ids, self.stale_ids = self.stale_ids, set()
+                self._load(stale_ids)
+
+    def _prefix_matches(self, word):
+        ids = set()
+        position = bisect_left(self.sorted_tokens, word)
+
+        while position < len(self.sorted_tokens) and self.sorted_tokens[position].startswith(word):
+            ids |= self.postings[self.sorted_tokens[position]]
+            position += 1
+
+        return ids
+
+    def _substring_matches(self, phrase):
+        if len(phrase) < 3:
+            return set()
+
+        candidates = None
+        for trigram in self.trigrams(phrase):
+            posting = self.trigram_postings.get(trigram, set())
+            candidates = posting if candidates is None else candidates & posting
+            if not candidates:
+                return set()
+
+        return {id for id in candidates if phrase in self.names[id].lower()}
+
+    def search(self, terms, limit):
+        self.refresh()
+
+        rank = Counter()
+
+        with self.lock:
+            for words in terms:
+                ids = None
+                for word in words:
+                    ids = self._prefix_matches(word) if ids is None else ids & self._prefix_matches(word)
+                    if not ids:
+                        break
+
+                ids = (ids or set()) | self._substring_matches(' '.join(words))
+                rank.update(ids)
+
+            matches = sorted(rank, key=lambda id: (-rank[id], self.names[id], id))[:limit]
+
+            return [SearchResult(id, self.names[id]) for id in matches]
+
+
+class MemorySearchBackend(SearchBackend):
+    # Kept up to date by the session listeners at the end of this module.
+
+    def __init__(self, models):
+        self.indexes = {model: MemorySearchIndex(model) for model in models}
+
+    def search(self, model, terms, limit):
+        return self.indexes[model].search(terms, limit)
+
+
+# ----------------------------------------------------------------------------#
+# Configuration.
+# ----------------------------------------------------------------------------#
+
+_backend_name = 'auto'
+_backend = None
+
+
+def configure_search(app):
+    global _backend_name, _backend
+
+    _backend_name = app.config.get('SEARCH_BACKEND', 'auto')
+    _backend = None
+
+    if _backend_name == 'memory':
+        _backend = MemorySearchBackend([Venue, Artist])
+    elif _backend_name == 'postgres':
+        _backend = PostgresSearchBackend()
+    elif _backend_name == 'like':
+        _backend = LikeSearchBackend()
+    elif _backend_name != 'auto':
+        raise ValueError('Unknown SEARCH_BACKEND: ' + _backend_name)
+
+
+def search_backend():
+    global _backend
+
+    # "auto" picks the full-text backend on Postgres and the ILIKE fallback elsewhere.
+    if _backend is None:
+        _backend = PostgresSearchBackend() if db.engine.dialect.name == 'postgresql' else LikeSearchBackend()
+
+    return _backend
+
+
+def search(model, search_input: str, limit: int = 100):
+    terms = search_terms(search_input)
+
+    # An empty search lists everything, as before.
+    if not terms:
+        return model.query.with_entities(model.id, model.name).order_by(model.name, model.id).limit(limit).all()
+
+    return search_backend().search(model, terms, limit)
+
+
+def search_query(model, search_input: str, limit: int = 100):
+    # The query search() would run, or None when the backend doesn't search in SQL.
+    terms = search_terms(search_input)
+
+    if not terms:
+        return model.query.with_entities(model.id, model.name).order_by(model.name, model.id).limit(limit)
+
+    backend = search_backend()
+
+    return backend.query(model, terms, limit) if isinstance(backend, QuerySearchBackend) else None
+
+
+def invalidate_search(model, ids):
+    # Core bulk inserts bypass the mapper events, so their rows are marked stale explicitly.
+    if isinstance(_backend, MemorySearchBackend):
+        _backend.indexes[model].invalidate(ids)
+
+
+# ----------------------------------------------------------------------------#
+# Incremental maintenance.
+# ----------------------------------------------------------------------------#
+
+# Writes are only applied to the memory index once they are committed, so rows from a rolled
+# back transaction never show up in search results. The listeners are registered once, at
+# import, and act on whichever backend configure_search() set up last.
+
+PENDING_KEY = 'search_index_pending'
+
+
+def _record_write(mapper, connection, target):
+    session = db.object_session(target)
+    if isinstance(_backend, MemorySearchBackend) and session is not None:
+        session.info.setdefault(PENDING_KEY, {}).setdefault(mapper.class_, set()).add(target.id)
+
+
+def _apply_writes(session):
+    pending = session.info.pop(PENDING_KEY, {})
+
+    if isinstance(_backend, MemorySearchBackend):
+        for model, ids in pending.items():
+            if model in _backend.indexes:
+                _backend.indexes[model].invalidate(ids)
+
+
+def _discard_writes(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+for _model in (Venue, Artist):
+    for _event_name in ('after_insert', 'after_update', 'after_delete'):
+        db.event.listen(_model, _event_name, _record_write)
+
+db.event.listen(Session, 'after_commit', _apply_writes)
+db.event.listen(Session, 'after_rollback', _discard_writes)
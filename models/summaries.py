@@ -0,0 +1,252 @@
+import time
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+
+from models.database import db
+from models.models import Artist
+from models.models import ArtistShowSummary
+from models.models import Show
+from models.models import Venue
+from models.models import VenueShowSummary
+
+# Summary model of each entity and the column naming the entity in both the summary and Show.
+SUMMARIES = {
+    Venue: (VenueShowSummary, 'venue_id'),
+    Artist: (ArtistShowSummary, 'artist_id'),
+}
+
+
+# ----------------------------------------------------------------------------#
+# Incremental maintenance.
+# ----------------------------------------------------------------------------#
+
+def _next_show(table, key, after):
+    return (
+        db.select(db.func.min(Show.start_time))
+            .where(getattr(Show, key) == table.c[key], Show.start_time > after)
+            .scalar_subquery()
+    )
+
+
+def _added_shows_statement(table, key):
+    # A show counts as upcoming if it starts after the row's roll-over time, whatever the
+    # time is now; the next roll-over moves it to the past once it has started.
+    start_time = db.bindparam('start_time', type_=db.DateTime)
+    upcoming = start_time > table.c.rolled_over_at
+
+    return (
+        table
+            .update()
+            .where(table.c[key] == db.bindparam('entity_id'))
+            .values(
+                upcoming_shows_count=table.c.upcoming_shows_count + db.case((upcoming, 1), else_=0),
+                past_shows_count=table.c.past_shows_count + db.case((upcoming, 0), else_=1),
+                next_show_at=db.case(
+                    (db.and_(upcoming, db.or_(table.c.next_show_at.is_(None), start_time < table.c.next_show_at)), start_time),
+                    else_=table.c.next_show_at,
+                ),
+            )
+    )
+
+
+def _removed_shows_statement(table, key):
+    # Runs after the show rows are gone, so the next show is looked up again among the rest.
+    start_time = db.bindparam('start_time', type_=db.DateTime)
+    upcoming = start_time > table.c.rolled_over_at
+
+    return (
+        table
+            .update()
+            .where(table.c[key] == db.bindparam('entity_id'))
+            .values(
+                upcoming_shows_count=table.c.upcoming_shows_count - db.case((upcoming, 1), else_=0),
+                past_shows_count=table.c.past_shows_count - db.case((upcoming, 0), else_=1),
+                next_show_at=db.case(
+                    (table.c.next_show_at == start_time, _next_show(table, key, table.c.rolled_over_at)),
+                    else_=table.c.next_show_at,
+                ),
+            )
+    )
+
+
+_STATEMENTS = {
+    key: (_added_shows_statement(summary.__table__, key), _removed_shows_statement(summary.__table__, key))
+    for summary, key in SUMMARIES.values()
+}
+
+
+def apply_show_changes(connection, added=(), removed=()):
+    # added/removed are show rows (dicts or objects with venue_id, artist_id and start_time),
+    # applied with one executemany per summary table on the connection of the write, so the
+    # summaries commit or roll back with the shows. Shows without a start time aren't counted.
+    added = [_show_values(show) for show in added]
+    removed = [_show_values(show) for show in removed]
+
+    for summary, key in SUMMARIES.values():
+        added_statement, removed_statement = _STATEMENTS[key]
+
+        for statement, shows in ((removed_statement, removed), (added_statement, added)):
+            parameters = [
+                {'entity_id': show[key], 'start_time': show['start_time']}
+                for show in shows if show['start_time'] is not None
+            ]
+            if parameters:
+                connection.execute(statement, parameters)
+
+
+def recount_shows(connection, shows):
+    # For Core inserts of many shows at once: recount the summaries they touch with one
+    # statement per table, instead of applying the shows one by one.
+    shows = [_show_values(show) for show in shows]
+
+    for summary, key in SUMMARIES.values():
+        table = summary.__table__
+        ids = {show[key] for show in shows}
+        if ids:
+            connection.execute(_recount_statement(table, key, table.c.rolled_over_at).where(table.c[key].in_(ids)))
+
+
+def _show_values(show):
+    if isinstance(show, dict):
+        return show
+    return {'venue_id': show.venue_id, 'artist_id': show.artist_id, 'start_time': show.start_time}
+
+
+def create_summaries(connection, model, ids, now: datetime = None):
+    # Summaries of new venues or artists, which can't have any shows yet.
+    summary, key = SUMMARIES[model]
+    now = now or datetime.now()
+
+    if ids:
+        connection.execute(
+            summary.__table__.insert(),
+            [{key: id, 'upcoming_shows_count': 0, 'past_shows_count': 0, 'rolled_over_at': now} for id in ids]
+        )
+
+
+def _show_inserted(mapper, connection, target):
+    apply_show_changes(connection, added=[target])
+
+
+def _show_deleted(mapper, connection, target):
+    apply_show_changes(connection, removed=[target])
+
+
+def _show_updated(mapper, connection, target):
+    state = db.inspect(target)
+    before = {}
+
+    for name in ('venue_id', 'artist_id', 'start_time'):
+        history = state.attrs[name].history
+        before[name] = history.deleted[0] if history.deleted else getattr(target, name)
+
+    if before != _show_values(target):
+        apply_show_changes(connection, added=[target], removed=[before])
+
+
+def _entity_inserted(mapper, connection, target):
+    create_summaries(connection, type(target), [target.id])
+
+
+def _entity_deleted(mapper, connection, target):
+    # Also done by ON DELETE CASCADE, but not on SQLite unless foreign keys are enforced.
+    summary, key = SUMMARIES[type(target)]
+    connection.execute(summary.__table__.delete().where(summary.__table__.c[key] == target.id))
+
+
+# Core inserts (bulk.insert_rows, seed.generate) bypass these and call recount_shows() and
+# create_summaries() themselves.
+db.event.listen(Show, 'after_insert', _show_inserted)
+db.event.listen(Show, 'after_delete', _show_deleted)
+db.event.listen(Show, 'after_update', _show_updated)
+
+for _model in SUMMARIES:
+    db.event.listen(_model, 'after_insert', _entity_inserted)
+    db.event.listen(_model, 'before_delete', _entity_deleted)
+
+
+# ----------------------------------------------------------------------------#
+# Roll-over.
+# ----------------------------------------------------------------------------#
+
+def _recount_statement(table, key, split):
+    # Counts every summary row from Show, splitting the shows at split: now for a roll-over,
+    # or the row's own roll-over time to recount it without rolling it over.
+    def count(condition):
+        return (
+            db.select(db.func.count(Show.id))
+                .where(getattr(Show, key) == table.c[key], condition)
+                .scalar_subquery()
+        )
+
+    return table.update().values(
+        upcoming_shows_count=count(Show.start_time > split),
+        past_shows_count=count(Show.start_time <= split),
+        next_show_at=_next_show(table, key, split),
+    )
+
+
+def roll_over(now: datetime = None):
+    # Recount only the summaries whose next show has started, found through the
+    # next_show_at index. Every other row has no show between its roll-over time and now, so
+    # its counts are already right as of now. Returns the number of rows recounted.
+    now = now or datetime.now()
+    rolled_over = 0
+
+    for summary, key in SUMMARIES.values():
+        table = summary.__table__
+        statement = _recount_statement(table, key, now).values(rolled_over_at=now).where(table.c.next_show_at <= now)
+        rolled_over += db.session.execute(statement).rowcount
+
+    db.session.commit()
+
+    return rolled_over
+
+
+def rebuild(now: datetime = None):
+    # Recount every summary from Show, adding the missing ones and dropping the orphaned.
+    now = now or datetime.now()
+
+    for model, (summary, key) in SUMMARIES.items():
+        table = summary.__table__
+        db.session.execute(table.delete().where(table.c[key].not_in(db.select(model.id))))
+        db.session.execute(
+            table.insert().from_select(
+                [key, 'upcoming_shows_count', 'past_shows_count', 'rolled_over_at'],
+                db.select(model.id, 0, 0, db.literal(now, db.DateTime)).where(model.id.not_in(db.select(table.c[key])))
+            )
+        )
+        db.session.execute(_recount_statement(table, key, now).values(rolled_over_at=now))
+
+    db.session.commit()
+
+
+# ----------------------------------------------------------------------------#
+# CLI.
+# ----------------------------------------------------------------------------#
+
+summaries_cli = AppGroup('summaries', help='Maintain the per-venue and per-artist show summaries.')
+
+
+@summaries_cli.command('rollover')
+@click.option('--every', type=float, help='Keep running, rolling over every this many seconds.')
+def rollover_command(every):
+    """Move the shows that have started since the last roll-over into the past counts."""
+    while True:
+        started_at = time.perf_counter()
+        rolled_over = roll_over()
+        click.echo('Rolled over {} summaries in {:.1f} ms'.format(rolled_over, (time.perf_counter() - started_at) * 1000))
+
+        if every is None:
+            return
+
+        time.sleep(every)
+
+
+@summaries_cli.command('rebuild')
+def rebuild_command():
+    """Recount every summary from the shows table."""
+    rebuild()
+    click.echo('Rebuilt the show summaries')
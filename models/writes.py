@@ -0,0 +1,161 @@
+import random
+import time
+from collections import namedtuple
+
+from blinker import Namespace
+from flask import current_app
+from sqlalchemy.exc import DBAPIError, NoResultFound
+
+from metrics import WRITE_TRANSACTION_RETRIES
+from models.database import db
+from models.models import Artist
+from models.models import Show
+from models.models import Venue
+from models.queries import genres_by_name, venue_artist_ids, artist_venue_ids
+
+# SQLSTATEs of the Postgres errors where a transaction lost a race with a concurrent one
+# and can simply be run again: serialization_failure and deadlock_detected.
+RETRYABLE_SQLSTATES = ('40001', '40P01')
+
+# First retry waits up to this many seconds, doubling on each further attempt.
+RETRY_BACKOFF = 0.01
+
+# What a committed operation wrote: the action ("create", "update" or "delete"), the model
+# and id of the row, the names of the columns that changed (empty if nothing did) and the
+# (model, id) pairs of the other venues and artists whose pages show the row.
+Written = namedtuple('Written', 'action model id changed related')
+
+# Sent after every committed write() with the Written of each operation, so the app can
+# invalidate the pages showing those rows.
+signals = Namespace()
+entities_written = signals.signal('entities-written')
+
+
+def column_values(model, data):
+    # The submitted fields that are columns of the model, e.g. from form.data.
+    columns = {column.name for column in model.__table__.columns}
+    return {name: value for name, value in data.items() if name in columns and name not in ('id', 'updated_at')}
+
+
+def _get(model, id):
+    entity = model.query.filter(model.id == id).one_or_none()
+    if entity is None:
+        raise NoResultFound('{} with ID {} does not exist'.format(model.__name__, id))
+    return entity
+
+
+def _related(model, entity):
+    if model is Venue:
+        return tuple((Artist, artist_id) for artist_id in venue_artist_ids(entity.id))
+    if model is Artist:
+        return tuple((Venue, venue_id) for venue_id in artist_venue_ids(entity.id))
+    return (Venue, entity.venue_id), (Artist, entity.artist_id)
+
+
+# ----------------------------------------------------------------------------#
+# Operations.
+# ----------------------------------------------------------------------------#
+
+# Each operation is applied to the session inside write(), and applied again from scratch
+# if the transaction is retried, so it keeps no state between attempts.
+
+class Create:
+    def __init__(self, model, values, genres=None):
+        self.model, self.values, self.genres = model, values, genres
+
+    def apply(self):
+        entity = self.model(**self.values)
+        if self.genres is not None:
+            entity.genres = genres_by_name(self.genres)
+
+        db.session.add(entity)
+        db.session.flush()
+
+        related = _related(Show, entity) if self.model is Show else ()
+        return Written('create', self.model, entity.id, frozenset(self.values), related)
+
+
+class Update:
+    # Only columns whose value differs are assigned, so the UPDATE (and updated_at) only
+    # touches what the user actually changed, and concurrent edits of different fields of
+    # the same row don't overwrite each other.
+
+    def __init__(self, model, id, values, genres=None):
+        self.model, self.id, self.values, self.genres = model, id, values, genres
+
+    def apply(self):
+        entity = _get(self.model, self.id)
+        changed = {name for name, value in self.values.items() if getattr(entity, name) != value}
+
+        for name in changed:
+            setattr(entity, name, self.values[name])
+
+        if self.genres is not None and {genre.name for genre in entity.genres} != set(self.genres):
+            entity.genres = genres_by_name(self.genres)
+            changed.add('genres')
+
+        related = _related(self.model, entity) if changed else ()
+        return Written('update', self.model, entity.id, frozenset(changed), related)
+
+
+class Delete:
+    def __init__(self, model, id):
+        self.model, self.id = model, id
+
+    def apply(self):
+        entity = _get(self.model, self.id)
+        # Read before the delete cascades to the shows the related pages are found through.
+        related = _related(self.model, entity)
+        db.session.delete(entity)
+
+        return Written('delete', self.model, entity.id, frozenset(), related)
+
+
+# ----------------------------------------------------------------------------#
+# Unit of work.
+# ----------------------------------------------------------------------------#
+
+def sqlstate(error):
+    original = getattr(error, 'orig', None)
+    # psycopg2 exposes the SQLSTATE as pgcode, psycopg 3 and asyncpg as sqlstate.
+    return getattr(original, 'pgcode', None) or getattr(original, 'sqlstate', None)
+
+
+def is_retryable(error):
+    # SQLite reports a competing writer as "database is locked".
+    return sqlstate(error) in RETRYABLE_SQLSTATES or 'database is locked' in str(getattr(error, 'orig', None))
+
+
+def write(*operations, retries: int = None):
+    # Applies the operations in one transaction and commits it, running the whole
+    # transaction again (with jittered exponential backoff) when it failed on a
+    # serialization failure or deadlock. Returns the Written of each operation; raises
+    # NoResultFound if an operation's row doesn't exist, or the database error once the
+    # retries are used up. Nothing is written unless every operation succeeds.
+    retries = current_app.config['WRITE_RETRIES'] if retries is None else retries
+    isolation_level = current_app.config.get('WRITE_ISOLATION_LEVEL')
+
+    # Reads earlier in the request may have begun a transaction; end it, so the write gets
+    # a short one of its own (and the isolation level can still be set on it).
+    db.session.rollback()
+
+    for attempt in range(retries + 1):
+        try:
+            if isolation_level:
+                db.session.connection(execution_options={'isolation_level': isolation_level})
+
+            results = [operation.apply() for operation in operations]
+            db.session.commit()
+        except DBAPIError as error:
+            db.session.rollback()
+            if attempt == retries or not is_retryable(error):
+                raise
+
+            WRITE_TRANSACTION_RETRIES.inc()
+            time.sleep(random.uniform(0, RETRY_BACKOFF * 2 ** attempt))
+        except Exception:
+            db.session.rollback()
+            raise
+        else:
+            entities_written.send(current_app._get_current_object(), writes=results)
+            return results
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from flask import current_app, request
+
+
+# Query string parameters of the keyset-paginated listings, shared by the HTML pages and the
+# JSON API so both accept the same ?limit= and ?after= values.
+
+def listing_limit():
+    # Page size for the keyset-paginated listings, from ?limit= within the configured cap.
+    limit = request.args.get('limit', current_app.config['LISTING_PAGE_SIZE'], type=int)
+    return max(1, min(limit, current_app.config['LISTING_MAX_PAGE_SIZE']))
+
+
+def show_cursor():
+    # The (start_time, id) keyset cursor of the previous page of upcoming shows, from ?after=,
+    # or None on the first page. Raises ValueError if the cursor is malformed.
+    cursor = request.args.get('after')
+    if cursor is None:
+        return None
+
+    after_start_time, _, after_id = cursor.rpartition('_')
+    return datetime.fromisoformat(after_start_time), int(after_id)
+
+
+def next_show_cursor(show):
+    # The ?after= value of the page following the one ending with this show.
+    return show.start_time.isoformat() + '_' + str(show.id)
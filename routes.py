@@ -0,0 +1,29 @@
+class Routes:
+    # Collects view functions and error handlers at import time and registers them on each
+    # app made by create_app(). Unlike a Blueprint it keeps the plain endpoint names
+    # ('index', 'show_venue', ...) that the templates and url_for() calls use.
+
+    def __init__(self):
+        self.rules = []
+        self.error_handlers = []
+
+    def route(self, rule, **options):
+        def decorator(view):
+            self.rules.append((rule, view, options))
+            return view
+
+        return decorator
+
+    def errorhandler(self, code):
+        def decorator(handler):
+            self.error_handlers.append((code, handler))
+            return handler
+
+        return decorator
+
+    def init_app(self, app):
+        for rule, view, options in self.rules:
+            app.add_url_rule(rule, view_func=view, **options)
+
+        for code, handler in self.error_handlers:
+            app.register_error_handler(code, handler)
@@ -0,0 +1,198 @@
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+import click
+from flask.cli import with_appcontext
+
+from bulk import ENTITIES, insert_rows
+from forms import Genre
+from models.database import db
+from models.models import Artist
+from models.models import ArtistShowSummary
+from models.models import Show
+from models.models import Venue
+from models.models import VenueShowSummary
+from models.models import artist_genres
+from models.models import venue_genres
+from models.summaries import recount_shows
+
+# Ordered most to least common; choices are Zipf-weighted by position so a few cities and
+# genres dominate the way they do in real listings.
+CITIES = [
+    ('New York', 'NY'), ('Los Angeles', 'CA'), ('San Francisco', 'CA'), ('Chicago', 'IL'),
+    ('Austin', 'TX'), ('Nashville', 'TN'), ('Brooklyn', 'NY'), ('Seattle', 'WA'),
+    ('New Orleans', 'LA'), ('Atlanta', 'GA'), ('Portland', 'OR'), ('Denver', 'CO'),
+    ('Boston', 'MA'), ('Philadelphia', 'PA'), ('Detroit', 'MI'), ('Minneapolis', 'MN'),
+    ('Miami', 'FL'), ('Memphis', 'TN'), ('Oakland', 'CA'), ('Kansas City', 'MO'),
+]
+
+GENRES = [
+    Genre.ROCK_N_ROLL, Genre.POP, Genre.HIP_HOP, Genre.JAZZ, Genre.ELECTRONIC, Genre.ALTERNATIVE,
+    Genre.COUNTRY, Genre.BLUES, Genre.R_AND_B, Genre.FOLK, Genre.PUNK, Genre.SOUL, Genre.FUNK,
+    Genre.HEAVY_METAL, Genre.CLASSICAL, Genre.REGGAE, Genre.INSTRUMENTAL, Genre.MUSICAL_THEATRE,
+    Genre.OTHER,
+]
+
+NAME_WORDS = [
+    'Blue', 'Red', 'Golden', 'Velvet', 'Electric', 'Silver', 'Midnight', 'Wild', 'Lucky',
+    'Broken', 'Neon', 'Crystal', 'Iron', 'Little', 'Grand', 'Secret', 'Rusty', 'Howling',
+]
+
+VENUE_WORDS = ['Hall', 'Room', 'Club', 'Lounge', 'Theatre', 'Cafe', 'Ballroom', 'Tavern', 'Bar']
+
+ARTIST_WORDS = ['Band', 'Trio', 'Collective', 'Orchestra', 'Brothers', 'Sisters', 'Project', 'Kings']
+
+# Attempts at finding a free slot for a show before leaving it out.
+SHOW_DRAWS = 20
+
+
+def zipf_weights(count, exponent=1.0):
+    return list(accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+class Generator:
+    # Every value comes from one seeded Random, so the same arguments always produce the
+    # same catalogue (relative to the anchor time).
+
+    def __init__(self, seed=0, anchor=None):
+        self.random = random.Random(seed)
+        self.anchor = anchor or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.city_weights = zipf_weights(len(CITIES))
+        self.genre_weights = zipf_weights(len(GENRES))
+        self.booked = set()
+
+    def city(self):
+        return self.random.choices(CITIES, cum_weights=self.city_weights)[0]
+
+    def genres(self):
+        count = self.random.choices((1, 2, 3), weights=(6, 3, 1))[0]
+        return sorted({genre.value for genre in self.random.choices(GENRES, cum_weights=self.genre_weights, k=count)})
+
+    def name(self, nouns, number):
+        return '{} {} {} {}'.format(
+            self.random.choice(NAME_WORDS), self.random.choice(NAME_WORDS), self.random.choice(nouns), number
+        )
+
+    def links(self, slug):
+        return {
+            'phone': '{:03}-{:03}-{:04}'.format(self.random.randint(200, 999), self.random.randint(0, 999), self.random.randint(0, 9999)),
+            'image_link': 'https://images.example.com/{}.jpg'.format(slug),
+            'website': 'https://www.example.com/{}'.format(slug),
+            'facebook_link': 'https://www.facebook.com/{}'.format(slug),
+        }
+
+    def venue(self, number):
+        city, state = self.city()
+        seeking_talent = self.random.random() < 0.3
+
+        values = dict(
+            self.links('venue-{}'.format(number)),
+            name=self.name(VENUE_WORDS, number),
+            city=city,
+            state=state,
+            address='{} {} St'.format(self.random.randint(1, 9999), self.random.choice(NAME_WORDS)),
+            seeking_talent=seeking_talent,
+            seeking_description='Looking for local acts.' if seeking_talent else None,
+        )
+        return values, self.genres()
+
+    def artist(self, number):
+        city, state = self.city()
+        seeking_venue = self.random.random() < 0.4
+
+        values = dict(
+            self.links('artist-{}'.format(number)),
+            name=self.name(ARTIST_WORDS, number),
+            city=city,
+            state=state,
+            seeking_venue=seeking_venue,
+            seeking_description='Looking for gigs.' if seeking_venue else None,
+        )
+        return values, self.genres()
+
+    def show(self, artist_ids, artist_weights, venue_ids, venue_weights):
+        # Roughly three quarters of shows are in the past, the rest up to six months out,
+        # always an hour long on the hour in the evening. A venue or artist can't be booked
+        # twice at once, so taken slots are drawn again; returns None if every draw was taken.
+        for _ in range(SHOW_DRAWS):
+            days = self.random.randint(-540, 180)
+            show = {
+                'artist_id': self.random.choices(artist_ids, cum_weights=artist_weights)[0],
+                'venue_id': self.random.choices(venue_ids, cum_weights=venue_weights)[0],
+                'start_time': self.anchor + timedelta(days=days, hours=self.random.randint(18, 23)),
+            }
+            slots = {('venue', show['venue_id'], show['start_time']), ('artist', show['artist_id'], show['start_time'])}
+
+            if not slots & self.booked:
+                self.booked |= slots
+                return dict(show, end_time=show['start_time'] + timedelta(hours=1))
+
+        return None
+
+
+def _insert_entities(entity, make_row, count, batch_size):
+    model, _, association, key = ENTITIES[entity]
+    ids = []
+
+    for start in range(0, count, batch_size):
+        batch = [(number, *make_row(number)) for number in range(start + 1, min(start + batch_size, count) + 1)]
+        ids.extend(insert_rows(model, association, key, batch))
+        db.session.commit()
+
+    return ids
+
+
+def generate(venues, artists, shows, seed=0, anchor=None, batch_size=1000):
+    generator = Generator(seed, anchor)
+
+    venue_ids = _insert_entities('venues', generator.venue, venues, batch_size)
+    artist_ids = _insert_entities('artists', generator.artist, artists, batch_size)
+
+    # Popular artists and venues get most of the bookings.
+    artist_weights = zipf_weights(len(artist_ids), 0.8)
+    venue_weights = zipf_weights(len(venue_ids), 0.8)
+
+    if venue_ids and artist_ids:
+        for start in range(0, shows, batch_size):
+            rows = [
+                show for show in (
+                    generator.show(artist_ids, artist_weights, venue_ids, venue_weights)
+                    for _ in range(min(batch_size, shows - start))
+                )
+                if show is not None
+            ]
+            if not rows:
+                continue
+            db.session.execute(Show.__table__.insert(), rows)
+            recount_shows(db.session.connection(), rows)
+            db.session.commit()
+
+    return venue_ids, artist_ids
+
+
+def reset():
+    tables = (
+        VenueShowSummary.__table__, ArtistShowSummary.__table__, Show.__table__,
+        venue_genres, artist_genres, Venue.__table__, Artist.__table__,
+    )
+    for table in tables:
+        db.session.execute(table.delete())
+    db.session.commit()
+
+
+@click.command('seed')
+@click.option('--venues', default=100, show_default=True)
+@click.option('--artists', default=200, show_default=True)
+@click.option('--shows', default=1000, show_default=True)
+@click.option('--seed', 'seed_value', default=0, show_default=True, help='Random seed.')
+@click.option('--reset', 'reset_first', is_flag=True, help='Delete all venues, artists and shows first.')
+@with_appcontext
+def seed_command(venues, artists, shows, seed_value, reset_first):
+    """Fill the database with deterministic synthetic venues, artists and shows."""
+    if reset_first:
+        reset()
+
+    generate(venues, artists, shows, seed_value)
+
+    click.echo('Seeded {} venues, {} artists and {} shows.'.format(venues, artists, shows))
@@ -2,3 +2,111 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+window.debounce = function debounce(callback, wait) {
+  var timer;
+  return function () {
+    var context = this, args = arguments;
+    clearTimeout(timer);
+    timer = setTimeout(function () { callback.apply(context, args); }, wait);
+  };
+};
+
+// Name picker: a .dropdown element with data-autocomplete="venue|artist", the endpoint in
+// data-autocomplete-url and the id of the field to fill in data-autocomplete-target, holding
+// a text input and an empty .dropdown-menu. Suggestions are fetched once typing pauses,
+// kept per query, and answers that arrive after a newer query are dropped.
+window.initAutocomplete = function initAutocomplete(container) {
+  var input = container.querySelector('input');
+  var menu = container.querySelector('.dropdown-menu');
+  var target = document.getElementById(container.getAttribute('data-autocomplete-target'));
+  var url = container.getAttribute('data-autocomplete-url') + '?type=' + encodeURIComponent(container.getAttribute('data-autocomplete')) + '&q=';
+  var cache = {};
+  var latest = '';
+  var suggestions = [];
+  var active = -1;
+
+  function close() {
+    container.classList.remove('open');
+    active = -1;
+  }
+
+  function select(suggestion) {
+    input.value = suggestion.name;
+    target.value = suggestion.id;
+    close();
+  }
+
+  function highlight(index) {
+    active = index;
+    Array.prototype.forEach.call(menu.children, function (item, position) {
+      item.classList.toggle('active', position === index);
+    });
+  }
+
+  function render(results) {
+    suggestions = results;
+    menu.innerHTML = '';
+    results.forEach(function (suggestion) {
+      var item = document.createElement('li');
+      var link = document.createElement('a');
+      link.href = '#';
+      link.textContent = suggestion.name + ' (ID ' + suggestion.id + ')';
+      // mousedown, so the choice is made before the input's blur closes the menu.
+      link.addEventListener('mousedown', function (event) {
+        event.preventDefault();
+        select(suggestion);
+      });
+      item.appendChild(link);
+      menu.appendChild(item);
+    });
+    active = -1;
+    container.classList.toggle('open', results.length > 0);
+  }
+
+  var suggest = debounce(function () {
+    var query = input.value.trim();
+    latest = query;
+
+    if (!query) {
+      close();
+    } else if (cache.hasOwnProperty(query)) {
+      render(cache[query]);
+    } else {
+      fetch(url + encodeURIComponent(query))
+        .then(function (response) { return response.ok ? response.json() : { data: [] }; })
+        .then(function (body) {
+          cache[query] = body.data;
+          if (query === latest) {
+            render(body.data);
+          }
+        })
+        .catch(close);
+    }
+  }, 150);
+
+  input.addEventListener('input', function () {
+    // A name edited after picking no longer matches the picked ID.
+    target.value = '';
+    suggest();
+  });
+  input.addEventListener('blur', close);
+  input.addEventListener('keydown', function (event) {
+    if (!container.classList.contains('open')) {
+      return;
+    }
+    if (event.key === 'ArrowDown' || event.key === 'ArrowUp') {
+      event.preventDefault();
+      highlight((active + (event.key === 'ArrowDown' ? 1 : suggestions.length - 1 + (active < 0 ? 1 : 0))) % suggestions.length);
+    } else if (event.key === 'Enter' && active >= 0) {
+      event.preventDefault();
+      select(suggestions[active]);
+    } else if (event.key === 'Escape') {
+      close();
+    }
+  });
+};
+
+document.addEventListener('DOMContentLoaded', function () {
+  Array.prototype.forEach.call(document.querySelectorAll('[data-autocomplete]'), window.initAutocomplete);
+});
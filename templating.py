@@ -0,0 +1,29 @@
+import os
+import time
+
+from jinja2 import FileSystemBytecodeCache
+
+
+def configure_templates(app):
+    # Flask applies TEMPLATES_AUTO_RELOAD itself when it creates the Jinja environment. Call
+    # this once the filters are registered, templates using one don't compile without it.
+    directory = app.config.get('TEMPLATES_BYTECODE_CACHE_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+    if app.config.get('TEMPLATES_PREWARM'):
+        prewarm_templates(app)
+
+
+def prewarm_templates(app):
+    # Load every template into the environment's cache, compiling it or reading it from the
+    # bytecode cache, so no request pays for that. With a preloading server (see wsgi.py)
+    # this runs once in the master and the workers inherit the loaded templates.
+    started_at = time.perf_counter()
+    names = app.jinja_env.list_templates()
+
+    for name in names:
+        app.jinja_env.get_template(name)
+
+    app.logger.info('Loaded %d templates in %.1f ms', len(names), (time.perf_counter() - started_at) * 1000)
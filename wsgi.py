@@ -0,0 +1,25 @@
+"""WSGI entry point for production servers.
+
+    $ gunicorn wsgi:app                      (settings in gunicorn.conf.py)
+    $ uwsgi --http :8000 --master --processes 4 --module wsgi:app
+
+Both load the app once in the master process and fork the workers from it (gunicorn with
+preload_app, uwsgi unless --lazy-apps is given), so imports and app setup happen once and
+the workers share those memory pages copy-on-write. SECRET_KEY has to be set in the
+environment so every worker signs sessions with the same key.
+"""
+import gc
+
+from app import create_app, datetime_pattern, DATETIME_FORMATS
+
+app = create_app(cli=False)
+
+# The date filter imports babel and loads its locale data on first use, which would
+# otherwise happen separately in every worker; doing it in the master shares one copy.
+for format in DATETIME_FORMATS:
+    datetime_pattern(format)
+
+# Everything allocated so far lives as long as the process. Freezing it moves it out of
+# the garbage collector's generations, so collections in the workers don't write to
+# (and so un-share) the pages inherited from the master.
+gc.freeze()